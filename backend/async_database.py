@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiomysql
+
+from database import db_manager, PoolStats, PoolTimeoutError
+from metrics import AsyncTimedCursor
+
+
+class AsyncDatabaseManager:
+    """Pool aiomysql para los endpoints `async def`.
+
+    Usa la misma configuración DB_* que `DatabaseManager` y expone los mismos
+    helpers (`fetchone`, `fetchall`), pero sin ocupar hilos del threadpool
+    mientras se espera a MySQL. Tiene un pool por cada réplica de
+    `sync_manager`; `reader()` elige nodo con el mismo enrutado.
+    """
+
+    def __init__(self, sync_manager=db_manager, replicas: bool = True):
+        self.sync_manager = sync_manager
+        self.params = sync_manager.connection_params()
+        self.min_size = int(os.getenv('DB_ASYNC_POOL_MIN', 1))
+        # Número máximo de consultas concurrentes contra MySQL desde el event loop
+        self.max_size = int(os.getenv('DB_ASYNC_POOL_SIZE', 20))
+        self.checkout_timeout = float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.recycle_seconds = int(os.getenv('DB_POOL_RECYCLE', 1800))
+        self._pool: Optional[aiomysql.Pool] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.stats = PoolStats()
+        self.replicas = [AsyncDatabaseManager(r, replicas=False) for r in sync_manager.replicas] if replicas else []
+
+    def reader(self, *keys: str) -> "AsyncDatabaseManager":
+        """Pool para una lectura con estas claves de consistencia (réplica o primario)."""
+        index = self.sync_manager.route(*keys)
+        return self if index is None else self.replicas[index]
+
+    async def start(self):
+        if self._pool is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(
+                    host=self.params["host"],
+                    user=self.params["user"],
+                    password=self.params["password"],
+                    db=self.params["database"],
+                    port=self.params["port"],
+                    charset=self.params["charset"],
+                    minsize=self.min_size,
+                    maxsize=self.max_size,
+                    pool_recycle=self.recycle_seconds,
+                    autocommit=True,
+                )
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+        for replica in self.replicas:
+            await replica.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Presta una conexión del pool async y la devuelve al salir del bloque."""
+        await self.start()
+        start = time.monotonic()
+        saturated = self._pool.freesize == 0 and self._pool.size >= self.max_size
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), timeout=self.checkout_timeout)
+        except asyncio.TimeoutError:
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            raise PoolTimeoutError(
+                f"Pool async agotado ({self.max_size}) tras {self.checkout_timeout}s de espera"
+            )
+        self.stats.record_checkout(time.monotonic() - start, saturated)
+        try:
+            yield conn
+        finally:
+            self._pool.release(conn)
+
+    @asynccontextmanager
+    async def cursor(self, cursor_class=aiomysql.DictCursor):
+        """Cursor (de diccionarios por defecto) sobre una conexión del pool async."""
+        async with self.connection() as conn:
+            async with conn.cursor(cursor_class) as cursor:
+                yield AsyncTimedCursor(cursor)
+
+    async def fetchone(self, query: str, params: tuple = ()) -> Optional[dict]:
+        async with self.cursor() as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchone()
+
+    async def fetchall(self, query: str, params: tuple = ()) -> list:
+        async with self.cursor() as cursor:
+            await cursor.execute(query, params)
+            return list(await cursor.fetchall())
+
+    async def fetchrows(self, query: str, params: tuple = ()) -> list:
+        """Como `fetchall` pero con filas en tuplas, para lecturas columnares."""
+        async with self.cursor(aiomysql.Cursor) as cursor:
+            await cursor.execute(query, params)
+            return list(await cursor.fetchall())
+
+    def pool_status(self) -> dict:
+        stats = self.stats
+        with stats.lock:
+            checkouts = stats.checkouts
+            return {
+                "pool_size": self.max_size,
+                "open": self._pool.size if self._pool else 0,
+                "idle": self._pool.freesize if self._pool else 0,
+                "checkouts": checkouts,
+                "timeouts": stats.timeouts,
+                "saturated_checkouts": stats.saturated_checkouts,
+                "wait_time_total_ms": round(stats.wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(stats.wait_time_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                "wait_time_max_ms": round(stats.wait_time_max * 1000, 3),
+            }
+
+
+async_db = AsyncDatabaseManager()
@@ -0,0 +1,219 @@
+"""Registro de auditoría con escritura asíncrona por lotes.
+
+Los endpoints de escritura crean una `AuditEntry` con la imagen anterior y
+posterior del registro, la pasan a `audit_writer.stage` antes del commit y
+lo que devuelve a `audit_writer.record` después.
+
+`AUDIT_DURABILITY` elige la garantía: con `async` (por defecto) `stage` no
+hace nada y `record` deja las entradas en una cola acotada en memoria que un
+hilo inserta en `auditoria` con INSERTs multi-fila, fuera de la petición.
+Con `flush` `stage` inserta las entradas en la misma transacción que la
+escritura: se confirman o fallan juntas y `record` no tiene nada que hacer.
+Si la cola está llena, `record` espera hasta `AUDIT_ENQUEUE_TIMEOUT_MS` y
+después escribe las entradas directamente: la auditoría se degrada a
+síncrona pero no se pierde.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from database import db_manager
+from metrics import audit_flush_latency
+
+INSERT_AUDIT = """
+    INSERT INTO auditoria
+    (tabla_afectada, id_registro, accion, usuario_id, fecha_accion, datos_anteriores, datos_nuevos)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+INSERT_CHUNK_SIZE = 500
+
+
+class AuditEntry:
+    __slots__ = ('tabla', 'id_registro', 'accion', 'usuario_id', 'fecha', 'anteriores', 'nuevos')
+
+    def __init__(self, tabla: str, id_registro: int, accion: str, usuario_id: Optional[int],
+                 anteriores: Optional[dict] = None, nuevos: Optional[dict] = None):
+        self.tabla = tabla
+        self.id_registro = id_registro
+        self.accion = accion
+        self.usuario_id = usuario_id
+        # Fecha de la acción, no la de la escritura del lote
+        self.fecha = datetime.now()
+        self.anteriores = anteriores
+        self.nuevos = nuevos
+
+    def row(self) -> tuple:
+        return (
+            self.tabla, self.id_registro, self.accion, self.usuario_id, self.fecha,
+            None if self.anteriores is None else json.dumps(self.anteriores, default=str),
+            None if self.nuevos is None else json.dumps(self.nuevos, default=str),
+        )
+
+
+class AuditWriter:
+    """Cola acotada de entradas de auditoría y el hilo que las escribe por lotes.
+
+    Se vacía cuando acumula `AUDIT_BATCH_MAX_ROWS` entradas o cuando la más
+    antigua lleva `AUDIT_BATCH_MAX_DELAY_MS` esperando. Un lote que falla se
+    reintenta `AUDIT_MAX_ATTEMPTS` veces antes de descartarse.
+    """
+
+    def __init__(self, manager=db_manager):
+        self.manager = manager
+        self.capacity = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+        self.max_rows = int(os.getenv('AUDIT_BATCH_MAX_ROWS', 500))
+        self.max_delay = float(os.getenv('AUDIT_BATCH_MAX_DELAY_MS', 500)) / 1000
+        self.enqueue_timeout = float(os.getenv('AUDIT_ENQUEUE_TIMEOUT_MS', 100)) / 1000
+        self.max_attempts = int(os.getenv('AUDIT_MAX_ATTEMPTS', 3))
+        self.durability = os.getenv('AUDIT_DURABILITY', 'async')
+        if self.durability not in ('async', 'flush'):
+            raise ValueError(f"AUDIT_DURABILITY inválido: {self.durability}")
+        self._entries: List[AuditEntry] = []
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed = 0
+        self.direct_writes = 0
+        self.staged = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+
+    def stage(self, conn, entries: List[AuditEntry]) -> List[AuditEntry]:
+        """Antes del commit de `conn`: en modo `flush` inserta las entradas en su transacción.
+
+        Devuelve las que quedan para `record` tras el commit (ninguna en modo `flush`).
+        """
+        if self.durability != 'flush' or not entries:
+            return entries
+        self._insert(conn, [entry.row() for entry in entries])
+        self.staged += len(entries)
+        return []
+
+    def record(self, entries: List[AuditEntry]):
+        """Encola las entradas que devolvió `stage`; llamar tras el commit de la escritura auditada."""
+        if not entries:
+            return
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self._cond:
+            while len(self._entries) + len(entries) > self.capacity and not self._stop:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            queued = (len(self._entries) + len(entries) <= self.capacity and self._thread is not None
+                      and not self._stop)
+            if queued:
+                self._entries.extend(entries)
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+                self.enqueued += len(entries)
+                self.max_depth = max(self.max_depth, len(self._entries))
+                self._cond.notify_all()
+        if not queued:
+            # Cola llena o escritor sin arrancar/detenido: se escribe en este hilo
+            self.direct_writes += len(entries)
+            self._write(entries)
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._entries)
+
+    def _take(self) -> List[AuditEntry]:
+        entries = self._entries[:self.max_rows]
+        del self._entries[:self.max_rows]
+        self._oldest = time.monotonic() if self._entries else None
+        # Hay sitio en la cola para los productores que esperaban
+        self._cond.notify_all()
+        return entries
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop:
+                    if len(self._entries) >= self.max_rows:
+                        break
+                    if self._oldest is not None:
+                        remaining = self._oldest + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                entries = self._take()
+                stopping = self._stop and not self._entries
+            if entries:
+                self._write(entries)
+            if stopping:
+                return
+
+    def _insert(self, conn, rows: List[tuple]):
+        cursor = conn.cursor()
+        try:
+            for offset in range(0, len(rows), INSERT_CHUNK_SIZE):
+                cursor.executemany(INSERT_AUDIT, rows[offset:offset + INSERT_CHUNK_SIZE])
+        finally:
+            cursor.close()
+
+    def _write(self, entries: List[AuditEntry]) -> bool:
+        rows = [entry.row() for entry in entries]
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                with self.manager.connection() as conn:
+                    self._insert(conn, rows)
+                    conn.commit()
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    time.sleep(min(0.1 * 2 ** attempt, 2))
+                    continue
+                self.failed += len(entries)
+                print(f"Error writing audit batch ({len(entries)} entries): {e}")
+                return False
+            elapsed = time.perf_counter() - start
+            audit_flush_latency.observe(('auditoria',), elapsed)
+            self.last_flush_ms = elapsed * 1000
+            self.written += len(entries)
+            self.flushes += 1
+            return True
+        return False
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Escribe todo lo pendiente y detiene el hilo."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "durability": self.durability,
+            "queue_depth": self.depth(),
+            "queue_capacity": self.capacity,
+            "max_queue_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed": self.failed,
+            "direct_writes": self.direct_writes,
+            "staged": self.staged,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+audit_writer = AuditWriter()
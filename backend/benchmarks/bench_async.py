@@ -0,0 +1,123 @@
+"""Compara el modelo threadpool (endpoints `def`) contra el pool async.
+
+Ejecuta la misma mezcla de consultas de lectura de los endpoints calientes
+con N peticiones concurrentes:
+
+- threadpool: `DatabaseManager` invocado con `anyio.to_thread.run_sync`
+  y un limitador de 40 hilos, igual que Starlette para los endpoints `def`.
+- async: `AsyncDatabaseManager` (aiomysql) directamente en el event loop.
+
+Uso (desde backend/, con la base de datos sembrada):
+
+    python benchmarks/bench_async.py --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+import anyio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from async_database import AsyncDatabaseManager  # noqa: E402
+
+# Consultas de /family/patient, /signos-vitales, /evoluciones y /pacientes
+WORKLOAD = [
+    ("SELECT id, nombre, apellido FROM pacientes WHERE id = %s AND activo = TRUE", True),
+    ("SELECT * FROM signos_vitales WHERE paciente_id = %s ORDER BY fecha_registro DESC LIMIT 20", True),
+    ("SELECT * FROM evoluciones_clinicas WHERE paciente_id = %s ORDER BY fecha_registro DESC LIMIT 10", True),
+    ("SELECT id, nombre, apellido, cedula FROM pacientes WHERE activo = TRUE LIMIT 50", False),
+]
+
+THREADPOOL_TOKENS = 40
+
+
+def pick_query(rng, max_patient):
+    query, takes_patient = rng.choice(WORKLOAD)
+    return query, ((rng.randint(1, max_patient),) if takes_patient else ())
+
+
+def percentile_ms(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000
+
+
+def summarize(name, latencies, elapsed):
+    latencies.sort()
+    print(
+        f"{name:<10} {len(latencies) / elapsed:>9.1f} req/s   "
+        f"p50 {percentile_ms(latencies, 0.50):7.2f} ms   "
+        f"p95 {percentile_ms(latencies, 0.95):7.2f} ms   "
+        f"p99 {percentile_ms(latencies, 0.99):7.2f} ms   "
+        f"mean {statistics.mean(latencies) * 1000:7.2f} ms"
+    )
+
+
+async def run_threadpool(manager, args):
+    limiter = anyio.CapacityLimiter(THREADPOOL_TOKENS)
+    rng = random.Random(args.seed)
+    latencies = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        query, params = pick_query(rng, args.max_patient)
+        async with sem:
+            start = time.perf_counter()
+            await anyio.to_thread.run_sync(manager.fetchall, query, params, limiter=limiter)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(manager, args):
+    rng = random.Random(args.seed)
+    latencies = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        query, params = pick_query(rng, args.max_patient)
+        async with sem:
+            start = time.perf_counter()
+            await manager.fetchall(query, params)
+            latencies.append(time.perf_counter() - start)
+
+    await manager.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    await manager.close()
+    return latencies, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--max-patient", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sync_manager = DatabaseManager()
+    async_manager = AsyncDatabaseManager(sync_manager)
+    print(
+        f"{args.requests} peticiones, concurrencia {args.concurrency}, "
+        f"threadpool={THREADPOOL_TOKENS} hilos / pool sync={sync_manager.pool_size}, "
+        f"pool async={async_manager.max_size}"
+    )
+
+    latencies, elapsed = await run_threadpool(sync_manager, args)
+    summarize("threadpool", latencies, elapsed)
+    sync_manager.close_all()
+
+    latencies, elapsed = await run_async(async_manager, args)
+    summarize("async", latencies, elapsed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""Coste por fila de serializar listados: camino de FastAPI vs. `fast_json`.
+
+- before: filas en diccionarios -> `jsonable_encoder` -> `JSONResponse`,
+          lo que hace FastAPI cuando un endpoint devuelve la lista.
+- after:  filas en tuplas -> `fast_json.rows_response` (conversores por
+          columna + orjson si está instalado).
+
+Usa filas sintéticas con la forma de `signos_vitales` y `pacientes`
+(DECIMAL, DATE, DATETIME, NULL, texto con acentos), comprueba que ambos
+caminos producen exactamente los mismos bytes y no necesita base de datos.
+
+Uso (desde backend/):
+
+    python benchmarks/bench_json.py --rows 20 500 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from fast_json import (  # noqa: E402
+    TYPE_DATE, TYPE_DATETIME, TYPE_NEWDECIMAL, TYPE_TIMESTAMP, orjson, rows_response,
+)
+
+TYPE_LONG, TYPE_VAR_STRING = 3, 253
+
+
+def _description(columns):
+    return [(name, type_code, None, None, None, None, True) for name, type_code in columns]
+
+
+SIGNOS_DESCRIPTION = _description([
+    ("id", TYPE_LONG), ("paciente_id", TYPE_LONG), ("cirugia_id", TYPE_LONG),
+    ("fecha_registro", TYPE_DATETIME), ("presion_sistolica", TYPE_LONG),
+    ("presion_diastolica", TYPE_LONG), ("frecuencia_cardiaca", TYPE_LONG),
+    ("temperatura", TYPE_NEWDECIMAL), ("saturacion_oxigeno", TYPE_LONG),
+    ("frecuencia_respiratoria", TYPE_LONG), ("dolor_escala", TYPE_LONG),
+    ("observaciones", TYPE_VAR_STRING), ("registrado_por_medico_id", TYPE_LONG),
+    ("fecha_creacion", TYPE_TIMESTAMP),
+])
+
+PACIENTES_DESCRIPTION = _description([
+    ("id", TYPE_LONG), ("nombre", TYPE_VAR_STRING), ("apellido", TYPE_VAR_STRING),
+    ("cedula", TYPE_VAR_STRING), ("fecha_nacimiento", TYPE_DATE),
+    ("genero", TYPE_VAR_STRING), ("telefono", TYPE_VAR_STRING), ("fecha_creacion", TYPE_TIMESTAMP),
+])
+
+
+def signos_rows(count, rng):
+    start = datetime(2024, 3, 1, 8, 0, 0)
+    return [
+        (
+            i + 1, rng.randint(1, 2000), rng.choice([None, rng.randint(1, 500)]),
+            start + timedelta(seconds=37 * i, microseconds=rng.choice([0, 250000])),
+            rng.randint(100, 160), rng.randint(60, 100), rng.randint(60, 120),
+            Decimal(f"{rng.uniform(35.0, 39.5):.2f}"), rng.randint(90, 100), rng.randint(12, 22),
+            rng.randint(0, 10), rng.choice([None, "Paciente estable", "Sin cambios, próxima revisión"]),
+            rng.randint(1, 10), start + timedelta(seconds=37 * i),
+        )
+        for i in range(count)
+    ]
+
+
+def pacientes_rows(count, rng):
+    return [
+        (
+            i + 1, rng.choice(["José", "María", "Ana"]), rng.choice(["Pérez", "Núñez", "García"]),
+            f"{rng.randint(10**9, 10**10 - 1)}", date(1950, 1, 1) + timedelta(days=rng.randint(0, 25000)),
+            rng.choice(["M", "F"]), None, datetime(2024, 1, 1) + timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+def before(description, rows):
+    names = [column[0] for column in description]
+    dict_rows = [dict(zip(names, row)) for row in rows]
+    return JSONResponse(content=jsonable_encoder(dict_rows)).body
+
+
+def after(description, rows):
+    return rows_response(description, rows).body
+
+
+def per_row_us(fn, description, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(description, rows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'json (orjson no instalado)'}")
+    print(f"{'tabla':<15} {'filas':>6} {'before µs/fila':>15} {'after µs/fila':>14} {'speedup':>8}")
+    for table, description, generate in (
+        ("signos_vitales", SIGNOS_DESCRIPTION, signos_rows),
+        ("pacientes", PACIENTES_DESCRIPTION, pacientes_rows),
+    ):
+        for count in args.rows:
+            rows = generate(count, rng)
+            if before(description, rows) != after(description, rows):
+                sys.exit(f"Salida distinta para {table} con {count} filas")
+            slow = per_row_us(before, description, rows, args.repeat)
+            fast = per_row_us(after, description, rows, args.repeat)
+            print(f"{table:<15} {count:>6} {slow:>15.2f} {fast:>14.2f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Latencia de /pacientes/search con el índice en memoria a 200k pacientes.
+
+Genera pacientes sintéticos (nombres y apellidos con acentos, cédulas de
+10 dígitos), construye `PatientSearchIndex` y mide búsquedas por prefijo
+de 1 y 2 términos y por cédula. No necesita base de datos.
+
+Uso (desde backend/):
+
+    python benchmarks/bench_patient_search.py --patients 200000 --queries 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from patient_search import PatientSearchIndex  # noqa: E402
+
+NOMBRES = [
+    "José", "María", "Juan", "Ana", "Luis", "Carmen", "Jesús", "Sofía", "Andrés", "Lucía",
+    "Ramón", "Inés", "Óscar", "Begoña", "Tomás", "Mónica", "Iñigo", "Verónica", "Martín", "Raúl",
+    "Valentina", "Sebastián", "Camila", "Nicolás", "Daniela", "Julián", "Paula", "Simón", "Elena", "Joaquín",
+]
+APELLIDOS = [
+    "García", "Rodríguez", "Martínez", "López", "González", "Pérez", "Sánchez", "Ramírez", "Núñez", "Gómez",
+    "Díaz", "Hernández", "Álvarez", "Jiménez", "Muñoz", "Romero", "Suárez", "Ortíz", "Castaño", "Vásquez",
+    "Restrepo", "Quintero", "Cárdenas", "Londoño", "Peña", "Echeverría", "Ibáñez", "Zúñiga", "Bermúdez", "Ospina",
+]
+
+
+def generate_patients(count, rng):
+    cedulas = rng.sample(range(10**9, 10**10), count)
+    return [
+        (
+            i + 1,
+            rng.choice(NOMBRES) + (f" {rng.choice(NOMBRES)}" if rng.random() < 0.4 else ""),
+            f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+            str(cedulas[i]),
+        )
+        for i in range(count)
+    ]
+
+
+def generate_queries(patients, count, rng):
+    queries = []
+    for _ in range(count):
+        _, nombre, apellido, cedula = rng.choice(patients)
+        kind = rng.random()
+        if kind < 0.4:
+            word = rng.choice(apellido.split())
+            queries.append(word[:rng.randint(2, len(word))].lower())
+        elif kind < 0.8:
+            first = nombre.split()[0]
+            last = apellido.split()[0]
+            queries.append(f"{first[:rng.randint(2, len(first))]} {last[:rng.randint(1, len(last))]}")
+        else:
+            queries.append(cedula[:rng.randint(4, 10)])
+    return queries
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--memory", action="store_true", help="medir también la memoria del índice")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patients = generate_patients(args.patients, rng)
+    queries = generate_queries(patients, args.queries, rng)
+
+    index = PatientSearchIndex(manager=None)
+    start = time.perf_counter()
+    index.build(patients)
+    build_seconds = time.perf_counter() - start
+    stats = index.stats()
+    print(f"índice: {stats['patients']} pacientes, {stats['entries']} entradas, "
+          f"construido en {build_seconds:.2f} s")
+    if args.memory:
+        # tracemalloc ralentiza mucho la construcción: se mide en una segunda pasada
+        tracemalloc.start()
+        PatientSearchIndex(manager=None).build(patients)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"pico de memoria al construir: {peak / 2**20:.0f} MiB")
+
+    for q in queries[:200]:
+        index.search(q, args.limit)
+
+    timings = []
+    results = 0
+    for q in queries:
+        start = time.perf_counter()
+        results += len(index.search(q, args.limit))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(f"{len(queries)} búsquedas, {results / len(queries):.1f} resultados de media")
+    print(f"p50 {percentile(timings, 50):.3f} ms  p95 {percentile(timings, 95):.3f} ms  "
+          f"p99 {percentile(timings, 99):.3f} ms  max {max(timings):.3f} ms  "
+          f"media {statistics.mean(timings):.3f} ms")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.upsert(args.patients + i + 1, "Nuevo", "Paciente Prueba", str(5 * 10**10 + i))
+    print(f"upsert: {(time.perf_counter() - start):.3f} ms/paciente (1000 altas)")
+
+
+if __name__ == "__main__":
+    main()
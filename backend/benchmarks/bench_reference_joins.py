@@ -0,0 +1,115 @@
+"""Coste por petición de las consultas calientes con JOIN vs. caché de referencia.
+
+- join:  las consultas de antes, con JOIN a tipos_cirugia y medicos y el
+         CONCAT del nombre del médico en MySQL.
+- cache: la consulta sin JOIN más `reference_data.enrich`, como ahora.
+
+Para cada consulta mide el tiempo total por petición y el tiempo dentro de
+MySQL (cursor.execute + fetchall) sobre pacientes al azar.
+
+Uso (desde backend/, con la base de datos sembrada):
+
+    python benchmarks/bench_reference_joins.py --requests 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from fast_json import RowEncoder  # noqa: E402
+from reference_data import ReferenceDataCache  # noqa: E402
+
+CASES = {
+    "cirugias": (
+        """
+        SELECT c.*, tc.nombre as tipo_cirugia_nombre,
+               CONCAT(m.nombre, ' ', m.apellido) as medico_nombre
+        FROM cirugias c
+        JOIN tipos_cirugia tc ON c.tipo_cirugia_id = tc.id
+        JOIN medicos m ON c.medico_principal_id = m.id
+        WHERE c.paciente_id = %s
+        ORDER BY c.fecha_programada DESC
+        """,
+        """
+        SELECT c.* FROM cirugias c
+        WHERE c.paciente_id = %s
+        ORDER BY c.fecha_programada DESC
+        """,
+        lambda cache: [
+            ("tipo_cirugia_nombre", "tipo_cirugia_id", cache.tipo_cirugia_nombre),
+            ("medico_nombre", "medico_principal_id", cache.medico_nombre),
+        ],
+    ),
+    "evoluciones": (
+        """
+        SELECT e.*, CONCAT(m.nombre, ' ', m.apellido) as medico_nombre
+        FROM evoluciones_clinicas e
+        JOIN medicos m ON e.medico_id = m.id
+        WHERE e.paciente_id = %s
+        ORDER BY e.fecha_registro DESC
+        LIMIT 10
+        """,
+        """
+        SELECT e.* FROM evoluciones_clinicas e
+        WHERE e.paciente_id = %s
+        ORDER BY e.fecha_registro DESC
+        LIMIT 10
+        """,
+        lambda cache: [("medico_nombre", "medico_id", cache.medico_nombre)],
+    ),
+}
+
+
+def run(conn, query, patient_ids, enrich=None):
+    cursor = conn.cursor()
+    sql_time = 0.0
+    start = time.perf_counter()
+    try:
+        for patient_id in patient_ids:
+            sql_start = time.perf_counter()
+            cursor.execute(query, (patient_id,))
+            rows = cursor.fetchall()
+            sql_time += time.perf_counter() - sql_start
+            description = cursor.description
+            if enrich is not None:
+                description, rows = enrich(description, rows)
+            RowEncoder(description).encode(rows)
+    finally:
+        cursor.close()
+    return time.perf_counter() - start, sql_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    manager = DatabaseManager()
+    cache = ReferenceDataCache(manager)
+    cache.load()
+    max_patient = manager.fetchone("SELECT MAX(id) as ultimo FROM pacientes")['ultimo']
+    rng = random.Random(args.seed)
+    patient_ids = [rng.randint(1, max_patient) for _ in range(args.requests)]
+
+    with manager.connection() as conn:
+        for name, (join_query, plain_query, columns) in CASES.items():
+            runs = (
+                ("join", join_query, None),
+                ("cache", plain_query, lambda description, rows: cache.enrich(description, rows, columns(cache))),
+            )
+            for label, query, enrich in runs:
+                run(conn, query, patient_ids[:100], enrich)  # calentamiento
+                total, sql_time = run(conn, query, patient_ids, enrich)
+                print(f"{name:<12} {label:<6} {total / len(patient_ids) * 1000:8.3f} ms/petición  "
+                      f"{sql_time / len(patient_ids) * 1000:8.3f} ms SQL/petición")
+            conn.commit()
+    manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Filas/segundo de la ingesta de signos vitales: una fila por petición vs. lote.
+
+- single: el INSERT + commit por lectura que hace POST /signos-vitales/{id}.
+- batch:  `insert_vitals` (INSERT multi-fila en bloques, una transacción),
+          que es lo que ejecutan POST /signos-vitales/lote y el buffer.
+
+Las filas insertadas se borran al terminar.
+
+Uso (desde backend/, con la base de datos sembrada):
+
+    python benchmarks/bench_vitals_ingest.py --rows 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from vitals_ingest import insert_vitals  # noqa: E402
+
+
+def generate_rows(count, max_patient, seed):
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(seconds=count)
+    return [
+        (
+            rng.randint(1, max_patient), None, start + timedelta(seconds=i),
+            rng.randint(100, 160), rng.randint(60, 100), rng.randint(60, 120),
+            round(rng.uniform(35.0, 39.0), 1), rng.randint(90, 100), rng.randint(12, 22),
+            rng.randint(0, 10), 1,
+        )
+        for i in range(count)
+    ]
+
+
+def run_single(conn, rows):
+    cursor = conn.cursor()
+    try:
+        for row in rows:
+            cursor.execute("""
+                INSERT INTO signos_vitales
+                (paciente_id, cirugia_id, fecha_registro, presion_sistolica, presion_diastolica,
+                 frecuencia_cardiaca, temperatura, saturacion_oxigeno, frecuencia_respiratoria,
+                 dolor_escala, registrado_por_medico_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, row)
+            conn.commit()
+    finally:
+        cursor.close()
+
+
+def run_batch(conn, rows):
+    insert_vitals(conn, rows)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--max-patient", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    manager = DatabaseManager()
+    rows = generate_rows(args.rows, args.max_patient, args.seed)
+
+    with manager.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM signos_vitales")
+        baseline_id = cursor.fetchone()[0]
+        conn.commit()
+        try:
+            for name, runner in (("single", run_single), ("batch", run_batch)):
+                start = time.perf_counter()
+                runner(conn, rows)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<7} {len(rows):>7} filas  {elapsed:8.3f} s  {len(rows) / elapsed:>10.1f} filas/s")
+        finally:
+            cursor.execute("DELETE FROM signos_vitales WHERE id > %s", (baseline_id,))
+            conn.commit()
+            cursor.close()
+    manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Lecturas/segundo que evalúa `VitalsMonitor` con lotes como los del buffer de ingesta.
+
+Genera lecturas sintéticas de `--patients` pacientes (una cada pocos
+segundos por paciente, con alguna alteración ocasional) y las pasa por el
+detector en lotes de `--batch` filas. No necesita base de datos.
+
+Uso (desde backend/):
+
+    python benchmarks/bench_vitals_monitor.py --patients 5000 --readings 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vitals_monitor import VitalsMonitor  # noqa: E402
+
+
+def generate_rows(count, patients, seed):
+    rng = np.random.default_rng(seed)
+    start = datetime.now() - timedelta(seconds=count // patients * 5)
+    patient_ids = np.tile(np.arange(1, patients + 1), count // patients + 1)[:count]
+    offsets = np.arange(count) // patients * 5
+    values = np.column_stack([
+        rng.normal(125, 15, count), rng.normal(78, 10, count), rng.normal(85, 15, count),
+        rng.normal(37.0, 0.6, count), rng.normal(96, 2.5, count), rng.normal(16, 3, count),
+    ]).round(1)
+    return [
+        (int(patient_ids[i]), None, start + timedelta(seconds=int(offsets[i])),
+         *values[i].tolist(), 0, 1)
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--readings", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.readings, args.patients, args.seed)
+    monitor = VitalsMonitor(manager=None)
+    alerts = 0
+    start = time.perf_counter()
+    for offset in range(0, len(rows), args.batch):
+        alerts += len(monitor.observe(rows[offset:offset + args.batch]))
+    elapsed = time.perf_counter() - start
+
+    stats = monitor.stats()
+    print(f"{len(rows)} lecturas  {elapsed:8.3f} s  {len(rows) / elapsed:>10.0f} lecturas/s  "
+          f"{elapsed / len(rows) * 1e6:6.2f} µs/lectura")
+    print(f"alertas {alerts}  suprimidas {stats['suppressed_alerts']}  "
+          f"pacientes con alguna regla activa {stats['critical']['pacientes']}")
+
+
+if __name__ == "__main__":
+    main()
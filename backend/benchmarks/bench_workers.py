@@ -0,0 +1,174 @@
+"""Throughput de `serve.py` según el número de workers.
+
+Para cada valor de --workers arranca `python serve.py --workers N` y lo
+satura durante --duration segundos con --clients procesos generadores de
+carga, cada uno con --concurrency peticiones en vuelo sobre conexiones
+keep-alive. La mezcla es de lectura: búsqueda de pacientes, dashboard,
+vista de sala y signos vitales de pacientes al azar (o las rutas de
+--path). Informa peticiones/s, latencia p50/p99 y la eficiencia frente a
+un worker: rps_N / (N × rps_1), 1.0 es escalado lineal.
+
+En Linux el servidor se fija a las primeras --server-cpus CPUs y los
+generadores al resto, para que la carga no le quite CPU a los workers.
+Con --workers hasta --server-cpus el escalado mide el servidor y no la
+máquina. En una máquina de 16 núcleos, con la base sembrada:
+
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --server-cpus 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from database import db_manager  # noqa: E402
+from load_test import free_port, wait_ready  # noqa: E402
+
+
+async def drive(url, headers, paths, concurrency, warmup, duration, seed):
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    measure_from = time.monotonic() + warmup
+    deadline = measure_from + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=30, limits=limits) as client:
+        async def loop():
+            nonlocal errors
+            while True:
+                started = time.monotonic()
+                if started >= deadline:
+                    return
+                start = time.perf_counter()
+                try:
+                    ok = (await client.get(rng.choice(paths))).status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if started >= measure_from:
+                    if ok:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        errors += 1
+
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def load_process(args, url, headers, paths, cpus, seed, results):
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    results.put(asyncio.run(drive(url, headers, paths, args.concurrency, args.warmup, args.duration, seed)))
+
+
+def build_paths(args):
+    if args.path:
+        return args.path
+    pacientes = [row["id"] for row in db_manager.fetchall(
+        "SELECT id FROM pacientes WHERE activo = TRUE ORDER BY id LIMIT 5000")]
+    db_manager.close_all()
+    if not pacientes:
+        sys.exit("La base no tiene pacientes: siembre con seed_data.py")
+    rng = random.Random(args.seed)
+    paths = [f"/signos-vitales/{rng.choice(pacientes)}" for _ in range(200)]
+    paths += [f"/pacientes/search?q={q}" for q in ("gar", "mar", "lopez ana", "100000")] * 25
+    paths += ["/dashboard/stats"] * 100
+    paths += [f"/pacientes/sala?ids={','.join(str(p) for p in rng.sample(pacientes, min(20, len(pacientes))))}"
+              for _ in range(100)]
+    return paths
+
+
+def split_cpus(server_cpus: int):
+    if not hasattr(os, 'sched_getaffinity'):
+        return None, None
+    available = sorted(os.sched_getaffinity(0))
+    server, load = available[:server_cpus], available[server_cpus:]
+    if not load:
+        print("Aviso: no quedan CPUs libres para los generadores; comparten CPU con el servidor")
+        return set(server), None
+    return set(server), set(load)
+
+
+def start_server(workers: int, port: int, cpus):
+    env = dict(os.environ, LOGIN_RATE_PER_USER="1000000", LOGIN_RATE_PER_IP="1000000")
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+        preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None,
+    )
+
+
+def run_once(args, workers: int, paths, server_cpus, load_cpus) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = start_server(workers, port, server_cpus)
+    try:
+        wait_ready(url, server)
+        response = httpx.post(f"{url}/login", json={"username": args.staff_user, "password": args.staff_password},
+                              timeout=30)
+        if response.status_code != 200:
+            sys.exit(f"No se pudo iniciar sesión como {args.staff_user}: {response.status_code}")
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=load_process,
+                                           args=(args, url, headers, paths, load_cpus, args.seed + i, results))
+                   for i in range(args.clients)]
+        for client in clients:
+            client.start()
+        latencies, errors = [], 0
+        for _ in clients:
+            client_latencies, client_errors = results.get()
+            latencies += client_latencies
+            errors += client_errors
+        for client in clients:
+            client.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p99 = np.percentile(values, [50, 99]).tolist()
+    return {"workers": workers, "rps": len(latencies) / args.duration, "p50": p50, "p99": p99, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="números de workers separados por comas")
+    parser.add_argument("--server-cpus", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="procesos generadores de carga")
+    parser.add_argument("--concurrency", type=int, default=32, help="peticiones en vuelo por generador")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--staff-user", default="dr.martinez")
+    parser.add_argument("--staff-password", default="password123")
+    parser.add_argument("--path", action="append", help="ruta a pedir (repetible); por defecto la mezcla de lectura")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    worker_counts = [int(value) for value in args.workers.split(',')]
+    if max(worker_counts) > args.server_cpus:
+        print(f"Aviso: más workers que --server-cpus ({args.server_cpus}); a partir de ahí no escala")
+    server_cpus, load_cpus = split_cpus(args.server_cpus)
+    paths = build_paths(args)
+
+    print(f"{'workers':>7} {'rps':>10} {'p50 ms':>8} {'p99 ms':>8} {'err':>6} {'speedup':>8} {'eficiencia':>10}")
+    baseline = None
+    for workers in worker_counts:
+        result = run_once(args, workers, paths, server_cpus, load_cpus)
+        baseline = baseline or result["rps"] / workers
+        speedup = result["rps"] / baseline if baseline else 0.0
+        print(f"{workers:>7} {result['rps']:>10.1f} {result['p50']:>8.2f} {result['p99']:>8.2f} "
+              f"{result['errors']:>6} {speedup:>8.2f} {speedup / workers:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+"""Prueba de carga de la API con una mezcla de tráfico realista.
+
+`run` arranca uvicorn con `main:app` contra la base configurada en DB_*
+(sembrada con seed_data.py) y reproduce durante --duration segundos:
+
+- familias: /family/login y sondeo de /family/patient/{id} cada
+  --family-interval segundos con If-None-Match, como el frontend;
+- personal médico: /login y luego listados, signos vitales, evoluciones,
+  rollups, búsqueda y dashboard, registrando signos y evoluciones;
+- cirugías: cambios de estado a --surgery-rate por segundo;
+- ráfagas de --login-burst inicios de sesión simultáneos cada --login-every s.
+
+Por endpoint (plantilla de ruta) informa rps, latencia p50/p95/p99, errores
+y sentencias SQL por petición (cabecera X-SQL-Count: el servidor que se
+arranca aquí tiene METRICS_DEBUG_HEADERS=1 y los límites de login
+desactivados). Los primeros --warmup segundos no cuentan. El resultado se
+guarda en JSON; `compare` marca las regresiones entre dos corridas y sale
+con código 1 si hay alguna.
+
+Los escenarios escriben en la base: vuelva a sembrar con la misma semilla
+antes de cada corrida que se vaya a comparar.
+
+Uso (desde backend/):
+
+    python seed_data.py --scale 10 --reset && python rehash_passwords.py
+    python benchmarks/load_test.py run --duration 60 --out antes.json
+    python benchmarks/load_test.py run --duration 60 --out despues.json
+    python benchmarks/load_test.py compare antes.json despues.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from database import db_manager  # noqa: E402
+
+ESTADOS_CIRUGIA = ['Programada', 'Pre-operatorio', 'En_proceso', 'Post-operatorio', 'Finalizada']
+
+
+class Recorder:
+    """Latencias, estados y SQL por endpoint de las peticiones dentro de la ventana de medición."""
+
+    def __init__(self):
+        self.measuring = False
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.sql_counts: Dict[str, List[int]] = defaultdict(list)
+        self.sql_ms: Dict[str, List[float]] = defaultdict(list)
+
+    def record(self, endpoint: str, status, elapsed: float, headers=None):
+        if not self.measuring:
+            return
+        self.latencies[endpoint].append(elapsed)
+        self.statuses[endpoint][str(status)] += 1
+        if headers is not None and 'x-sql-count' in headers:
+            self.sql_counts[endpoint].append(int(headers['x-sql-count']))
+            self.sql_ms[endpoint].append(float(headers['x-sql-time-ms']))
+
+    def summary(self, seconds: float) -> dict:
+        endpoints = {endpoint: _summarize(
+            self.latencies[endpoint], self.statuses[endpoint],
+            self.sql_counts[endpoint], self.sql_ms[endpoint], seconds,
+        ) for endpoint in sorted(self.latencies)}
+        total = _summarize(
+            [value for values in self.latencies.values() for value in values],
+            sum(self.statuses.values(), Counter()),
+            [value for values in self.sql_counts.values() for value in values],
+            [value for values in self.sql_ms.values() for value in values],
+            seconds,
+        )
+        return {"endpoints": endpoints, "total": total}
+
+
+def _summarize(latencies, statuses: Counter, sql_counts, sql_ms, seconds: float) -> dict:
+    errors = sum(count for status, count in statuses.items() if status[0] not in '23')
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]).tolist()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / seconds, 2),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "status": dict(sorted(statuses.items())),
+        "latency_ms": {
+            "p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3),
+            "mean": round(float(values.mean()), 3), "max": round(float(values.max()), 3),
+        },
+        "sql_per_request": round(float(np.mean(sql_counts)), 3) if sql_counts else None,
+        "sql_ms_per_request": round(float(np.mean(sql_ms)), 3) if sql_ms else None,
+    }
+
+
+class LoadTest:
+    def __init__(self, args, client: httpx.AsyncClient, fixtures: dict):
+        self.args = args
+        self.client = client
+        self.fixtures = fixtures
+        self.recorder = Recorder()
+        self.deadline = 0.0
+
+    async def request(self, method: str, endpoint: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, "error", time.perf_counter() - start)
+            return None
+        self.recorder.record(endpoint, response.status_code, time.perf_counter() - start, response.headers)
+        return response
+
+    def running(self) -> bool:
+        return time.monotonic() < self.deadline
+
+    async def sleep(self, rng: random.Random, seconds: float):
+        # ±25 % para que los actores no se sincronicen
+        await asyncio.sleep(seconds * rng.uniform(0.75, 1.25))
+
+    async def staff_login(self) -> Optional[dict]:
+        response = await self.request("POST", "POST /login", "/login", json={
+            "username": self.args.staff_user, "password": self.args.staff_password,
+        })
+        if response is None or response.status_code != 200:
+            return None
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    # -- actores
+
+    async def family(self, rng: random.Random, codes: dict):
+        await asyncio.sleep(rng.uniform(0, self.args.family_interval))
+        response = await self.request("POST", "POST /family/login", "/family/login", json={
+            "patient_code": codes["codigo_paciente"], "family_code": codes["codigo_familiar"],
+        })
+        if response is None or response.status_code != 200:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        url = f"/family/patient/{codes['paciente_id']}"
+        etag = None
+        while self.running():
+            request_headers = dict(headers, **({"If-None-Match": etag} if etag else {}))
+            response = await self.request("GET", "GET /family/patient/{patient_id}", url, headers=request_headers)
+            if response is not None and response.status_code == 200:
+                etag = response.headers.get("etag")
+            await self.sleep(rng, self.args.family_interval)
+
+    async def staff(self, rng: random.Random):
+        await asyncio.sleep(rng.uniform(0, self.args.staff_think))
+        headers = await self.staff_login()
+        if headers is None:
+            return
+        pacientes, medicos = self.fixtures["pacientes"], self.fixtures["medicos"]
+        actions = [
+            (3, lambda p: self.request("GET", "GET /pacientes", "/pacientes", params={"limit": 50}, headers=headers)),
+            (4, lambda p: self.request("GET", "GET /signos-vitales/{paciente_id}", f"/signos-vitales/{p}",
+                                       headers=headers)),
+            (3, lambda p: self.request("POST", "POST /signos-vitales/{paciente_id}", f"/signos-vitales/{p}",
+                                       headers=headers, json={
+                                           "presion_sistolica": rng.randint(100, 160),
+                                           "presion_diastolica": rng.randint(60, 100),
+                                           "frecuencia_cardiaca": rng.randint(60, 120),
+                                           "temperatura": round(rng.uniform(35.5, 38.5), 1),
+                                           "saturacion_oxigeno": rng.randint(90, 100),
+                                           "dolor_escala": rng.randint(0, 10),
+                                       })),
+            (2, lambda p: self.request("GET", "GET /evoluciones/{paciente_id}", f"/evoluciones/{p}",
+                                       headers=headers)),
+            (1, lambda p: self.request("POST", "POST /evoluciones/{paciente_id}", f"/evoluciones/{p}",
+                                       headers=headers, json={
+                                           "estado_general": rng.choice(["Estable", "Mejorado", "Regular"]),
+                                           "descripcion": "Control de rutina",
+                                           "medico_id": rng.choice(medicos),
+                                       })),
+            (1, lambda p: self.request("GET", "GET /signos-vitales/{paciente_id}/rollup",
+                                       f"/signos-vitales/{p}/rollup", params={"bucket": "1h"}, headers=headers)),
+            (1, lambda p: self.request("GET", "GET /pacientes/search", "/pacientes/search",
+                                       params={"q": rng.choice(["gar", "mar", "lopez ana", "100000"])},
+                                       headers=headers)),
+            (2, lambda p: self.request("GET", "GET /dashboard/stats", "/dashboard/stats", headers=headers)),
+        ]
+        weights = [weight for weight, _ in actions]
+        while self.running():
+            _, action = rng.choices(actions, weights)[0]
+            await action(rng.choice(pacientes))
+            await self.sleep(rng, self.args.staff_think)
+
+    async def surgeries(self, rng: random.Random):
+        if self.args.surgery_rate <= 0 or not self.fixtures["cirugias"]:
+            return
+        headers = await self.staff_login()
+        if headers is None:
+            return
+        cirugias = {row["id"]: row["estado"] for row in self.fixtures["cirugias"]}
+        while self.running():
+            cirugia_id = rng.choice(list(cirugias))
+            # Avanza por el flujo normal; al finalizar vuelve a empezar
+            estado = ESTADOS_CIRUGIA[(ESTADOS_CIRUGIA.index(cirugias[cirugia_id]) + 1) % len(ESTADOS_CIRUGIA)] \
+                if cirugias[cirugia_id] in ESTADOS_CIRUGIA else ESTADOS_CIRUGIA[0]
+            response = await self.request("PUT", "PUT /cirugias/{cirugia_id}/estado",
+                                          f"/cirugias/{cirugia_id}/estado", params={"estado": estado},
+                                          headers=headers)
+            if response is not None and response.status_code == 200:
+                cirugias[cirugia_id] = estado
+            await self.sleep(rng, 1 / self.args.surgery_rate)
+
+    async def login_bursts(self, rng: random.Random):
+        if self.args.login_burst <= 0:
+            return
+        while self.running():
+            await self.sleep(rng, self.args.login_every)
+            await asyncio.gather(*(self.staff_login() for _ in range(self.args.login_burst)))
+
+    async def run(self) -> dict:
+        rng = random.Random(self.args.seed)
+        families = self.fixtures["codigos"]
+        self.deadline = time.monotonic() + self.args.warmup + self.args.duration
+        actors = [self.family(random.Random(rng.random()), codes) for codes in families]
+        actors += [self.staff(random.Random(rng.random())) for _ in range(self.args.staff)]
+        actors += [self.surgeries(random.Random(rng.random())), self.login_bursts(random.Random(rng.random()))]
+        tasks = [asyncio.create_task(actor) for actor in actors]
+        await asyncio.sleep(self.args.warmup)
+        self.recorder.measuring = True
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        self.recorder.measuring = False
+        return self.recorder.summary(time.perf_counter() - start)
+
+
+# -- preparación
+
+def read_codes_file(path: str, limit: int) -> List[dict]:
+    """Códigos que escribió `seed_data.py --codes-file`, con su paciente."""
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))[:limit]
+    return [dict(row, paciente_id=int(row["paciente_id"])) for row in rows]
+
+
+def load_fixtures(args) -> dict:
+    if args.codes_file:
+        codigos = read_codes_file(args.codes_file, args.families)
+    else:
+        codigos = db_manager.fetchall("""
+            SELECT codigo_paciente, codigo_familiar, paciente_id
+            FROM codigos_familiares WHERE activo = TRUE
+            ORDER BY id LIMIT %s
+        """, (args.families,))
+    if len(codigos) < args.families:
+        print(f"Solo hay {len(codigos)} códigos familiares activos; se usan esos")
+    pacientes = [row["id"] for row in db_manager.fetchall(
+        "SELECT id FROM pacientes WHERE activo = TRUE ORDER BY id LIMIT 5000")]
+    medicos = [row["id"] for row in db_manager.fetchall("SELECT id FROM medicos ORDER BY id LIMIT 100")]
+    cirugias = db_manager.fetchall("""
+        SELECT id, estado FROM cirugias
+        WHERE estado NOT IN ('Finalizada', 'Cancelada')
+        ORDER BY id LIMIT 1000
+    """)
+    dataset = {
+        table: db_manager.fetchone(f"SELECT COUNT(*) as total FROM {table}")["total"]
+        for table in ("pacientes", "cirugias", "signos_vitales", "evoluciones_clinicas")
+    }
+    db_manager.close_all()
+    if not pacientes or not medicos:
+        sys.exit("La base no tiene pacientes o médicos: siembre con seed_data.py")
+    return {"codigos": codigos, "pacientes": pacientes, "medicos": medicos, "cirugias": cirugias,
+            "dataset": dataset}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ, METRICS_DEBUG_HEADERS="1",
+               LOGIN_RATE_PER_USER="1000000", LOGIN_RATE_PER_IP="1000000")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def wait_ready(url: str, server: Optional[subprocess.Popen], timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            sys.exit(f"El servidor terminó al arrancar (código {server.returncode})")
+        try:
+            if httpx.get(f"{url}/test-db", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    sys.exit(f"El servidor no respondió en {timeout:.0f} s")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def execute(args, url: str, fixtures: dict) -> dict:
+    connections = len(fixtures["codigos"]) + args.staff + args.login_burst + 10
+    async with httpx.AsyncClient(base_url=url, timeout=30,
+                                 limits=httpx.Limits(max_connections=connections,
+                                                     max_keepalive_connections=connections)) as client:
+        return await LoadTest(args, client, fixtures).run()
+
+
+def run_command(args):
+    fixtures = load_fixtures(args)
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = start_server(port)
+    try:
+        wait_ready(url, server)
+        started_at = datetime.now().isoformat(timespec="seconds")
+        print(f"{len(fixtures['codigos'])} familias, {args.staff} médicos, {args.surgery_rate} cambios de "
+              f"estado/s, ráfagas de {args.login_burst} logins cada {args.login_every} s; "
+              f"{args.warmup:.0f} s de calentamiento + {args.duration:.0f} s contra {url}")
+        results = asyncio.run(execute(args, url, fixtures))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    results["meta"] = {
+        "started_at": started_at,
+        "git": git_revision(),
+        "url": url if args.url else None,
+        "dataset": fixtures["dataset"],
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("func", "out", "url", "staff_password")},
+    }
+    print_results(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.out}")
+
+
+def print_results(results: dict):
+    print(f"{'endpoint':<42} {'req':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'err':>5} {'sql/req':>8}")
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for endpoint, stats in rows:
+        latency = stats["latency_ms"]
+        sql = "-" if stats["sql_per_request"] is None else f"{stats['sql_per_request']:.2f}"
+        print(f"{endpoint:<42} {stats['requests']:>7} {stats['rps']:>8.1f} {latency['p50']:>8.2f} "
+              f"{latency['p95']:>8.2f} {latency['p99']:>8.2f} {stats['errors']:>5} {sql:>8}")
+
+
+# -- comparación
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def regressions(before: dict, after: dict, threshold: float, min_ms: float) -> List[str]:
+    """Motivos de regresión de un endpoint entre dos corridas."""
+    found = []
+    for quantile in ("p95", "p99"):
+        old, new = before["latency_ms"][quantile], after["latency_ms"][quantile]
+        if new - old > min_ms and _change(old, new) > threshold:
+            found.append(f"{quantile} {old:.2f} -> {new:.2f} ms ({_change(old, new):+.0f} %)")
+    if _change(before["rps"], after["rps"]) < -threshold:
+        found.append(f"rps {before['rps']:.1f} -> {after['rps']:.1f} ({_change(before['rps'], after['rps']):+.0f} %)")
+    if before["sql_per_request"] is not None and after["sql_per_request"] is not None \
+            and after["sql_per_request"] - before["sql_per_request"] >= 0.5:
+        found.append(f"sql/req {before['sql_per_request']:.2f} -> {after['sql_per_request']:.2f}")
+    if after["error_rate"] - before["error_rate"] > 0.01:
+        found.append(f"errores {before['error_rate']:.1%} -> {after['error_rate']:.1%}")
+    return found
+
+
+def compare_command(args):
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"antes:   {before['meta'].get('git')} ({before['meta'].get('started_at')})")
+    print(f"después: {after['meta'].get('git')} ({after['meta'].get('started_at')})")
+    if before["meta"].get("dataset") != after["meta"].get("dataset"):
+        print("Aviso: las corridas se hicieron con datos distintos")
+
+    print(f"{'endpoint':<42} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>7} {'sql/req':>13}")
+    failed = False
+    endpoints = sorted(set(before["endpoints"]) | set(after["endpoints"]))
+    for endpoint in endpoints + ["TOTAL"]:
+        old = before["total"] if endpoint == "TOTAL" else before["endpoints"].get(endpoint)
+        new = after["total"] if endpoint == "TOTAL" else after["endpoints"].get(endpoint)
+        if old is None or new is None:
+            print(f"{endpoint:<42} {'solo en ' + ('después' if old is None else 'antes'):>8}")
+            continue
+        changes = " ".join(
+            f"{_change(old['latency_ms'][q], new['latency_ms'][q]):>+7.0f}%" for q in ("p50", "p95", "p99"))
+        sql = "-" if old["sql_per_request"] is None or new["sql_per_request"] is None else \
+            f"{old['sql_per_request']:.1f} -> {new['sql_per_request']:.1f}"
+        print(f"{endpoint:<42} {changes} {_change(old['rps'], new['rps']):>+6.0f}% {sql:>13}")
+        for reason in regressions(old, new, args.threshold, args.min_ms):
+            failed = True
+            print(f"    REGRESIÓN {reason}")
+    sys.exit(1 if failed else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="ejecuta la carga y guarda los resultados")
+    run.add_argument("--duration", type=float, default=60)
+    run.add_argument("--warmup", type=float, default=10)
+    run.add_argument("--families", type=int, default=200)
+    run.add_argument("--codes-file", help="CSV de seed_data.py con los códigos familiares (por defecto, de la base)")
+    run.add_argument("--family-interval", type=float, default=5, help="segundos entre sondeos de cada familia")
+    run.add_argument("--staff", type=int, default=20)
+    run.add_argument("--staff-think", type=float, default=1, help="segundos entre acciones de cada médico")
+    run.add_argument("--staff-user", default="dr.martinez")
+    run.add_argument("--staff-password", default="password123")
+    run.add_argument("--surgery-rate", type=float, default=1, help="cambios de estado por segundo")
+    run.add_argument("--login-burst", type=int, default=10)
+    run.add_argument("--login-every", type=float, default=15)
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--url", help="usar un servidor ya arrancado (con METRICS_DEBUG_HEADERS=1 para ver el SQL)")
+    run.add_argument("--out", help="archivo JSON de resultados")
+    run.set_defaults(func=run_command)
+
+    compare = commands.add_parser("compare", help="compara dos archivos de resultados")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--threshold", type=float, default=10, help="% de empeoramiento tolerado")
+    compare.add_argument("--min-ms", type=float, default=1, help="diferencia mínima de latencia a considerar")
+    compare.set_defaults(func=compare_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""Coordinación entre los workers de `serve.py`.
+
+Con varios procesos cada worker tiene sus propias cachés, índices y
+contadores. `serve.py` arranca antes que los workers un proceso hub que
+escucha en un socket Unix local y guarda lo que tiene que ser único:
+
+- las versiones de cada paciente (ETag / Last-Modified iguales en todos los workers);
+- las ventanas de los límites de login;
+- la última foto de las métricas de cada worker, para que /metrics sume todas;
+- locks con nombre (p. ej. la reserva de huecos de la agenda).
+
+El hub numera y reenvía a todos los workers los eventos que publica uno
+de ellos (invalidaciones, cambios de agenda, lecturas de signos...), así
+que todos los aplican en el mismo orden. Cada worker aplica los eventos en
+un hilo con el manejador registrado para el canal (`register`).
+
+El hub no envía con su lock tomado: cada worker tiene una cola de salida y
+un hilo que la vacía. Un worker con más de `CLUSTER_MAX_PENDING_EVENTS`
+eventos sin leer se desconecta; al volver a suscribirse recibe las versiones
+actuales y reconstruye su estado local con los manejadores de `on_resync`.
+
+Sin `CLUSTER_SOCKET` (un solo proceso, p. ej. `uvicorn main:app`) el
+cliente queda deshabilitado: `replicate` aplica solo en local y el resto
+de operaciones no hacen nada.
+"""
+import os
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Cada cuánto publica cada worker su foto de métricas en el hub
+METRICS_PUSH_SECONDS = float(os.getenv('CLUSTER_METRICS_SECONDS', 2))
+# Eventos sin enviar a un worker antes de desconectarlo para que se resincronice
+MAX_PENDING_EVENTS = int(os.getenv('CLUSTER_MAX_PENDING_EVENTS', 10000))
+# Espera máxima entre intentos de volver a suscribirse al hub
+MAX_RESUBSCRIBE_SECONDS = 5
+
+
+class _Subscriber:
+    """Cola de salida de un worker y el hilo que se la envía."""
+
+    def __init__(self, pid: int, conn, max_pending: int):
+        self.pid = pid
+        self.conn = conn
+        self.max_pending = max_pending
+        self.closed = False
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, name=f"cluster-send-{pid}", daemon=True).start()
+
+    def push(self, message) -> bool:
+        """Encola sin bloquear; False si el worker va demasiado atrasado o ya se cerró."""
+        with self._cond:
+            if self.closed or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.append(message)
+            self._cond.notify()
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+                message = self._pending.popleft()
+            try:
+                self.conn.send(message)
+            except (OSError, ValueError):
+                self.close()
+                return
+
+    def close(self):
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._pending.clear()
+            self._cond.notify()
+        # shutdown despierta un send bloqueado y el recv de `_serve`; el worker ve EOF
+        try:
+            sock = socket.socket(fileno=os.dup(self.conn.fileno()))
+        except (OSError, ValueError):
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+
+class ClusterHub:
+    """Servidor del proceso hub: un hilo por conexión y un lock global para el estado."""
+
+    def __init__(self, address: str, authkey: bytes):
+        from rate_limit import SlidingWindowLimiter
+
+        self._limiter_class = SlidingWindowLimiter
+        self.listener = Listener(address, family='AF_UNIX', authkey=authkey)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._subscribers: Dict[int, _Subscriber] = {}
+        self._versions: Dict[Tuple[str, object], Tuple[int, float]] = {}
+        self._limiters: Dict[str, object] = {}
+        self._metrics: Dict[int, dict] = {}
+        self._named_locks: Dict[str, threading.Lock] = {}
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError as e:
+                # Cliente que no pasó la autenticación
+                print(f"Cluster hub rejected connection: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _broadcast(self, origin: int, channel: str, payload: tuple) -> int:
+        """Numera y encola un evento para todos los suscriptores; llamar con `_lock`."""
+        self._seq += 1
+        message = ('event', self._seq, origin, channel, payload)
+        for pid, subscriber in list(self._subscribers.items()):
+            if not subscriber.push(message):
+                # Atrasado o caído: no frena a los demás; al volver se resincroniza
+                del self._subscribers[pid]
+                if not subscriber.closed:
+                    print(f"Cluster hub dropped worker {pid}: {subscriber.max_pending} events behind")
+                subscriber.close()
+        return self._seq
+
+    def _serve(self, conn):
+        subscriber = None
+        held: List[threading.Lock] = []
+        try:
+            while True:
+                op, *args = conn.recv()
+                if op == 'subscribe':
+                    (pid,) = args
+                    subscriber = _Subscriber(pid, conn, MAX_PENDING_EVENTS)
+                    with self._lock:
+                        # Bajo el lock: ningún evento queda entre la foto y la suscripción
+                        subscriber.push(('hello', self._seq, dict(self._versions)))
+                        previous = self._subscribers.get(pid)
+                        self._subscribers[pid] = subscriber
+                    if previous is not None:
+                        previous.close()
+                elif op == 'publish':
+                    origin, channel, payload = args
+                    with self._lock:
+                        conn.send(self._broadcast(origin, channel, payload))
+                elif op == 'bump':
+                    origin, channel, key = args
+                    with self._lock:
+                        version = self._versions.get((channel, key), (0, 0.0))[0] + 1
+                        modified = time.time()
+                        self._versions[(channel, key)] = (version, modified)
+                        self._broadcast(origin, channel, (key, version, modified))
+                    conn.send((version, modified))
+                elif op == 'limiter':
+                    name, limit, window, method, key = args
+                    with self._lock:
+                        limiter = self._limiters.get(name)
+                        if limiter is None:
+                            limiter = self._limiters[name] = self._limiter_class(limit, window)
+                    conn.send(getattr(limiter, method)(key))
+                elif op == 'metrics_put':
+                    pid, snapshot = args
+                    with self._lock:
+                        self._metrics[pid] = snapshot
+                    conn.send(None)
+                elif op == 'metrics':
+                    with self._lock:
+                        conn.send(list(self._metrics.values()))
+                elif op == 'lock':
+                    (name,) = args
+                    with self._lock:
+                        named = self._named_locks.setdefault(name, threading.Lock())
+                    named.acquire()
+                    held.append(named)
+                    # El worker espera a haber aplicado hasta aquí antes de usar el recurso
+                    with self._lock:
+                        conn.send(self._seq)
+                else:
+                    conn.send(ValueError(f"Operación desconocida: {op}"))
+        except (EOFError, OSError):
+            pass
+        finally:
+            # Un worker que muere no deja locks tomados ni métricas viejas
+            for named in held:
+                named.release()
+            if subscriber is not None:
+                subscriber.close()
+                with self._lock:
+                    current = self._subscribers.get(subscriber.pid)
+                    if current is None or current is subscriber:
+                        self._subscribers.pop(subscriber.pid, None)
+                        self._metrics.pop(subscriber.pid, None)
+            conn.close()
+
+
+class ClusterClient:
+    """Conexión de un worker con el hub."""
+
+    def __init__(self):
+        self.address = os.getenv('CLUSTER_SOCKET')
+        self.enabled = False
+        self.worker_id: Optional[int] = None
+        self.metrics_source: Optional[Callable[[], dict]] = None
+        # Tras perder eventos (el hub desconectó a este worker): reconstruyen el estado local
+        self.on_resync: List[Callable[[], None]] = []
+        self._handlers: Dict[str, Callable] = {}
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._subscription = None
+        self._applied = 0
+        self._applied_cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.published = 0
+        self.received = 0
+        self.handler_errors = 0
+        self.resyncs = 0
+
+    def _connect(self):
+        return Client(self.address, family='AF_UNIX', authkey=bytes.fromhex(os.environ['CLUSTER_AUTHKEY']))
+
+    def register(self, channel: str, handler: Callable):
+        """Manejador de los eventos del canal; recibe los argumentos publicados."""
+        self._handlers[channel] = handler
+
+    # -- ciclo de vida
+
+    def start(self):
+        if not self.address or self.enabled:
+            return
+        # Tras el fork: el pid del worker, no el del proceso que importó el módulo
+        self.worker_id = os.getpid()
+        self._conn = self._connect()
+        self._subscribe()
+        self.enabled = True
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._listen, name="cluster-events", daemon=True),
+            threading.Thread(target=self._push_metrics, name="cluster-metrics", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.enabled = False
+        for conn in (self._subscription, self._conn):
+            if conn is not None:
+                conn.close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _subscribe(self):
+        self._subscription = self._connect()
+        self._subscription.send(('subscribe', self.worker_id))
+        _, seq, versions = self._subscription.recv()
+        # Un worker nuevo parte de las versiones actuales para no dar 304 con datos viejos
+        for (channel, key), (version, modified) in versions.items():
+            self._apply(channel, (key, version, modified))
+        with self._applied_cond:
+            self._applied = seq
+            self._applied_cond.notify_all()
+
+    def _resubscribe(self) -> bool:
+        """Vuelve a suscribirse tras perder eventos; False si se está deteniendo."""
+        delay = 0.1
+        while not self._stop.is_set():
+            try:
+                self._subscription.close()
+                self._subscribe()
+            except (OSError, EOFError) as e:
+                print(f"Error resubscribing to cluster hub: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RESUBSCRIBE_SECONDS)
+                continue
+            self.resyncs += 1
+            # Los eventos que llegan mientras tanto esperan en la cola del hub
+            for resync in self.on_resync:
+                try:
+                    resync()
+                except Exception as e:
+                    self.handler_errors += 1
+                    print(f"Error resyncing after cluster reconnect: {e}")
+            return True
+        return False
+
+    def _apply(self, channel: str, payload: tuple):
+        handler = self._handlers.get(channel)
+        if handler is None:
+            return
+        try:
+            handler(*payload)
+        except Exception as e:
+            self.handler_errors += 1
+            print(f"Error applying cluster event {channel}: {e}")
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                _, seq, origin, channel, payload = self._subscription.recv()
+            except (EOFError, OSError):
+                if self._stop.is_set():
+                    return
+                print("Lost connection to cluster hub, resubscribing")
+                if not self._resubscribe():
+                    return
+                continue
+            # Quien publica ya aplicó el cambio en local
+            if origin != self.worker_id:
+                self.received += 1
+                self._apply(channel, payload)
+            with self._applied_cond:
+                self._applied = seq
+                self._applied_cond.notify_all()
+
+    def _push_metrics(self):
+        while not self._stop.wait(METRICS_PUSH_SECONDS):
+            try:
+                self.call('metrics_put', self.worker_id, self.metrics_source())
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"Error pushing metrics to cluster hub: {e}")
+
+    # -- operaciones
+
+    def call(self, *message):
+        with self._conn_lock:
+            self._conn.send(message)
+            result = self._conn.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def publish(self, channel: str, *args):
+        """Envía el evento a los demás workers (no se aplica en este)."""
+        if self.enabled:
+            self.call('publish', self.worker_id, channel, args)
+            self.published += 1
+
+    def replicate(self, channel: str, *args):
+        """Aplica el evento en este worker y lo publica a los demás."""
+        self._handlers[channel](*args)
+        self.publish(channel, *args)
+
+    def bump(self, channel: str, key) -> Optional[Tuple[int, float]]:
+        """Nueva (versión, fecha) de `key`, difundida en `channel`; None sin hub."""
+        if not self.enabled:
+            return None
+        self.published += 1
+        return self.call('bump', self.worker_id, channel, key)
+
+    def limiter(self, name: str, limit: int, window: float, method: str, key: str):
+        return self.call('limiter', name, limit, window, method, key)
+
+    def metrics(self, local: dict) -> List[dict]:
+        """Fotos de métricas de todos los workers, con la de este al día."""
+        if not self.enabled:
+            return [local]
+        self.call('metrics_put', self.worker_id, local)
+        return self.call('metrics')
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = 30):
+        """Lock entre workers; al entrar este worker ya aplicó los eventos publicados antes de obtenerlo."""
+        if not self.enabled:
+            yield
+            return
+        conn = self._connect()
+        try:
+            conn.send(('lock', name))
+            seq = conn.recv()
+            with self._applied_cond:
+                if not self._applied_cond.wait_for(lambda: self._applied >= seq, timeout):
+                    raise TimeoutError(f"Eventos del cluster sin aplicar tras {timeout:.0f} s")
+            yield
+        finally:
+            # Cerrar la conexión libera el lock en el hub
+            conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "worker": self.worker_id or os.getpid(),
+            "published": self.published,
+            "received": self.received,
+            "applied_seq": self._applied,
+            "handler_errors": self.handler_errors,
+            "resyncs": self.resyncs,
+        }
+
+
+cluster = ClusterClient()
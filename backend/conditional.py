@@ -0,0 +1,95 @@
+"""GET condicionales (ETag / If-None-Match) para los endpoints que se consultan por polling.
+
+Las versiones son contadores en memoria que incrementan los endpoints de
+escritura (vía `invalidate_patient`), así que comprobar si el cliente ya
+tiene la última versión no cuesta ninguna consulta. El ETag incluye la
+marca de arranque del proceso para que un reinicio no dé falsos 304; con
+`serve.py` la app se importa antes del fork, así que todos los workers
+comparten la marca y el hub de `cluster` asigna las versiones.
+"""
+import gzip
+import os
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+PROCESS_EPOCH = f"{time.time_ns():x}"
+
+# Cuerpos a partir de este tamaño se comprimen si el cliente acepta gzip (0 = nunca)
+GZIP_MIN_BYTES = int(os.getenv('RESPONSE_GZIP_MIN_BYTES', 2048))
+
+
+class VersionCounter:
+    """Versión y fecha de última modificación por clave (p. ej. id de paciente)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[object, Tuple[int, float]] = {}
+        self._started = time.time()
+
+    def bump(self, key):
+        with self._lock:
+            version, _ = self._versions.get(key, (0, self._started))
+            self._versions[key] = (version + 1, time.time())
+
+    def advance(self, key, version: int, modified: float):
+        """Fija una versión asignada fuera del proceso (hub de `cluster`); nunca retrocede."""
+        with self._lock:
+            if version > self._versions.get(key, (0, self._started))[0]:
+                self._versions[key] = (version, modified)
+
+    def current(self, key) -> Tuple[int, float]:
+        """Leer antes de consultar los datos: si hay una escritura en medio, el ETag queda viejo, nunca adelantado."""
+        with self._lock:
+            return self._versions.get(key, (0, self._started))
+
+
+patient_versions = VersionCounter()
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + '-'.join(str(part) for part in (PROCESS_EPOCH,) + parts) + '"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Comparación débil (RFC 9110 §13.1.2)
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(',')}
+
+
+def _validator_headers(etag: str, last_modified: Optional[float]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified_response(etag: str, last_modified: Optional[float] = None) -> Response:
+    return Response(status_code=304, headers=_validator_headers(etag, last_modified))
+
+
+def conditional_response(request: Request, response: Response, etag: str,
+                         last_modified: Optional[float] = None) -> Response:
+    """Añade los validadores a `response` y la comprime con gzip si es grande."""
+    response.headers.update(_validator_headers(etag, last_modified))
+    body = response.body
+    if (GZIP_MIN_BYTES and len(body) >= GZIP_MIN_BYTES
+            and 'gzip' in request.headers.get('accept-encoding', '')):
+        response.body = gzip.compress(body, compresslevel=5)
+        response.headers['Content-Length'] = str(len(response.body))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,138 @@
+import heapq
+import os
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from database import db_manager
+
+ACTIVE_STATES = ('Pre-operatorio', 'En_proceso')
+CRITICAL_STATE = 'Crítico'
+CRITICAL_WINDOW = timedelta(hours=24)
+
+
+class DashboardStatsEngine:
+    """Contadores de /dashboard/stats mantenidos en memoria.
+
+    Se cargan una vez al arrancar, se actualizan con cada cambio de estado de
+    cirugía y cada evolución registrada por la API, y se reconcilian contra
+    la base de datos cada `STATS_RECONCILE_SECONDS`.
+    """
+
+    def __init__(self, manager=db_manager):
+        self.manager = manager
+        self.reconcile_seconds = float(os.getenv('STATS_RECONCILE_SECONDS', 300))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.ready = False
+        self.last_reconciled: Optional[datetime] = None
+        self._reset()
+
+    def _reset(self):
+        self.total_pacientes = 0
+        self.surgeries_by_date: Counter = Counter()
+        self.active_surgeries = 0
+        # Evoluciones críticas de las últimas 24h: heap por fecha + conteo por paciente
+        self._critical_heap = []
+        self._critical_by_patient: Counter = Counter()
+
+    def load(self):
+        total = self.manager.fetchone(
+            "SELECT COUNT(*) as total FROM pacientes WHERE activo = TRUE"
+        )['total']
+        by_date = self.manager.fetchall("""
+            SELECT DATE(fecha_programada) as fecha, COUNT(*) as total
+            FROM cirugias
+            WHERE fecha_programada >= CURDATE()
+            GROUP BY DATE(fecha_programada)
+        """)
+        active = self.manager.fetchone("""
+            SELECT COUNT(*) as total FROM cirugias
+            WHERE estado IN ('Pre-operatorio', 'En_proceso')
+        """)['total']
+        critical = self.manager.fetchall("""
+            SELECT paciente_id, fecha_registro
+            FROM evoluciones_clinicas
+            WHERE estado_general = 'Crítico'
+            AND fecha_registro > DATE_SUB(NOW(), INTERVAL 24 HOUR)
+        """)
+
+        heap = [(row['fecha_registro'], row['paciente_id']) for row in critical]
+        heapq.heapify(heap)
+        with self._lock:
+            self.total_pacientes = total
+            self.surgeries_by_date = Counter({row['fecha']: row['total'] for row in by_date})
+            self.active_surgeries = active
+            self._critical_heap = heap
+            self._critical_by_patient = Counter(row['paciente_id'] for row in critical)
+            self.ready = True
+            self.last_reconciled = datetime.now()
+
+    def _expire_critical(self, now: datetime):
+        cutoff = now - CRITICAL_WINDOW
+        heap = self._critical_heap
+        while heap and heap[0][0] <= cutoff:
+            _, paciente_id = heapq.heappop(heap)
+            self._critical_by_patient[paciente_id] -= 1
+            if self._critical_by_patient[paciente_id] <= 0:
+                del self._critical_by_patient[paciente_id]
+
+    def snapshot(self) -> dict:
+        now = datetime.now()
+        with self._lock:
+            self._expire_critical(now)
+            return {
+                'total_pacientes': self.total_pacientes,
+                'cirugias_hoy': self.surgeries_by_date.get(now.date(), 0),
+                'cirugias_activas': self.active_surgeries,
+                'pacientes_criticos': len(self._critical_by_patient),
+            }
+
+    def on_surgery_state_change(self, old_state: Optional[str], new_state: str):
+        delta = (new_state in ACTIVE_STATES) - (old_state in ACTIVE_STATES)
+        if delta:
+            with self._lock:
+                self.active_surgeries += delta
+
+    def on_surgery_created(self, fecha_programada: datetime, estado: str = 'Programada'):
+        with self._lock:
+            if fecha_programada.date() >= date.today():
+                self.surgeries_by_date[fecha_programada.date()] += 1
+            if estado in ACTIVE_STATES:
+                self.active_surgeries += 1
+
+    def on_evolution_created(self, paciente_id: int, estado_general: str, fecha_registro: datetime):
+        if estado_general != CRITICAL_STATE:
+            return
+        with self._lock:
+            heapq.heappush(self._critical_heap, (fecha_registro, paciente_id))
+            self._critical_by_patient[paciente_id] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.reconcile_seconds):
+            try:
+                self.load()
+            except Exception as e:
+                print(f"Error reconciling dashboard stats: {e}")
+
+    def start(self):
+        try:
+            self.load()
+        except Exception as e:
+            # Hasta la primera reconciliación exitosa el endpoint consulta la base de datos
+            print(f"Error loading dashboard stats: {e}")
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="dashboard-stats", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+stats_engine = DashboardStatsEngine()
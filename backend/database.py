@@ -1,29 +1,435 @@
 import mysql.connector
 from mysql.connector import Error
 import os
-from typing import Optional
+import queue
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
 
-class DatabaseManager:
+from metrics import TimedConnection
+
+
+class PoolTimeoutError(Exception):
+    """No se pudo obtener una conexión del pool dentro del tiempo límite."""
+
+
+class PooledConnection:
+    """Conexión física del pool con sus marcas de tiempo de creación y último uso."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PoolStats:
     def __init__(self):
-        self.host = os.getenv('DB_HOST', 'localhost')
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.saturated_checkouts = 0
+        self.connections_created = 0
+        self.connections_recycled = 0
+        self.stale_reconnects = 0
+
+    def record_checkout(self, waited: float, saturated: bool):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+            if saturated:
+                self.saturated_checkouts += 1
+
+
+def parse_replicas(value: str) -> List[Tuple[str, int]]:
+    """"host1:3307,host2" -> [("host1", 3307), ("host2", 3306)]"""
+    replicas = []
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        host, _, port = item.partition(':')
+        replicas.append((host, int(port or 3306)))
+    return replicas
+
+
+class ReplicaState:
+    """Estado de una réplica según el último latido leído."""
+
+    def __init__(self):
+        self.healthy = False
+        # Hora local en que se confirmó en el primario el último latido que la réplica ya aplicó
+        self.applied_until: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def lag(self, now: float) -> Optional[float]:
+        return None if self.applied_until is None else max(0.0, now - self.applied_until)
+
+
+class WriteTracker:
+    """Hora de la última escritura por clave de consistencia (sesión, paciente...)."""
+
+    def __init__(self, horizon: float):
+        self.horizon = horizon
+        self._lock = threading.Lock()
+        self._writes: "OrderedDict[str, float]" = OrderedDict()
+
+    def mark(self, keys, now: float):
+        with self._lock:
+            for key in keys:
+                self._writes.pop(key, None)
+                self._writes[key] = now
+            # Pasado el horizonte cualquier réplica elegible ya tiene la escritura
+            while self._writes:
+                oldest_key, oldest = next(iter(self._writes.items()))
+                if now - oldest <= self.horizon:
+                    break
+                del self._writes[oldest_key]
+
+    def last_write(self, keys) -> Optional[float]:
+        with self._lock:
+            times = [self._writes[key] for key in keys if key in self._writes]
+        return max(times) if times else None
+
+
+class DatabaseManager:
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None,
+                 replicas: Optional[List[Tuple[str, int]]] = None):
+        self.host = host or os.getenv('DB_HOST', 'localhost')
         self.user = os.getenv('DB_USER', 'root')
         self.password = os.getenv('DB_PASSWORD', '')
         self.database = os.getenv('DB_NAME', 'siacom_db')
-        self.port = os.getenv('DB_PORT', 3306)
-    
-    def get_connection(self):
+        self.port = int(port or os.getenv('DB_PORT', 3306))
+
+        # Configuración del pool
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', 10))
+        self.checkout_timeout = float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.recycle_seconds = float(os.getenv('DB_POOL_RECYCLE', 1800))
+        self.ping_after_idle = float(os.getenv('DB_POOL_PING_IDLE', 30))
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._in_use = 0
+        self._in_use_lock = threading.Lock()
+        self.stats = PoolStats()
+
+        # Réplicas de lectura (DB_REPLICAS="host:puerto,..."), con el mismo usuario y base
+        if replicas is None:
+            replicas = parse_replicas(os.getenv('DB_REPLICAS', ''))
+        self.replicas: List[DatabaseManager] = [DatabaseManager(h, p, replicas=[]) for h, p in replicas]
+        self.replica_states = [ReplicaState() for _ in self.replicas]
+        self.replica_max_lag = float(os.getenv('DB_REPLICA_MAX_LAG', 2))
+        self.replica_check_seconds = float(os.getenv('DB_REPLICA_CHECK_SECONDS', 0.5))
+        self.writes = WriteTracker(horizon=self.replica_max_lag)
+        # Se llaman con las claves de cada `mark_write` (p. ej. para avisar a los demás workers)
+        self.write_listeners: List[Callable[[tuple], None]] = []
+        self.routing = {"primary": 0, "replica": 0, "lagging": 0, "read_your_writes": 0}
+        self._routing_lock = threading.Lock()
+        self._heartbeat_origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._heartbeat_seq = 0
+        self._heartbeat_written: "OrderedDict[int, float]" = OrderedDict()
+        self._monitor_stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    def connection_params(self) -> dict:
+        return {
+            "host": self.host,
+            "user": self.user,
+            "password": self.password,
+            "database": self.database,
+            "port": self.port,
+            "charset": 'utf8mb4',
+        }
+
+    def _connect(self) -> PooledConnection:
+        raw = mysql.connector.connect(**self.connection_params())
+        with self.stats.lock:
+            self.stats.connections_created += 1
+        return PooledConnection(raw)
+
+    def _discard(self, pooled: PooledConnection):
         try:
-            connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                port=self.port,
-                charset='utf8mb4'
+            pooled.raw.close()
+        except Error:
+            pass
+
+    def _acquire(self) -> PooledConnection:
+        start = time.monotonic()
+        saturated = not self._slots.acquire(blocking=False)
+        if saturated and not self._slots.acquire(timeout=self.checkout_timeout):
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            raise PoolTimeoutError(
+                f"Pool de conexiones agotado ({self.pool_size}) tras {self.checkout_timeout}s de espera"
             )
-            return connection
+
+        try:
+            pooled = self._take_idle()
+            if pooled is None:
+                pooled = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._in_use_lock:
+            self._in_use += 1
+        self.stats.record_checkout(time.monotonic() - start, saturated)
+        return pooled
+
+    def _take_idle(self) -> Optional[PooledConnection]:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+
+            now = time.monotonic()
+            if now - pooled.created_at > self.recycle_seconds:
+                self._discard(pooled)
+                with self.stats.lock:
+                    self.stats.connections_recycled += 1
+                continue
+
+            if now - pooled.last_used > self.ping_after_idle:
+                try:
+                    pooled.raw.ping(reconnect=True, attempts=1, delay=0)
+                except Error:
+                    self._discard(pooled)
+                    with self.stats.lock:
+                        self.stats.stale_reconnects += 1
+                    continue
+            return pooled
+
+    def _release(self, pooled: PooledConnection, broken: bool = False):
+        with self._in_use_lock:
+            self._in_use -= 1
+        try:
+            if broken or not pooled.raw.is_connected():
+                self._discard(pooled)
+            else:
+                # Cerrar cualquier transacción pendiente antes de devolverla al pool
+                if pooled.raw.in_transaction:
+                    pooled.raw.rollback()
+                pooled.last_used = time.monotonic()
+                self._idle.put(pooled)
+        except Error:
+            self._discard(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión del pool y la devuelve al salir del bloque."""
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield TimedConnection(pooled.raw)
+        except Error:
+            broken = True
+            raise
+        finally:
+            self._release(pooled, broken=broken)
+
+    def get_db(self):
+        """Dependencia de FastAPI: una conexión del pool por petición."""
+        with self.connection() as conn:
+            yield conn
+
+    def fetchone(self, query: str, params: tuple = ()) -> Optional[dict]:
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchone()
+            finally:
+                cursor.close()
+
+    def fetchall(self, query: str, params: tuple = ()) -> list:
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def fetchrows(self, query: str, params: tuple = ()) -> list:
+        """Como `fetchall` pero con filas en tuplas, para lecturas columnares."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def get_connection(self):
+        """Conexión directa fuera del pool, para scripts de mantenimiento."""
+        try:
+            return mysql.connector.connect(**self.connection_params())
         except Error as e:
             print(f"Error connecting to MySQL: {e}")
             return None
 
-db_manager = DatabaseManager()
\ No newline at end of file
+    def pool_status(self) -> dict:
+        stats = self.stats
+        with stats.lock:
+            checkouts = stats.checkouts
+            return {
+                "pool_size": self.pool_size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": checkouts,
+                "timeouts": stats.timeouts,
+                "saturated_checkouts": stats.saturated_checkouts,
+                "wait_time_total_ms": round(stats.wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(stats.wait_time_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                "wait_time_max_ms": round(stats.wait_time_max * 1000, 3),
+                "connections_created": stats.connections_created,
+                "connections_recycled": stats.connections_recycled,
+                "stale_reconnects": stats.stale_reconnects,
+            }
+
+    def close_all(self):
+        self.stop_replica_monitor()
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for replica in self.replicas:
+            replica.close_all()
+
+    # -- réplicas de lectura
+
+    def mark_write(self, *keys: str):
+        """Llamar tras el commit: las lecturas con estas claves irán al primario hasta que las réplicas lo tengan."""
+        if self.replicas:
+            self.writes.mark(keys, time.time())
+            for listener in self.write_listeners:
+                listener(keys)
+
+    def route(self, *keys: str) -> Optional[int]:
+        """Índice de la réplica para una lectura con estas claves de consistencia, o None para el primario."""
+        if not self.replicas:
+            return None
+        now = time.time()
+        last_write = self.writes.last_write(keys) if keys else None
+        fresh, lagging, behind_write = [], False, False
+        for index, state in enumerate(self.replica_states):
+            lag = state.lag(now)
+            if not state.healthy or lag is None or lag > self.replica_max_lag:
+                lagging = True
+            elif last_write is not None and state.applied_until < last_write:
+                behind_write = True
+            else:
+                fresh.append(index)
+        with self._routing_lock:
+            if fresh:
+                self.routing["replica"] += 1
+                return random.choice(fresh)
+            self.routing["primary"] += 1
+            if behind_write:
+                self.routing["read_your_writes"] += 1
+            elif lagging:
+                self.routing["lagging"] += 1
+        return None
+
+    def reader(self, *keys: str) -> "DatabaseManager":
+        index = self.route(*keys)
+        return self if index is None else self.replicas[index]
+
+    def _write_heartbeat(self) -> int:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if self._heartbeat_seq == 0:
+                    # Continuar la secuencia de este origen tras un reinicio
+                    cursor.execute("SELECT seq FROM replica_heartbeat WHERE origen = %s", (self._heartbeat_origin,))
+                    row = cursor.fetchone()
+                    self._heartbeat_seq = row[0] if row else 0
+                self._heartbeat_seq += 1
+                # Antes del REPLACE: una escritura marcada hasta aquí ya hizo commit
+                # antes que el latido, así que la réplica que lo vea también la tiene
+                written_at = time.time()
+                cursor.execute("""
+                    REPLACE INTO replica_heartbeat (origen, seq, fecha) VALUES (%s, %s, NOW(6))
+                """, (self._heartbeat_origin, self._heartbeat_seq))
+                conn.commit()
+            finally:
+                cursor.close()
+        self._heartbeat_written[self._heartbeat_seq] = written_at
+        while len(self._heartbeat_written) > 4096:
+            self._heartbeat_written.popitem(last=False)
+        return self._heartbeat_seq
+
+    def _check_replica(self, index: int):
+        state = self.replica_states[index]
+        try:
+            row = self.replicas[index].fetchone(
+                "SELECT seq FROM replica_heartbeat WHERE origen = %s", (self._heartbeat_origin,)
+            )
+        except Exception as e:
+            state.healthy = False
+            state.last_error = str(e)
+            return
+        state.healthy = True
+        state.last_error = None
+        written = self._heartbeat_written.get(row['seq']) if row else None
+        if written is not None:
+            state.applied_until = written
+
+    def check_replicas(self):
+        """Escribe un latido en el primario y mide hasta dónde ha aplicado cada réplica."""
+        try:
+            self._write_heartbeat()
+        except Exception as e:
+            # Sin latido no se puede medir el retraso: todas las lecturas van al primario
+            print(f"Error writing replica heartbeat: {e}")
+            for state in self.replica_states:
+                state.healthy = False
+                state.last_error = f"heartbeat: {e}"
+            return
+        for index in range(len(self.replicas)):
+            self._check_replica(index)
+
+    def _monitor_loop(self):
+        while not self._monitor_stop.wait(self.replica_check_seconds):
+            self.check_replicas()
+
+    def start_replica_monitor(self):
+        if self.replicas and self._monitor is None:
+            self._monitor_stop.clear()
+            self._monitor = threading.Thread(target=self._monitor_loop, name="replica-monitor", daemon=True)
+            self._monitor.start()
+
+    def stop_replica_monitor(self):
+        self._monitor_stop.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout=5)
+            self._monitor = None
+
+    def replica_status(self) -> dict:
+        now = time.time()
+        with self._routing_lock:
+            routing = dict(self.routing)
+        return {
+            "max_lag_seconds": self.replica_max_lag,
+            "routing": routing,
+            "replicas": [
+                {
+                    "host": f"{replica.host}:{replica.port}",
+                    "healthy": state.healthy,
+                    "lag_seconds": None if state.lag(now) is None else round(state.lag(now), 3),
+                    "last_error": state.last_error,
+                    "pool": replica.pool_status(),
+                }
+                for replica, state in zip(self.replicas, self.replica_states)
+            ],
+        }
+
+
+db_manager = DatabaseManager()
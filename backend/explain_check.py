@@ -0,0 +1,115 @@
+"""Comprobación con EXPLAIN de las consultas de los endpoints.
+
+Falla si alguna consulta del camino de las peticiones recorre una tabla
+completa (`type` ALL o index) fuera de las tablas de referencia pequeñas.
+Pensado para ejecutarse sobre la base de datos sembrada, tras migrar:
+
+    python migrate.py --check-explain
+"""
+from datetime import datetime, timedelta
+
+from main import (
+    CONTACTO_COLUMNS, DASHBOARD_QUERIES, PACIENTE_LIST_COLUMNS, SELECT_CIRUGIAS_PACIENTE, SELECT_CONTACTOS_PAGE,
+    SELECT_EVOLUCIONES, SELECT_FAMILY_LOGIN, SELECT_FAMILY_NOTIFICATIONS, SELECT_FAMILY_PATIENT,
+    SELECT_FAMILY_SURGERY, SELECT_FAMILY_VITALS, SELECT_LOGIN_USER, SELECT_PACIENTE, SELECT_PACIENTES_PAGE,
+    SELECT_SIGNOS_VITALES,
+)
+from outbox import CLAIM_EVENTS, DELIVERY_QUERIES, EVENTO_CAMBIO_ESTADO, EVENTO_COMPLICACION
+from patient_search import SEARCH_BY_CEDULA, SEARCH_FULLTEXT
+from vitals_rollup import CIRUGIA_FILTER, SELECT_READINGS
+from ward_view import parse_ward_fields, ward_query
+
+# Tablas de catálogo con pocas filas, donde un full scan es lo más barato
+SMALL_TABLES = {'especialidades', 'medicos', 'tipos_cirugia', 'usuarios', 'schema_migrations'}
+FULL_SCAN_TYPES = {'ALL', 'index'}
+
+# (endpoint, consulta, claves de parámetros de ejemplo): las mismas constantes que ejecutan los endpoints
+ENDPOINT_QUERIES = [
+    ("POST /login", SELECT_LOGIN_USER, ('username',)),
+    ("POST /family/login", SELECT_FAMILY_LOGIN, ('codigo', 'codigo')),
+    ("GET /family/patient (paciente)", SELECT_FAMILY_PATIENT, ('paciente',)),
+    ("GET /family/patient (cirugía)", SELECT_FAMILY_SURGERY, ('paciente',)),
+    ("GET /family/patient (signos)", SELECT_FAMILY_VITALS, ('paciente',)),
+    ("GET /family/patient (notificaciones)", SELECT_FAMILY_NOTIFICATIONS, ('paciente',)),
+    ("GET /pacientes", SELECT_PACIENTES_PAGE.format(columns=', '.join(PACIENTE_LIST_COLUMNS)),
+     ('cursor', 'limite')),
+    ("GET /pacientes/search (cédula, respaldo)", SEARCH_BY_CEDULA, ('cedula', 'limite')),
+    ("GET /pacientes/search (FULLTEXT, respaldo)", SEARCH_FULLTEXT, ('texto', 'texto', 'limite')),
+    ("GET /pacientes/{id}", SELECT_PACIENTE, ('paciente',)),
+    ("GET /pacientes/sala", ward_query(1, parse_ward_fields(None)), ('paciente',)),
+    ("GET /cirugias/{id}", SELECT_CIRUGIAS_PACIENTE, ('paciente',)),
+    ("GET /contactos", SELECT_CONTACTOS_PAGE.format(columns=', '.join(CONTACTO_COLUMNS)),
+     ('cursor', 'limite')),
+    ("GET /signos-vitales/{id}", SELECT_SIGNOS_VITALES, ('paciente',)),
+    ("GET /signos-vitales/{id}/rollup", SELECT_READINGS.format(cirugia=''), ('paciente', 'desde', 'hasta')),
+    ("GET /signos-vitales/{id}/rollup (cirugía)", SELECT_READINGS.format(cirugia=CIRUGIA_FILTER),
+     ('paciente', 'desde', 'hasta', 'cirugia')),
+    ("GET /evoluciones/{id}", SELECT_EVOLUCIONES, ('paciente',)),
+    # Fuera de la petición, pero cada lote del dispatcher bloquea filas del outbox
+    ("outbox (reclamar lote)", CLAIM_EVENTS, ('lote',)),
+    ("outbox (entrega cambio de estado)",
+     DELIVERY_QUERIES[EVENTO_CAMBIO_ESTADO].format(ids='%s'), ('evento',)),
+    ("outbox (entrega complicación)",
+     DELIVERY_QUERIES[EVENTO_COMPLICACION].format(ids='%s'), ('evento',)),
+] + [
+    (f"GET /dashboard/stats ({name})", query, ()) for name, query in DASHBOARD_QUERIES.items()
+]
+
+
+def sample_params(conn) -> dict:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MIN(id) FROM pacientes")
+        paciente = cursor.fetchone()[0] or 1
+        cursor.execute("SELECT MIN(id) FROM cirugias")
+        cirugia = cursor.fetchone()[0] or 1
+        cursor.execute("SELECT MIN(id) FROM outbox_eventos")
+        evento = cursor.fetchone()[0] or 1
+    finally:
+        cursor.close()
+    now = datetime.now()
+    return {
+        'username': 'admin',
+        'codigo': 'X',
+        'cedula': '10%',
+        'texto': '+gar*',
+        'paciente': paciente,
+        'cirugia': cirugia,
+        'evento': evento,
+        'lote': 100,
+        'limite': 51,
+        'cursor': 0,
+        'desde': now - timedelta(days=1),
+        'hasta': now,
+    }
+
+
+def explain(conn, query: str, params: tuple) -> list:
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def run_explain_check(conn, verbose: bool = True) -> bool:
+    samples = sample_params(conn)
+    ok = True
+    for endpoint, query, keys in ENDPOINT_QUERIES:
+        plan = explain(conn, query, tuple(samples[k] for k in keys))
+        for step in plan:
+            table = step.get('table') or ''
+            access = step.get('type')
+            extra = step.get('Extra') or ''
+            # En INSERT ... SELECT la fila de la tabla destino no es una lectura
+            full_scan = (access in FULL_SCAN_TYPES and table not in SMALL_TABLES
+                         and step.get('select_type') != 'INSERT')
+            if full_scan:
+                ok = False
+            if verbose and (full_scan or 'filesort' in extra):
+                label = "FULL SCAN" if full_scan else "aviso    "
+                print(f"{label} {endpoint}: tabla={table} type={access} key={step.get('key')} extra={extra}")
+    if verbose:
+        print("EXPLAIN sin full scans ✅" if ok else "EXPLAIN detectó full scans ❌")
+    return ok
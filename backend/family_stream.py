@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+
+SnapshotLoader = Callable[[int], Awaitable[Optional[dict]]]
+
+
+def compute_delta(previous: dict, current: dict) -> dict:
+    """Diferencia por secciones entre dos snapshots ya codificados a JSON.
+
+    Solo se incluyen las claves que cambiaron dentro de cada sección; las
+    listas (notificaciones) se reemplazan completas.
+    """
+    delta = {}
+    for section, value in current.items():
+        old = previous.get(section)
+        if isinstance(value, dict) and isinstance(old, dict):
+            changed = {k: v for k, v in value.items() if old.get(k) != v}
+            if changed:
+                delta[section] = changed
+        elif old != value:
+            delta[section] = value
+    return delta
+
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+# Marca en la cola de un suscriptor lento: reenviar snapshot completo
+RESYNC = None
+
+
+class PatientChannel:
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.snapshot: Optional[dict] = None
+        self.version = 0
+        self.dirty = False
+        self.refreshing = False
+
+
+class PatientEventBroker:
+    """Fan-out en proceso de cambios del snapshot familiar por paciente.
+
+    Los endpoints de escritura llaman a `notify_patient` (desde cualquier hilo);
+    el broker recarga el snapshot una sola vez por ráfaga de cambios y envía el
+    delta a todos los suscriptores de ese paciente.
+    """
+
+    def __init__(self):
+        self.queue_size = int(os.getenv('SSE_QUEUE_SIZE', 16))
+        self.heartbeat_seconds = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+        self._channels: Dict[int, PatientChannel] = {}
+        self._loader: Optional[SnapshotLoader] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loader: SnapshotLoader, loop: asyncio.AbstractEventLoop):
+        self._loader = loader
+        self._loop = loop
+
+    def subscriber_count(self, patient_id: Optional[int] = None) -> int:
+        if patient_id is not None:
+            channel = self._channels.get(patient_id)
+            return len(channel.subscribers) if channel else 0
+        return sum(len(c.subscribers) for c in self._channels.values())
+
+    def notify_patient(self, patient_id: int):
+        """Marca el snapshot del paciente como modificado. Seguro desde hilos del threadpool."""
+        if self._loop is None or patient_id not in self._channels:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._schedule_refresh(patient_id)
+        else:
+            self._loop.call_soon_threadsafe(self._schedule_refresh, patient_id)
+
+    def _schedule_refresh(self, patient_id: int):
+        channel = self._channels.get(patient_id)
+        if channel is None:
+            return
+        channel.dirty = True
+        if not channel.refreshing:
+            channel.refreshing = True
+            self._loop.create_task(self._refresh(patient_id, channel))
+
+    async def _refresh(self, patient_id: int, channel: PatientChannel):
+        # Un único refresco en curso por paciente; los cambios que llegan
+        # mientras se carga el snapshot se agrupan en la siguiente vuelta
+        try:
+            while channel.dirty:
+                channel.dirty = False
+                try:
+                    snapshot = await self._load(patient_id)
+                except Exception as e:
+                    print(f"Error refreshing family snapshot {patient_id}: {e}")
+                    break
+                if snapshot is None or channel.snapshot is None:
+                    continue
+                delta = compute_delta(channel.snapshot, snapshot)
+                if not delta:
+                    continue
+                channel.snapshot = snapshot
+                channel.version += 1
+                message = format_event("delta", delta, channel.version)
+                for queue in list(channel.subscribers):
+                    self._offer(queue, message)
+        finally:
+            channel.refreshing = False
+
+    def _offer(self, queue: asyncio.Queue, message: str):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # El cliente no consume a tiempo: se descartan sus deltas pendientes
+            # y se le reenvía el snapshot completo cuando vuelva a leer
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    async def _load(self, patient_id: int) -> Optional[dict]:
+        snapshot = await self._loader(patient_id)
+        return jsonable_encoder(snapshot) if snapshot is not None else None
+
+    async def stream(self, patient_id: int, initial_snapshot: dict):
+        """Generador SSE: snapshot inicial, deltas y heartbeats."""
+        channel = self._channels.setdefault(patient_id, PatientChannel())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        channel.subscribers.add(queue)
+        if channel.snapshot is None:
+            channel.snapshot = jsonable_encoder(initial_snapshot)
+        try:
+            yield f"retry: {int(self.heartbeat_seconds * 1000)}\n\n"
+            yield format_event("snapshot", channel.snapshot, channel.version)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is RESYNC:
+                    message = format_event("snapshot", channel.snapshot, channel.version)
+                yield message
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers:
+                self._channels.pop(patient_id, None)
+
+
+family_broker = PatientEventBroker()
@@ -0,0 +1,107 @@
+"""Serialización rápida de filas de cursor a JSON.
+
+Los endpoints de listas leen con cursores de tuplas y serializan aquí en vez
+de pasar por `jsonable_encoder`, que recorre cada dict valor a valor. Los
+conversores se eligen una vez por columna a partir del tipo MySQL de
+`cursor.description`, y el resultado es byte a byte el mismo JSON que
+devolvía FastAPI con cursores de diccionarios.
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+# Códigos de tipo del protocolo MySQL (iguales en mysql-connector y aiomysql)
+TYPE_DECIMAL, TYPE_NEWDECIMAL = 0, 246
+TYPE_TIMESTAMP, TYPE_DATE, TYPE_TIME, TYPE_DATETIME, TYPE_NEWDATE = 7, 10, 11, 12, 14
+
+
+def _decimal(value: Decimal):
+    # Misma regla que fastapi.encoders.decimal_encoder
+    return int(value) if value.as_tuple().exponent >= 0 else float(value)
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _timedelta(value: timedelta):
+    return value.total_seconds()
+
+
+CONVERTERS: Dict[int, Callable] = {
+    TYPE_DECIMAL: _decimal,
+    TYPE_NEWDECIMAL: _decimal,
+    TYPE_TIMESTAMP: _isoformat,
+    TYPE_DATE: _isoformat,
+    TYPE_DATETIME: _isoformat,
+    TYPE_NEWDATE: _isoformat,
+    TYPE_TIME: _timedelta,
+}
+
+
+def _default(value):
+    # Tipos no previstos por columna (p. ej. bytes): mismo resultado que FastAPI
+    return jsonable_encoder(value)
+
+
+if orjson is not None:
+    def dumps(value) -> bytes:
+        return orjson.dumps(value, default=_default)
+else:
+    def dumps(value) -> bytes:
+        # Mismos parámetros que fastapi.responses.JSONResponse.render
+        return json.dumps(
+            value, ensure_ascii=False, allow_nan=False, indent=None,
+            separators=(",", ":"), default=_default,
+        ).encode("utf-8")
+
+
+class RowEncoder:
+    """Codifica filas en tuplas de un cursor con los nombres y tipos de su `description`."""
+
+    def __init__(self, description: Sequence[tuple]):
+        self.names = [column[0] for column in description]
+        self.converters: List[Tuple[int, Callable]] = [
+            (index, CONVERTERS[column[1]])
+            for index, column in enumerate(description)
+            if column[1] in CONVERTERS
+        ]
+
+    def index(self, name: str) -> int:
+        return self.names.index(name)
+
+    def to_dicts(self, rows: Sequence[tuple]) -> List[dict]:
+        names, converters = self.names, self.converters
+        if not converters:
+            return [dict(zip(names, row)) for row in rows]
+        result = []
+        for row in rows:
+            values = list(row)
+            for index, convert in converters:
+                value = values[index]
+                if value is not None:
+                    values[index] = convert(value)
+            result.append(dict(zip(names, values)))
+        return result
+
+    def encode(self, rows: Sequence[tuple]) -> bytes:
+        return dumps(self.to_dicts(rows))
+
+
+def rows_response(description: Sequence[tuple], rows: Sequence[tuple],
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Respuesta JSON (lista de objetos) para filas en tuplas de un cursor."""
+    return Response(
+        content=RowEncoder(description).encode(rows),
+        media_type="application/json",
+        headers=headers,
+    )
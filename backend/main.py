@@ -1,19 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 import mysql.connector
 import bcrypt
 import jwt
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
+from datetime import date, datetime, timedelta
+import asyncio
+import aiomysql
 import os
-from database import db_manager
+import time
+from database import db_manager, PoolTimeoutError
+from async_database import async_db
+from family_stream import family_broker
+from snapshot_cache import family_cache
+from dashboard_stats import stats_engine
+from starlette.concurrency import run_in_threadpool
+from vitals_ingest import VitalsBufferFullError, audit_entries, insert_vitals, vitals_batcher
+from vitals_rollup import rollup_cache, vitals_rollup
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, export_rows, select_columns
+from password_hashing import HasherBusyError, password_hasher
+from rate_limit import client_ip, login_ip_limiter, login_user_limiter
+from outbox import EVENTO_CAMBIO_ESTADO, EVENTO_COMPLICACION, enqueue_event, outbox_dispatcher
+from vitals_monitor import vitals_monitor
+from surgery_schedule import surgery_schedule
+from audit_log import AuditEntry, audit_writer
+from retention import cold_archive, retention_manager
+from reference_data import reference_data
+from ward_view import add_reference_names, assemble_ward, parse_ward_fields, parse_ward_ids, reference_ids, ward_query
+from metrics import MetricsMiddleware, collect_metrics, render_collected
+from cluster import cluster
+from fast_json import rows_response
+from conditional import conditional_response, is_not_modified, make_etag, not_modified_response, patient_versions
+from fastapi.encoders import jsonable_encoder
+import hashlib
+from patient_search import MAX_SEARCH_RESULTS, fulltext_query, patient_index, tokenize
 from fastapi import HTTPException
+from functools import partial
 
 app = FastAPI(title="SIACOM API", version="1.0.0")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 # CORS configuration
@@ -23,7 +50,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "X-SQL-Count", "X-SQL-Time-Ms", "ETag", "Last-Modified"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # JWT Configuration
 SECRET_KEY = "your-secret-key-here"
@@ -33,16 +62,83 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 security = HTTPBearer()
 
 # Database connection
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="siacom_db",
-        port=3306
+get_db = db_manager.get_db
+
+def patient_key(patient_id: int) -> str:
+    return f"paciente:{patient_id}"
+
+def session_key(token_data: dict) -> str:
+    return f"sesion:{token_data.get('user_type')}:{token_data.get('user_id') or token_data.get('family_id')}"
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Servicio saturado, intente nuevamente"},
+        headers={"Retry-After": "1"},
     )
 
+@app.exception_handler(HasherBusyError)
+async def hasher_busy_handler(request: Request, exc: HasherBusyError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Servicio saturado, intente nuevamente"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.on_event("startup")
+async def start_services():
+    family_broker.bind(load_family_snapshot, asyncio.get_running_loop())
+    # Con serve.py: antes que las cargas, para no perder eventos de los demás workers
+    register_cluster_handlers()
+    await run_in_threadpool(cluster.start)
+    try:
+        await async_db.start()
+    except Exception as e:
+        # El pool se vuelve a intentar abrir en la primera petición
+        print(f"Error connecting to MySQL (async pool): {e}")
+    await run_in_threadpool(stats_engine.start)
+    try:
+        await run_in_threadpool(vitals_monitor.load)
+    except Exception as e:
+        # Sin historial las reglas de tendencia esperan a juntar lecturas nuevas
+        print(f"Error loading vitals monitor: {e}")
+    await run_in_threadpool(reference_data.start)
+    try:
+        await run_in_threadpool(surgery_schedule.load)
+    except Exception as e:
+        # Se reintenta en la primera consulta de la agenda
+        print(f"Error loading surgery schedule: {e}")
+    audit_writer.start()
+    retention_manager.start()
+    vitals_batcher.before_commit = detect_vitals_alerts
+    vitals_batcher.on_flush = on_vitals_flush
+    vitals_batcher.start()
+    retention_manager.drain_writes.append(vitals_batcher.flush)
+    await run_in_threadpool(password_hasher.start)
+    outbox_dispatcher.channels.append(publish_outbox_events)
+    outbox_dispatcher.start()
+    patient_index.start()
+    db_manager.start_replica_monitor()
+
+@app.on_event("shutdown")
+async def stop_services():
+    await run_in_threadpool(password_hasher.shutdown)
+    await run_in_threadpool(outbox_dispatcher.stop)
+    await run_in_threadpool(patient_index.stop)
+    await run_in_threadpool(retention_manager.stop)
+    await run_in_threadpool(reference_data.stop)
+    await run_in_threadpool(vitals_batcher.stop)
+    # Después de los demás hilos de escritura: vacía la auditoría pendiente
+    await run_in_threadpool(audit_writer.stop)
+    stats_engine.stop()
+    await run_in_threadpool(cluster.stop)
+    await async_db.close()
+    db_manager.close_all()
+
 # Pydantic models
+MAX_VITALS_BATCH = 5000
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -84,7 +180,8 @@ class ContactoBase(BaseModel):
 
 class CirugiaBase(BaseModel):
     tipo_cirugia_id: int
-    fecha_programada: str
+    medico_principal_id: int
+    fecha_programada: datetime
     quirofano: Optional[str] = None
     notas_preoperatorias: Optional[str] = None
 
@@ -96,6 +193,16 @@ class SignosVitalesBase(BaseModel):
     saturacion_oxigeno: Optional[int] = None
     dolor_escala: Optional[int] = None
 
+class LecturaSignosVitales(SignosVitalesBase):
+    paciente_id: int
+    cirugia_id: Optional[int] = None
+    frecuencia_respiratoria: Optional[int] = Field(None, ge=0, le=80)
+    dolor_escala: Optional[int] = Field(None, ge=0, le=10)
+    fecha_registro: Optional[datetime] = None
+
+class LoteSignosVitales(BaseModel):
+    lecturas: List[LecturaSignosVitales] = Field(..., min_length=1, max_length=MAX_VITALS_BATCH)
+
 class EvolucionClinicaBase(BaseModel):
     estado_general: str
     descripcion: str
@@ -116,7 +223,7 @@ def create_family_token(data: dict):
     to_encode.update({"exp": expire, "type": "family"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -126,9 +233,9 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def verify_family_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_family_token(token: str):
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         token_type = payload.get("type")
         if token_type != "family":
             raise HTTPException(status_code=401, detail="Invalid family token")
@@ -136,68 +243,125 @@ def verify_family_token(credentials: HTTPAuthorizationCredentials = Depends(secu
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid family token")
 
-def require_admin_or_medico(token_data: dict = Depends(verify_token)):
+async def verify_family_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return decode_family_token(credentials.credentials)
+
+async def verify_family_stream_token(request: Request, token: Optional[str] = None):
+    # EventSource no permite cabeceras personalizadas: se acepta el token por query string
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):]
+    if not token:
+        raise HTTPException(status_code=401, detail="Invalid family token")
+    return decode_family_token(token)
+
+async def require_admin_or_medico(token_data: dict = Depends(verify_token)):
     user_type = token_data.get("user_type")
     if user_type not in ["administrador", "medico"]:
         raise HTTPException(status_code=403, detail="Access denied. Admin or medical staff required.")
     return token_data
 
-def require_admin(token_data: dict = Depends(verify_token)):
+def get_read_db(token_data: dict = Depends(verify_token)):
+    """Conexión para endpoints de solo lectura: réplica si está al día con lo que escribió esta sesión."""
+    with db_manager.reader(session_key(token_data)).connection() as conn:
+        yield conn
+
+async def require_admin(token_data: dict = Depends(verify_token)):
     user_type = token_data.get("user_type")
     if user_type != "administrador":
         raise HTTPException(status_code=403, detail="Access denied. Admin required.")
     return token_data
 
 # API Endpoints
+def login_rate_limited(retry_after: float):
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Demasiados intentos de inicio de sesión, intente más tarde",
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+    )
+
+def release_login_attempt(ip: str, username: Optional[str] = None):
+    """El intento no falló: deja de contar para la IP y, con `username`, limpia los fallos del usuario.
+
+    Solo los intentos fallidos cuentan: detrás de un NAT todo el hospital comparte IP.
+    """
+    login_ip_limiter.release(ip)
+    if username is not None:
+        login_user_limiter.reset(username)
+
+SELECT_LOGIN_USER = "SELECT * FROM usuarios WHERE username = %s AND activo = TRUE"
+
 @app.post("/login", response_model=Token)
-def login(user_login: UserLogin):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+async def login(user_login: UserLogin, request: Request):
+    ip = client_ip(request)
+    # Con varios workers los límites viven en el hub: la llamada bloquea y no va en el event loop
+    retry_after = await run_in_threadpool(login_ip_limiter.check_and_hit, ip)
+    if not retry_after:
+        # El intento queda contado aquí; si las credenciales son válidas se descuenta
+        retry_after = await run_in_threadpool(login_user_limiter.check_and_hit, user_login.username)
+        if retry_after:
+            await run_in_threadpool(login_ip_limiter.release, ip)
+    if retry_after:
+        raise login_rate_limited(retry_after)
+
+    user = await async_db.fetchone(SELECT_LOGIN_USER, (user_login.username,))
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(user_login.password, user['password_hash'])
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    await run_in_threadpool(release_login_attempt, ip, user_login.username)
+
+    if new_hash:
+        # El coste de bcrypt cambió: se guarda el hash con el coste actual
+        async with async_db.cursor() as cursor:
+            await cursor.execute(
+                "UPDATE usuarios SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                (new_hash, user['id'], user['password_hash']),
+            )
+
+    access_token = create_access_token(data={
+        "sub": user["username"], 
+        "user_id": user["id"],
+        "user_type": user["tipo_usuario"]
+    })
     
-    try:
-        cursor.execute("SELECT * FROM usuarios WHERE username = %s AND activo = TRUE", (user_login.username,))
-        user = cursor.fetchone()
-        
-        if not user or not pwd_context.verify(user_login.password, user['password_hash']):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        access_token = create_access_token(data={
-            "sub": user["username"], 
-            "user_id": user["id"],
-            "user_type": user["tipo_usuario"]
-        })
-        
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user_type": user["tipo_usuario"],
-            "user_id": user["id"]
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user_type": user["tipo_usuario"],
+        "user_id": user["id"]
+    }
+
+SELECT_FAMILY_LOGIN = """
+    SELECT cf.*, p.id as paciente_id, p.nombre as paciente_nombre, p.apellido as paciente_apellido,
+           c.id as contacto_id, c.nombre as familiar_nombre, c.apellido as familiar_apellido
+    FROM codigos_familiares cf
+    JOIN pacientes p ON cf.paciente_id = p.id
+    JOIN contactos c ON cf.contacto_id = c.id
+    WHERE cf.codigo_paciente = %s AND cf.codigo_familiar = %s
+    AND cf.activo = TRUE AND p.activo = TRUE
+    AND (cf.fecha_expiracion IS NULL OR cf.fecha_expiracion > NOW())
+"""
 
 @app.post("/family/login", response_model=FamilyToken)
-def family_login(family_login: FamilyLogin):
-    conn = get_db_connection()
+def family_login(family_login: FamilyLogin, request: Request, conn=Depends(get_db)):
+    # Los códigos familiares también se pueden adivinar: mismo límite por IP que /login
+    ip = client_ip(request)
+    retry_after = login_ip_limiter.check_and_hit(ip)
+    if retry_after:
+        raise login_rate_limited(retry_after)
+
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("""
-            SELECT cf.*, p.id as paciente_id, p.nombre as paciente_nombre, p.apellido as paciente_apellido,
-                   c.id as contacto_id, c.nombre as familiar_nombre, c.apellido as familiar_apellido
-            FROM codigos_familiares cf
-            JOIN pacientes p ON cf.paciente_id = p.id
-            JOIN contactos c ON cf.contacto_id = c.id
-            WHERE cf.codigo_paciente = %s AND cf.codigo_familiar = %s 
-            AND cf.activo = TRUE AND p.activo = TRUE
-            AND (cf.fecha_expiracion IS NULL OR cf.fecha_expiracion > NOW())
-        """, (family_login.patient_code, family_login.family_code))
+        cursor.execute(SELECT_FAMILY_LOGIN, (family_login.patient_code, family_login.family_code))
         
         family_data = cursor.fetchone()
         
         if not family_data:
             raise HTTPException(status_code=401, detail="Invalid family codes")
+        release_login_attempt(ip)
         
         access_token = create_family_token(data={
             "patient_id": family_data["paciente_id"],
@@ -215,141 +379,321 @@ def family_login(family_login: FamilyLogin):
         }
     finally:
         cursor.close()
-        conn.close()
 
 # Endpoints para familiares
-@app.get("/family/patient/{patient_id}")
-def get_family_patient_data(patient_id: int, token_data: dict = Depends(verify_family_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        # Verificar que el token corresponde al paciente
-        if token_data.get("patient_id") != patient_id:
-            raise HTTPException(status_code=403, detail="Access denied to this patient data")
-        
+SELECT_FAMILY_PATIENT = """
+    SELECT id, nombre, apellido, cedula, fecha_nacimiento, sexo, eps, tipo_sangre
+    FROM pacientes WHERE id = %s AND activo = TRUE
+"""
+
+# Cirugía más reciente con el estado y el progreso que ve el familiar
+SELECT_FAMILY_SURGERY = """
+    SELECT c.*,
+           CASE
+               WHEN c.estado = 'Programada' THEN 'preparacion'
+               WHEN c.estado = 'En_proceso' THEN 'en_progreso'
+               WHEN c.estado = 'Finalizada' THEN 'finalizada'
+               WHEN c.estado = 'Cancelada' THEN 'complicacion'
+               ELSE 'preparacion'
+           END as current_status,
+           CASE
+               WHEN c.estado = 'Programada' THEN 0
+               WHEN c.estado = 'Pre-operatorio' THEN 25
+               WHEN c.estado = 'En_proceso' THEN 75
+               WHEN c.estado = 'Post-operatorio' THEN 90
+               WHEN c.estado = 'Finalizada' THEN 100
+               ELSE 0
+           END as progress
+    FROM cirugias c
+    WHERE c.paciente_id = %s
+    ORDER BY c.fecha_programada DESC
+    LIMIT 1
+"""
+
+SELECT_FAMILY_VITALS = """
+    SELECT presion_sistolica, presion_diastolica, frecuencia_cardiaca,
+           temperatura, saturacion_oxigeno
+    FROM signos_vitales
+    WHERE paciente_id = %s
+    ORDER BY fecha_registro DESC
+    LIMIT 1
+"""
+
+SELECT_FAMILY_NOTIFICATIONS = """
+    SELECT n.titulo as message, n.fecha_envio as timestamp
+    FROM notificaciones n
+    JOIN codigos_familiares cf ON n.contacto_id = cf.contacto_id
+    WHERE cf.paciente_id = %s AND cf.activo = TRUE
+    ORDER BY n.fecha_envio DESC
+    LIMIT 5
+"""
+
+async def fetch_family_data(patient_id: int):
+    """Filas que componen el snapshot familiar; None si el paciente no existe o está inactivo."""
+    async with async_db.reader(patient_key(patient_id)).cursor() as cursor:
         # Obtener datos del paciente
-        cursor.execute("""
-            SELECT id, nombre, apellido, cedula, fecha_nacimiento, sexo, eps, tipo_sangre
-            FROM pacientes WHERE id = %s AND activo = TRUE
-        """, (patient_id,))
-        patient = cursor.fetchone()
+        await cursor.execute(SELECT_FAMILY_PATIENT, (patient_id,))
+        patient = await cursor.fetchone()
         
         if not patient:
-            raise HTTPException(status_code=404, detail="Patient not found")
+            return None
         
         # Obtener cirugía activa más reciente
-        cursor.execute("""
-            SELECT c.*, tc.nombre as tipo_cirugia_nombre,
-                   CONCAT(m.nombre, ' ', m.apellido) as medico_nombre,
-                   CASE 
-                       WHEN c.estado = 'Programada' THEN 'preparacion'
-                       WHEN c.estado = 'En_proceso' THEN 'en_progreso'
-                       WHEN c.estado = 'Finalizada' THEN 'finalizada'
-                       WHEN c.estado = 'Cancelada' THEN 'complicacion'
-                       ELSE 'preparacion'
-                   END as current_status,
-                   CASE 
-                       WHEN c.estado = 'Programada' THEN 0
-                       WHEN c.estado = 'Pre-operatorio' THEN 25
-                       WHEN c.estado = 'En_proceso' THEN 75
-                       WHEN c.estado = 'Post-operatorio' THEN 90
-                       WHEN c.estado = 'Finalizada' THEN 100
-                       ELSE 0
-                   END as progress,
-                   CASE 
-                       WHEN c.fecha_inicio IS NOT NULL THEN 
-                           TIMESTAMPDIFF(MINUTE, c.fecha_inicio, COALESCE(c.fecha_fin, NOW()))
-                       ELSE 0
-                   END as elapsed_time
-            FROM cirugias c
-            JOIN tipos_cirugia tc ON c.tipo_cirugia_id = tc.id
-            JOIN medicos m ON c.medico_principal_id = m.id
-            WHERE c.paciente_id = %s
-            ORDER BY c.fecha_programada DESC
-            LIMIT 1
-        """, (patient_id,))
-        surgery = cursor.fetchone()
+        await cursor.execute(SELECT_FAMILY_SURGERY, (patient_id,))
+        surgery = await cursor.fetchone()
+        if surgery:
+            # Nombres desde la caché de referencia en vez de JOIN con tipos_cirugia y medicos
+            if reference_data.missing([surgery["medico_principal_id"]], [surgery["tipo_cirugia_id"]]):
+                await run_in_threadpool(reference_data.reload_for_miss)
+            surgery["tipo_cirugia_nombre"] = reference_data.tipo_cirugia_nombre(surgery["tipo_cirugia_id"])
+            surgery["medico_nombre"] = reference_data.medico_nombre(surgery["medico_principal_id"])
         
         # Obtener signos vitales más recientes
-        cursor.execute("""
-            SELECT presion_sistolica, presion_diastolica, frecuencia_cardiaca, 
-                   temperatura, saturacion_oxigeno
-            FROM signos_vitales 
-            WHERE paciente_id = %s
-            ORDER BY fecha_registro DESC
-            LIMIT 1
-        """, (patient_id,))
-        vital_signs = cursor.fetchone()
+        await cursor.execute(SELECT_FAMILY_VITALS, (patient_id,))
+        vital_signs = await cursor.fetchone()
         
         # Obtener notificaciones recientes
-        cursor.execute("""
-            SELECT n.titulo as message, n.fecha_envio as timestamp
-            FROM notificaciones n
-            JOIN codigos_familiares cf ON n.contacto_id = cf.contacto_id
-            WHERE cf.paciente_id = %s AND cf.activo = TRUE
-            ORDER BY n.fecha_envio DESC
-            LIMIT 5
-        """, (patient_id,))
-        notifications = cursor.fetchall()
-        
+        await cursor.execute(SELECT_FAMILY_NOTIFICATIONS, (patient_id,))
+        notifications = await cursor.fetchall()
+
         return {
             "patient": patient,
-            "surgery_status": {
-                "current_status": surgery["current_status"] if surgery else "preparacion",
-                "progress": surgery["progress"] if surgery else 0,
-                "elapsed_time": f"{surgery['elapsed_time']//60:02d}:{surgery['elapsed_time']%60:02d}" if surgery else "00:00",
-                "heart_rate": vital_signs["frecuencia_cardiaca"] if vital_signs else 72,
-                "blood_pressure": f"{vital_signs['presion_sistolica']}/{vital_signs['presion_diastolica']}" if vital_signs else "120/80",
-                "temperature": vital_signs["temperatura"] if vital_signs else 36.5,
-                "oxygen_saturation": vital_signs["saturacion_oxigeno"] if vital_signs else 98,
-                "notifications": notifications
-            }
+            "surgery": surgery,
+            "vital_signs": vital_signs,
+            "notifications": list(notifications),
         }
-    finally:
-        cursor.close()
-        conn.close()
+
+def surgery_elapsed_minutes(surgery: dict) -> int:
+    # Se calcula al leer para que el snapshot en caché no congele el tiempo transcurrido
+    if not surgery["fecha_inicio"]:
+        return 0
+    end = surgery["fecha_fin"] or datetime.now()
+    return int((end - surgery["fecha_inicio"]).total_seconds() // 60)
+
+def build_family_snapshot(data: dict):
+    patient = data["patient"]
+    surgery = data["surgery"]
+    vital_signs = data["vital_signs"]
+    notifications = data["notifications"]
+    elapsed_time = surgery_elapsed_minutes(surgery) if surgery else 0
+    return {
+        "patient": patient,
+        "surgery_status": {
+            "current_status": surgery["current_status"] if surgery else "preparacion",
+            "progress": surgery["progress"] if surgery else 0,
+            "elapsed_time": f"{elapsed_time//60:02d}:{elapsed_time%60:02d}" if surgery else "00:00",
+            "heart_rate": vital_signs["frecuencia_cardiaca"] if vital_signs else 72,
+            "blood_pressure": f"{vital_signs['presion_sistolica']}/{vital_signs['presion_diastolica']}" if vital_signs else "120/80",
+            "temperature": vital_signs["temperatura"] if vital_signs else 36.5,
+            "oxygen_saturation": vital_signs["saturacion_oxigeno"] if vital_signs else 98,
+            "notifications": notifications
+        }
+    }
+
+async def load_family_snapshot(patient_id: int):
+    """Snapshot que ve el familiar, servido desde `family_cache` cuando es posible."""
+    data = family_cache.get(patient_id)
+    if data is None:
+        token = family_cache.begin()
+        data = await fetch_family_data(patient_id)
+        if data is None:
+            return None
+        family_cache.put(patient_id, data, token)
+    return build_family_snapshot(data)
+
+def refresh_patient(patient_id: int, version: Optional[int] = None, modified: Optional[float] = None):
+    """Invalida en este proceso lo derivado del paciente: snapshot, versión del ETag y streams."""
+    # Primero la caché: quien ya vea la versión nueva no puede recibir el snapshot viejo
+    family_cache.invalidate(patient_id)
+    if version is None:
+        patient_versions.bump(patient_id)
+    else:
+        patient_versions.advance(patient_id, version, modified)
+    family_broker.notify_patient(patient_id)
+
+def invalidate_patient(patient_id: int):
+    """Llamar tras el commit de cualquier escritura que afecte al snapshot familiar.
+
+    Con varios workers el hub asigna la versión y los demás la aplican con `refresh_patient`.
+    """
+    db_manager.mark_write(patient_key(patient_id))
+    refresh_patient(patient_id, *(cluster.bump("paciente", patient_id) or ()))
+
+def publish_outbox_events(events: List[dict]):
+    """Canal push del outbox: las notificaciones nuevas llegan a los streams familiares."""
+    for patient_id in {event["paciente_id"] for event in events}:
+        invalidate_patient(patient_id)
+
+@app.get("/family/patient/{patient_id}")
+async def get_family_patient_data(patient_id: int, request: Request, token_data: dict = Depends(verify_family_token)):
+    # Verificar que el token corresponde al paciente
+    if token_data.get("patient_id") != patient_id:
+        raise HTTPException(status_code=403, detail="Access denied to this patient data")
+
+    version, last_modified = patient_versions.current(patient_id)
+    snapshot = await load_family_snapshot(patient_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    # El tiempo transcurrido de la cirugía cambia sin escrituras: forma parte del ETag
+    etag = make_etag("family", patient_id, version, snapshot["surgery_status"]["elapsed_time"])
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, last_modified)
+    return conditional_response(request, JSONResponse(jsonable_encoder(snapshot)), etag, last_modified)
+
+@app.get("/family/patient/{patient_id}/stream")
+async def stream_family_patient_data(patient_id: int, token_data: dict = Depends(verify_family_stream_token)):
+    if token_data.get("patient_id") != patient_id:
+        raise HTTPException(status_code=403, detail="Access denied to this patient data")
+
+    snapshot = await load_family_snapshot(patient_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return StreamingResponse(
+        family_broker.stream(patient_id, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+PACIENTE_LIST_COLUMNS = (
+    "id", "nombre", "apellido", "cedula", "fecha_nacimiento", "sexo",
+    "telefono", "eps", "tipo_sangre",
+)
+
+CONTACTO_COLUMNS = (
+    "id", "paciente_id", "usuario_id", "nombre", "apellido", "relacion", "telefono",
+    "email", "es_contacto_principal", "notificaciones_activas",
+    "puede_recibir_info_medica", "fecha_creacion",
+)
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+def parse_page_params(page_cursor: Optional[str], fields: Optional[str], allowed):
+    try:
+        return decode_cursor(page_cursor), select_columns(fields, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def page_response(request: Request, description, rows: list, limit: int):
+    """Recorta la fila extra pedida y publica el cursor de la siguiente página en cabeceras."""
+    headers = {}
+    if len(rows) > limit:
+        del rows[limit:]
+        id_index = [column[0] for column in description].index("id")
+        next_cursor = encode_cursor(rows[-1][id_index])
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return rows_response(description, rows, headers)
+
+def export_response(table: str, columns, where: str, fmt: str):
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Formato no soportado, use ndjson o csv")
+    query = f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY id"
+    return StreamingResponse(
+        export_rows(db_manager.reader(), query, (), columns, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
+
+# Página de pacientes tras el cursor; `columns` sale de `select_columns`
+SELECT_PACIENTES_PAGE = """
+    SELECT {columns}
+    FROM pacientes
+    WHERE activo = TRUE AND id > %s
+    ORDER BY id
+    LIMIT %s
+"""
 
 @app.get("/pacientes")
-def get_pacientes(token_data: dict = Depends(require_admin_or_medico)):
-    conn = db_manager.get_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Error al conectar con la base de datos")
-    
-    cursor = conn.cursor(dictionary=True)
-    
+async def get_pacientes(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    fields: Optional[str] = None,
+    token_data: dict = Depends(require_admin_or_medico),
+):
+    after_id, columns = parse_page_params(page_cursor, fields, PACIENTE_LIST_COLUMNS)
     try:
-        cursor.execute("""
-            SELECT 
-                id, nombre, apellido, cedula, fecha_nacimiento, sexo, 
-                telefono, eps, tipo_sangre
-            FROM pacientes
-            WHERE activo = TRUE
-            LIMIT 50
-        """)
-        pacientes = cursor.fetchall()
-        return pacientes
+        async with async_db.reader(session_key(token_data)).cursor(aiomysql.Cursor) as cursor:
+            await cursor.execute(SELECT_PACIENTES_PAGE.format(columns=', '.join(columns)), (after_id, limit + 1))
+            pacientes = list(await cursor.fetchall())
+            return page_response(request, cursor.description, pacientes, limit)
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en la consulta: {str(e)}")
-    finally:
-        cursor.close()
-        conn.close()
+
+@app.get("/pacientes/export")
+def export_pacientes(format: str = "ndjson", fields: Optional[str] = None,
+                     token_data: dict = Depends(require_admin_or_medico)):
+    _, columns = parse_page_params(None, fields, PACIENTE_LIST_COLUMNS)
+    return export_response("pacientes", columns, "WHERE activo = TRUE", format)
+
+@app.get("/pacientes/search")
+async def search_pacientes(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    token_data: dict = Depends(require_admin_or_medico),
+):
+    """Búsqueda por prefijo de nombre, apellido o cédula, sin distinguir acentos."""
+    if patient_index.ready:
+        return patient_index.search(q, limit)
+    if not tokenize(q):
+        return []
+    query, params = fulltext_query(q, limit)
+    return await async_db.reader(session_key(token_data)).fetchall(query, params)
+
+@app.get("/pacientes/sala")
+async def get_vista_sala(
+    request: Request,
+    ids: str = Query(..., description="Ids de pacientes separados por comas"),
+    fields: Optional[str] = None,
+    token_data: dict = Depends(require_admin_or_medico),
+):
+    """Últimos signos, última evolución y cirugía actual de varios pacientes en una consulta.
+
+    Los ids inexistentes o inactivos no fallan la petición: se devuelven en `no_encontrados`.
+    """
+    try:
+        patient_ids = parse_ward_ids(ids)
+        selected = parse_ward_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    versions = [patient_versions.current(pid) for pid in patient_ids]
+    etag = make_etag("sala", hashlib.blake2b(
+        repr((patient_ids, selected, [version for version, _ in versions])).encode(), digest_size=8).hexdigest())
+    last_modified = max(modified for _, modified in versions)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, last_modified)
+    reader = async_db.reader(session_key(token_data), *(patient_key(pid) for pid in patient_ids))
+    async with reader.cursor(aiomysql.Cursor) as cursor:
+        await cursor.execute(ward_query(len(patient_ids), selected), patient_ids)
+        found = assemble_ward(cursor.description, await cursor.fetchall(), selected)
+    pacientes = [found[pid] for pid in patient_ids if pid in found]
+    if reference_data.missing(*reference_ids(pacientes)):
+        await run_in_threadpool(reference_data.reload_for_miss)
+    add_reference_names(pacientes)
+    body = {
+        "pacientes": pacientes,
+        "no_encontrados": [pid for pid in patient_ids if pid not in found],
+    }
+    return conditional_response(request, JSONResponse(jsonable_encoder(body)), etag, last_modified)
+
+SELECT_PACIENTE = """
+    SELECT p.*,
+           COUNT(c.id) as total_cirugias,
+           MAX(c.fecha_programada) as ultima_cirugia
+    FROM pacientes p
+    LEFT JOIN cirugias c ON p.id = c.paciente_id
+    WHERE p.id = %s
+    GROUP BY p.id
+"""
 
 @app.get("/pacientes/{paciente_id}")
-def get_paciente(paciente_id: int, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
+def get_paciente(paciente_id: int, token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_read_db)):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("""
-            SELECT p.*, 
-                   COUNT(c.id) as total_cirugias,
-                   MAX(c.fecha_programada) as ultima_cirugia
-            FROM pacientes p
-            LEFT JOIN cirugias c ON p.id = c.paciente_id
-            WHERE p.id = %s
-            GROUP BY p.id
-        """, (paciente_id,))
+        cursor.execute(SELECT_PACIENTE, (paciente_id,))
         paciente = cursor.fetchone()
         
         if not paciente:
@@ -358,142 +702,500 @@ def get_paciente(paciente_id: int, token_data: dict = Depends(require_admin_or_m
         return paciente
     finally:
         cursor.close()
-        conn.close()
+
+def schedule_conflict(conflicts, siguiente: Optional[datetime]):
+    return HTTPException(status_code=409, detail=jsonable_encoder({
+        "mensaje": "El cirujano o el quirófano ya tienen una cirugía en ese horario",
+        "conflictos": [surgery.as_dict() for surgery in conflicts],
+        "siguiente_hueco": siguiente,
+    }))
+
+@app.post("/cirugias/{paciente_id}", status_code=status.HTTP_201_CREATED)
+def crear_cirugia(paciente_id: int, cirugia: CirugiaBase, token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_db)):
+    if cirugia.fecha_programada.tzinfo is not None:
+        # La base guarda hora local sin zona
+        cirugia.fecha_programada = cirugia.fecha_programada.astimezone().replace(tzinfo=None)
+    surgery_schedule.ensure_loaded()
+    reference_data.ensure([cirugia.medico_principal_id], [cirugia.tipo_cirugia_id])
+    duracion = surgery_schedule.duration(cirugia.tipo_cirugia_id)
+    if duracion is None:
+        raise HTTPException(status_code=422, detail="Tipo de cirugía no existe")
+    medico = reference_data.medico(cirugia.medico_principal_id)
+    if medico is None or not medico.activo:
+        raise HTTPException(status_code=422, detail="Médico no existe o está inactivo")
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT id FROM pacientes WHERE id = %s", (paciente_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Paciente no encontrado")
+
+        # Con varios workers la reserva se serializa en el hub: al entrar, este
+        # worker ya aplicó las cirugías que confirmaron los demás
+        with cluster.lock("agenda"):
+            # El índice comprueba solapes y reserva el hueco antes del INSERT
+            pending_id, conflicts = surgery_schedule.reserve(
+                paciente_id, cirugia.medico_principal_id, cirugia.quirofano,
+                cirugia.tipo_cirugia_id, cirugia.fecha_programada,
+            )
+            if conflicts:
+                raise schedule_conflict(conflicts, surgery_schedule.next_free(
+                    cirugia.medico_principal_id, cirugia.quirofano, cirugia.fecha_programada, duracion))
+            try:
+                cursor.execute("""
+                    INSERT INTO cirugias
+                    (paciente_id, medico_principal_id, tipo_cirugia_id, fecha_programada, quirofano, notas_preoperatorias)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (
+                    paciente_id, cirugia.medico_principal_id, cirugia.tipo_cirugia_id,
+                    cirugia.fecha_programada, cirugia.quirofano, cirugia.notas_preoperatorias,
+                ))
+                cirugia_id = cursor.lastrowid
+                audit = audit_writer.stage(conn, [AuditEntry(
+                    "cirugias", cirugia_id, "INSERT", token_data.get("user_id"),
+                    nuevos={"paciente_id": paciente_id, **cirugia.model_dump()},
+                )])
+                conn.commit()
+            except Exception:
+                surgery_schedule.release(pending_id)
+                raise
+            surgery_schedule.confirm(pending_id, cirugia_id)
+            cluster.publish("agenda", (
+                cirugia_id, paciente_id, cirugia.medico_principal_id, cirugia.quirofano,
+                cirugia.tipo_cirugia_id, 'Programada', cirugia.fecha_programada, None, None,
+            ))
+        db_manager.mark_write(session_key(token_data))
+        audit_writer.record(audit)
+        cluster.replicate("dashboard_cirugia", cirugia.fecha_programada)
+        invalidate_patient(paciente_id)
+        return {
+            "message": "Cirugía programada correctamente",
+            "id": cirugia_id,
+            "fin_estimado": cirugia.fecha_programada + duracion,
+        }
+    finally:
+        cursor.close()
+
+@app.get("/quirofanos/agenda")
+def get_agenda_quirofanos(fecha: Optional[date] = None, quirofano: Optional[str] = None,
+                          token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_read_db)):
+    """Cirugías del día y huecos libres de la jornada por quirófano, desde el índice en memoria."""
+    surgery_schedule.ensure_loaded()
+    fecha = fecha or date.today()
+    board = surgery_schedule.board(fecha, quirofano)
+    ids = [item["id"] for room in board for item in room["cirugias"]]
+    names = {}
+    if ids:
+        # Solo los nombres de pacientes: una consulta por clave primaria para las cirugías del tablero
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT c.id, CONCAT(p.nombre, ' ', p.apellido)
+                FROM cirugias c
+                JOIN pacientes p ON c.paciente_id = p.id
+                WHERE c.id IN ({', '.join(['%s'] * len(ids))})
+            """, tuple(ids))
+            names = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+    reference_data.ensure([item["medico_principal_id"] for room in board for item in room["cirugias"]])
+    for room in board:
+        for item in room["cirugias"]:
+            item["paciente_nombre"] = names.get(item["id"])
+            item["medico_nombre"] = reference_data.medico_nombre(item["medico_principal_id"])
+            item["especialidad"] = reference_data.especialidad_de(item["medico_principal_id"])
+            item["tipo_cirugia_nombre"] = reference_data.tipo_cirugia_nombre(item["tipo_cirugia_id"])
+    return {"fecha": fecha, "quirofanos": board}
+
+SELECT_CIRUGIAS_PACIENTE = """
+    SELECT c.* FROM cirugias c
+    WHERE c.paciente_id = %s
+    ORDER BY c.fecha_programada DESC
+"""
 
 @app.get("/cirugias/{paciente_id}")
-def get_cirugias_paciente(paciente_id: int, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+def get_cirugias_paciente(paciente_id: int, token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_read_db)):
+    cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            SELECT c.*, tc.nombre as tipo_cirugia_nombre,
-                   CONCAT(m.nombre, ' ', m.apellido) as medico_nombre
-            FROM cirugias c
-            JOIN tipos_cirugia tc ON c.tipo_cirugia_id = tc.id
-            JOIN medicos m ON c.medico_principal_id = m.id
-            WHERE c.paciente_id = %s
-            ORDER BY c.fecha_programada DESC
-        """, (paciente_id,))
+        cursor.execute(SELECT_CIRUGIAS_PACIENTE, (paciente_id,))
         cirugias = cursor.fetchall()
-        return cirugias
+        names = [column[0] for column in cursor.description]
+        medico_col, tipo_col = names.index("medico_principal_id"), names.index("tipo_cirugia_id")
+        reference_data.ensure([row[medico_col] for row in cirugias], [row[tipo_col] for row in cirugias])
+        description, cirugias = reference_data.enrich(cursor.description, cirugias, [
+            ("tipo_cirugia_nombre", "tipo_cirugia_id", reference_data.tipo_cirugia_nombre),
+            ("medico_nombre", "medico_principal_id", reference_data.medico_nombre),
+        ])
+        return rows_response(description, cirugias)
     finally:
         cursor.close()
-        conn.close()
 
 @app.put("/cirugias/{cirugia_id}/estado")
-def actualizar_estado_cirugia(cirugia_id: int, estado: str, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
+def actualizar_estado_cirugia(cirugia_id: int, estado: str, token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_db)):
     cursor = conn.cursor()
     
     try:
+        # Estado anterior, para mantener los contadores del dashboard
+        # y la fila completa para la agenda de quirófanos
+        cursor.execute("""
+            SELECT paciente_id, estado, medico_principal_id, quirofano, tipo_cirugia_id,
+                   fecha_programada, fecha_inicio, fecha_fin
+            FROM cirugias WHERE id = %s FOR UPDATE
+        """, (cirugia_id,))
+        row = cursor.fetchone()
+        now = datetime.now()
+
         # Actualizar estado
         cursor.execute("""
             UPDATE cirugias 
             SET estado = %s, 
-                fecha_inicio = CASE WHEN %s = 'En_proceso' THEN NOW() ELSE fecha_inicio END,
-                fecha_fin = CASE WHEN %s = 'Finalizada' THEN NOW() ELSE fecha_fin END
+                fecha_inicio = CASE WHEN %s = 'En_proceso' THEN %s ELSE fecha_inicio END,
+                fecha_fin = CASE WHEN %s = 'Finalizada' THEN %s ELSE fecha_fin END
             WHERE id = %s
-        """, (estado, estado, estado, cirugia_id))
+        """, (estado, estado, now, estado, now, cirugia_id))
         
-        # Notificar a contactos
-        cursor.execute("""
-            INSERT INTO notificaciones (contacto_id, paciente_id, cirugia_id, tipo, titulo, mensaje)
-            SELECT c.id, ci.paciente_id, ci.id, 'cambio_estado',
-                   CONCAT('Cambio de estado en cirugía'),
-                   CONCAT('La cirugía ha cambiado a estado: ', %s)
-            FROM contactos c
-            JOIN cirugias ci ON c.paciente_id = ci.paciente_id
-            WHERE ci.id = %s AND c.notificaciones_activas = TRUE
-        """, (estado, cirugia_id))
+        # Notificar a contactos: el outbox entrega las notificaciones fuera de la petición
+        audit = []
+        if row:
+            enqueue_event(cursor, EVENTO_CAMBIO_ESTADO, row[0], cirugia_id, {"estado": estado})
+            audit = audit_writer.stage(conn, [AuditEntry(
+                "cirugias", cirugia_id, "UPDATE", token_data.get("user_id"),
+                anteriores={"estado": row[1], "fecha_inicio": row[6], "fecha_fin": row[7]},
+                nuevos={
+                    "estado": estado,
+                    "fecha_inicio": now if estado == 'En_proceso' else row[6],
+                    "fecha_fin": now if estado == 'Finalizada' else row[7],
+                },
+            )])
         
         conn.commit()
+        db_manager.mark_write(session_key(token_data))
+        audit_writer.record(audit)
+        if row:
+            outbox_dispatcher.notify()
+            cluster.replicate("dashboard_estado_cirugia", row[1], estado)
+            cluster.replicate("agenda", (
+                cirugia_id, row[0], row[2], row[3], row[4], estado, row[5],
+                now if estado == 'En_proceso' else row[6],
+                now if estado == 'Finalizada' else row[7],
+            ))
+            invalidate_patient(row[0])
         return {"message": "Estado actualizado correctamente"}
     finally:
         cursor.close()
-        conn.close()
+
+# Páginas de contactos; `columns` sale de `select_columns`
+SELECT_CONTACTOS_PAGE = """
+    SELECT {columns} FROM contactos
+    WHERE id > %s
+    ORDER BY id ASC
+    LIMIT %s
+"""
+
+# Paginación por offset que aún usan algunos clientes
+SELECT_CONTACTOS_OFFSET = """
+    SELECT {columns} FROM contactos
+    ORDER BY id ASC
+    LIMIT %s OFFSET %s
+"""
 
 @app.get("/contactos")
-def get_contactos(limit: int = 50, offset: int = 0, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+def get_contactos(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, deprecated=True),
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    fields: Optional[str] = None,
+    token_data: dict = Depends(require_admin_or_medico),
+    conn=Depends(get_read_db),
+):
+    after_id, columns = parse_page_params(page_cursor, fields, CONTACTO_COLUMNS)
+    cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            SELECT * FROM contactos
-            ORDER BY id ASC
-            LIMIT %s OFFSET %s
-        """, (limit, offset))
+        if offset and not page_cursor:
+            # Compatibilidad con clientes que aún paginan por offset
+            cursor.execute(SELECT_CONTACTOS_OFFSET.format(columns=', '.join(columns)), (limit + 1, offset))
+        else:
+            cursor.execute(SELECT_CONTACTOS_PAGE.format(columns=', '.join(columns)), (after_id, limit + 1))
         contactos = cursor.fetchall()
-        return contactos
+        return page_response(request, cursor.description, contactos, limit)
     finally:
         cursor.close()
-        conn.close()
 
+@app.get("/contactos/export")
+def export_contactos(format: str = "ndjson", fields: Optional[str] = None,
+                     token_data: dict = Depends(require_admin_or_medico)):
+    _, columns = parse_page_params(None, fields, CONTACTO_COLUMNS)
+    return export_response("contactos", columns, "", format)
 
-@app.get("/signos-vitales/{paciente_id}")
-def get_signos_vitales(paciente_id: int, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+
+def existing_patients(cursor, patient_ids) -> set:
+    """Ids de `patient_ids` que existen en pacientes: signos_vitales no tiene FK (migración 0006)."""
+    patient_ids = sorted(set(patient_ids))
+    cursor.execute(
+        f"SELECT id FROM pacientes WHERE id IN ({', '.join(['%s'] * len(patient_ids))})",
+        tuple(patient_ids),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def validate_vitals_batch(cursor, lecturas: List[LecturaSignosVitales]):
+    """Valida todo el lote con dos consultas; devuelve los errores por índice de lectura."""
+    surgery_ids = sorted({l.cirugia_id for l in lecturas if l.cirugia_id is not None})
+
+    known_patients = existing_patients(cursor, [l.paciente_id for l in lecturas])
+    surgery_owner = {}
+    if surgery_ids:
+        cursor.execute(
+            f"SELECT id, paciente_id FROM cirugias WHERE id IN ({', '.join(['%s'] * len(surgery_ids))})",
+            tuple(surgery_ids),
+        )
+        surgery_owner = dict(cursor.fetchall())
+
+    latest_allowed = datetime.now() + timedelta(minutes=5)
+    # Los meses archivados (o archivándose) ya no admiten lecturas: no se verían en los rollups
+    earliest_allowed = cold_archive.closed_until('signos_vitales')
+    errors = []
+    for index, lectura in enumerate(lecturas):
+        if lectura.paciente_id not in known_patients:
+            errors.append({"index": index, "error": f"Paciente {lectura.paciente_id} no existe"})
+        elif lectura.cirugia_id is not None and surgery_owner.get(lectura.cirugia_id) != lectura.paciente_id:
+            errors.append({"index": index, "error": f"Cirugía {lectura.cirugia_id} no pertenece al paciente"})
+        elif lectura.fecha_registro is not None and lectura.fecha_registro > latest_allowed:
+            errors.append({"index": index, "error": "fecha_registro en el futuro"})
+        elif (lectura.fecha_registro is not None and earliest_allowed is not None
+              and lectura.fecha_registro < earliest_allowed):
+            errors.append({"index": index, "error": "fecha_registro anterior a los datos archivados"})
+    return errors
+
+def invalidate_vitals_rollups(rows):
+    earliest = {}
+    for row in rows:
+        key = (row[0], row[1])
+        if key not in earliest or row[2] < earliest[key]:
+            earliest[key] = row[2]
+    for (paciente_id, cirugia_id), fecha in earliest.items():
+        rollup_cache.invalidate(paciente_id, cirugia_id, fecha)
+
+def invalidate_vitals_patients(rows):
+    """Tras el commit de las lecturas: entran en el monitor y se invalidan las cachés."""
+    # Cuenta las alertas que `detect_vitals_alerts` ya encoló y gasta su cooldown
+    vitals_monitor.observe(rows)
+    # Primero invalidate_patient: marca la escritura para que el rollup que se
+    # recalcule tras invalidar la caché no se lea de una réplica atrasada
+    for paciente_id in {row[0] for row in rows}:
+        invalidate_patient(paciente_id)
+    invalidate_vitals_rollups(rows)
+    cluster.publish("signos", rows)
+
+def observe_remote_vitals(rows):
+    """Lecturas guardadas por otro worker: su monitor ya emitió las alertas, aquí solo se acumulan."""
+    vitals_monitor.observe(rows, emit=False)
+    invalidate_vitals_rollups(rows)
+
+def mark_remote_writes(keys):
+    # Escritura en otro worker: sin volver a difundirla (no pasa por mark_write)
+    db_manager.writes.mark(keys, time.time())
+
+def resync_local_state():
+    """El hub desconectó a este worker por atraso: recarga lo que mantenían los eventos perdidos."""
+    family_cache.clear()
+    rollup_cache.clear()
+    surgery_schedule.load()
+    stats_engine.load()
+
+def register_cluster_handlers():
+    """Qué aplica cada worker cuando otro publica en `cluster` (sin serve.py no se usa más que `replicate`)."""
+    cluster.register("paciente", refresh_patient)
+    cluster.register("signos", observe_remote_vitals)
+    cluster.register("agenda", surgery_schedule.apply)
+    cluster.register("escrituras", mark_remote_writes)
+    cluster.register("dashboard_cirugia", stats_engine.on_surgery_created)
+    cluster.register("dashboard_estado_cirugia", stats_engine.on_surgery_state_change)
+    cluster.register("dashboard_evolucion", stats_engine.on_evolution_created)
+    cluster.on_resync.append(resync_local_state)
+    cluster.metrics_source = partial(collect_metrics, METRIC_GAUGES)
+    if db_manager.replicas and not db_manager.write_listeners:
+        db_manager.write_listeners.append(partial(cluster.publish, "escrituras"))
+
+def detect_vitals_alerts(conn, rows) -> int:
+    """Evalúa las lecturas con `vitals_monitor` y encola sus alertas en la transacción de `conn`.
+
+    No modifica el monitor: las lecturas entran en él con `invalidate_vitals_patients`
+    tras el commit, así que un commit fallido no deja rastro y el reintento vuelve a alertar.
+    """
+    alerts = vitals_monitor.evaluate(rows)
+    if alerts:
+        cursor = conn.cursor()
+        try:
+            for alert in alerts:
+                enqueue_event(cursor, EVENTO_COMPLICACION, alert["paciente_id"], alert["cirugia_id"], alert)
+        finally:
+            cursor.close()
+    return len(alerts)
+
+def on_vitals_flush(rows):
+    invalidate_vitals_patients(rows)
+    # Puede haber alertas encoladas en el lote: el dispatcher comprueba y, si no, no hace nada
+    outbox_dispatcher.notify()
+
+@app.post("/signos-vitales/lote")
+def crear_signos_vitales_lote(lote: LoteSignosVitales, response: Response, buffered: bool = False,
+                              token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_db)):
+    cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            SELECT * FROM signos_vitales 
-            WHERE paciente_id = %s
-            ORDER BY fecha_registro DESC
-            LIMIT 20
-        """, (paciente_id,))
-        signos = cursor.fetchall()
-        return signos
+        errors = validate_vitals_batch(cursor, lote.lecturas)
     finally:
         cursor.close()
-        conn.close()
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    now = datetime.now()
+    rows = [
+        (
+            l.paciente_id, l.cirugia_id, l.fecha_registro or now, l.presion_sistolica,
+            l.presion_diastolica, l.frecuencia_cardiaca, l.temperatura, l.saturacion_oxigeno,
+            l.frecuencia_respiratoria, l.dolor_escala, token_data.get("user_id"),
+        )
+        for l in lote.lecturas
+    ]
+
+    if buffered:
+        # Los monitores no esperan la escritura: el buffer la hace por lotes
+        try:
+            vitals_batcher.submit(rows)
+        except VitalsBufferFullError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Buffer de signos vitales lleno, intente nuevamente",
+                headers={"Retry-After": str(max(1, int(vitals_batcher.retry_after() + 0.999)))},
+            )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"message": "Lecturas encoladas", "lecturas": len(rows)}
+
+    ids = insert_vitals(conn, rows)
+    alerts = detect_vitals_alerts(conn, rows)
+    audit = audit_writer.stage(conn, audit_entries(rows, ids))
+    conn.commit()
+    db_manager.mark_write(session_key(token_data))
+    audit_writer.record(audit)
+    if alerts:
+        outbox_dispatcher.notify()
+    invalidate_vitals_patients(rows)
+    return {"message": "Signos vitales registrados correctamente", "lecturas": len(rows)}
+
+SELECT_SIGNOS_VITALES = """
+    SELECT * FROM signos_vitales
+    WHERE paciente_id = %s
+    ORDER BY fecha_registro DESC
+    LIMIT 20
+"""
+
+@app.get("/signos-vitales/{paciente_id}")
+async def get_signos_vitales(paciente_id: int, request: Request, token_data: dict = Depends(require_admin_or_medico)):
+    version, last_modified = patient_versions.current(paciente_id)
+    etag = make_etag("signos", paciente_id, version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, last_modified)
+    reader = async_db.reader(session_key(token_data), patient_key(paciente_id))
+    async with reader.cursor(aiomysql.Cursor) as cursor:
+        await cursor.execute(SELECT_SIGNOS_VITALES, (paciente_id,))
+        signos = await cursor.fetchall()
+        return conditional_response(request, rows_response(cursor.description, signos), etag, last_modified)
+
+@app.get("/signos-vitales/{paciente_id}/rollup")
+async def get_signos_vitales_rollup(
+    paciente_id: int,
+    bucket: Literal["1m", "5m", "1h", "1d"] = "5m",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cirugia_id: Optional[int] = None,
+    token_data: dict = Depends(require_admin_or_medico),
+):
+    hasta = hasta or datetime.now()
+    desde = desde or hasta - timedelta(hours=24)
+    try:
+        reader = async_db.reader(session_key(token_data), patient_key(paciente_id))
+        buckets = await vitals_rollup(reader, paciente_id, cirugia_id, bucket, desde, hasta)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "paciente_id": paciente_id,
+        "cirugia_id": cirugia_id,
+        "bucket": bucket,
+        "desde": desde,
+        "hasta": hasta,
+        "buckets": buckets,
+    }
 
 @app.post("/signos-vitales/{paciente_id}")
-def crear_signos_vitales(paciente_id: int, signos: SignosVitalesBase, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
+def crear_signos_vitales(paciente_id: int, signos: SignosVitalesBase, token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_db)):
     cursor = conn.cursor()
+    now = datetime.now()
     
     try:
+        if not existing_patients(cursor, [paciente_id]):
+            raise HTTPException(status_code=404, detail="Paciente no encontrado")
         cursor.execute("""
             INSERT INTO signos_vitales 
             (paciente_id, fecha_registro, presion_sistolica, presion_diastolica, 
              frecuencia_cardiaca, temperatura, saturacion_oxigeno, dolor_escala, registrado_por_medico_id)
-            VALUES (%s, NOW(), %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, (
-            paciente_id, signos.presion_sistolica, signos.presion_diastolica,
+            paciente_id, now, signos.presion_sistolica, signos.presion_diastolica,
             signos.frecuencia_cardiaca, signos.temperatura, signos.saturacion_oxigeno,
             signos.dolor_escala, token_data.get("user_id")
         ))
+        signos_id = cursor.lastrowid
+        row = (
+            paciente_id, None, now, signos.presion_sistolica, signos.presion_diastolica,
+            signos.frecuencia_cardiaca, signos.temperatura, signos.saturacion_oxigeno,
+            None, signos.dolor_escala, token_data.get("user_id"),
+        )
+        alerts = detect_vitals_alerts(conn, [row])
+        audit = audit_writer.stage(conn, [AuditEntry(
+            "signos_vitales", signos_id, "INSERT", token_data.get("user_id"),
+            nuevos={"paciente_id": paciente_id, "fecha_registro": now, **signos.model_dump()},
+        )])
         conn.commit()
+        db_manager.mark_write(session_key(token_data))
+        audit_writer.record(audit)
+        if alerts:
+            outbox_dispatcher.notify()
+        invalidate_vitals_patients([row])
         return {"message": "Signos vitales registrados correctamente"}
     finally:
         cursor.close()
-        conn.close()
+
+SELECT_EVOLUCIONES = """
+    SELECT e.* FROM evoluciones_clinicas e
+    WHERE e.paciente_id = %s
+    ORDER BY e.fecha_registro DESC
+    LIMIT 10
+"""
 
 @app.get("/evoluciones/{paciente_id}")
-def get_evoluciones(paciente_id: int, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("""
-            SELECT e.*, CONCAT(m.nombre, ' ', m.apellido) as medico_nombre
-            FROM evoluciones_clinicas e
-            JOIN medicos m ON e.medico_id = m.id
-            WHERE e.paciente_id = %s
-            ORDER BY e.fecha_registro DESC
-            LIMIT 10
-        """, (paciente_id,))
-        evoluciones = cursor.fetchall()
-        return evoluciones
-    finally:
-        cursor.close()
-        conn.close()
+async def get_evoluciones(paciente_id: int, request: Request, token_data: dict = Depends(require_admin_or_medico)):
+    version, last_modified = patient_versions.current(paciente_id)
+    etag = make_etag("evoluciones", paciente_id, version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, last_modified)
+    reader = async_db.reader(session_key(token_data), patient_key(paciente_id))
+    async with reader.cursor(aiomysql.Cursor) as cursor:
+        await cursor.execute(SELECT_EVOLUCIONES, (paciente_id,))
+        evoluciones = await cursor.fetchall()
+        medico_col = [column[0] for column in cursor.description].index("medico_id")
+        if reference_data.missing([row[medico_col] for row in evoluciones]):
+            await run_in_threadpool(reference_data.reload_for_miss)
+        description, evoluciones = reference_data.enrich(cursor.description, evoluciones, [
+            ("medico_nombre", "medico_id", reference_data.medico_nombre),
+        ])
+        return conditional_response(request, rows_response(description, evoluciones), etag, last_modified)
 
 @app.post("/evoluciones/{paciente_id}")
-def crear_evolucion(paciente_id: int, evolucion: EvolucionClinicaBase, token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
+def crear_evolucion(paciente_id: int, evolucion: EvolucionClinicaBase, token_data: dict = Depends(require_admin_or_medico), conn=Depends(get_db)):
     cursor = conn.cursor()
     
     try:
@@ -509,64 +1211,116 @@ def crear_evolucion(paciente_id: int, evolucion: EvolucionClinicaBase, token_dat
             evolucion.observaciones,
             evolucion.medico_id
         ))
+        evolucion_id = cursor.lastrowid
+        audit = audit_writer.stage(conn, [AuditEntry(
+            "evoluciones_clinicas", evolucion_id, "INSERT", token_data.get("user_id"),
+            nuevos={"paciente_id": paciente_id, **evolucion.model_dump()},
+        )])
         conn.commit()
+        db_manager.mark_write(session_key(token_data))
+        audit_writer.record(audit)
+        cluster.replicate("dashboard_evolucion", paciente_id, evolucion.estado_general, datetime.now())
+        invalidate_patient(paciente_id)
         return {"message": "Evolución clínica registrada correctamente"}
     finally:
         cursor.close()
-        conn.close()
 
 
 @app.get("/dashboard/stats")
-def get_dashboard_stats(token_data: dict = Depends(require_admin_or_medico)):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
+async def get_dashboard_stats(request: Request, token_data: dict = Depends(require_admin_or_medico)):
+    if not stats_engine.ready:
+        stats = await query_dashboard_stats()
+        stats['alertas_signos'] = vitals_monitor.critical_counts()
+        return stats
+    stats = stats_engine.snapshot()
+    # Pacientes cuya última lectura cumple alguna regla del detector de signos
+    stats['alertas_signos'] = vitals_monitor.critical_counts()
+    # Snapshot en memoria de pocos contadores: el ETag sale de su contenido
+    etag = make_etag("dashboard", hashlib.blake2b(repr(stats).encode(), digest_size=8).hexdigest())
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    return conditional_response(request, JSONResponse(jsonable_encoder(stats)), etag)
+
+# Contador del dashboard y la consulta que lo calcula directamente en SQL
+DASHBOARD_QUERIES = {
+    'total_pacientes': "SELECT COUNT(*) as total FROM pacientes WHERE activo = TRUE",
+    'cirugias_hoy': """
+        SELECT COUNT(*) as total FROM cirugias
+        WHERE fecha_programada >= CURDATE()
+        AND fecha_programada < CURDATE() + INTERVAL 1 DAY
+    """,
+    'cirugias_activas': """
+        SELECT COUNT(*) as total FROM cirugias
+        WHERE estado IN ('Pre-operatorio', 'En_proceso')
+    """,
+    'pacientes_criticos': """
+        SELECT COUNT(DISTINCT paciente_id) as total
+        FROM evoluciones_clinicas
+        WHERE estado_general = 'Crítico'
+        AND fecha_registro > DATE_SUB(NOW(), INTERVAL 24 HOUR)
+    """,
+}
+
+async def query_dashboard_stats():
+    """Cálculo directo en SQL, usado mientras `stats_engine` no ha cargado."""
+    async with async_db.reader().cursor() as cursor:
         stats = {}
-        
-        # Total pacientes
-        cursor.execute("SELECT COUNT(*) as total FROM pacientes WHERE activo = TRUE")
-        stats['total_pacientes'] = cursor.fetchone()['total']
-        
-        # Cirugías hoy
-        cursor.execute("""
-            SELECT COUNT(*) as total FROM cirugias 
-            WHERE DATE(fecha_programada) = CURDATE()
-        """)
-        stats['cirugias_hoy'] = cursor.fetchone()['total']
-        
-        # Cirugías en proceso
-        cursor.execute("""
-            SELECT COUNT(*) as total FROM cirugias 
-            WHERE estado IN ('Pre-operatorio', 'En_proceso')
-        """)
-        stats['cirugias_activas'] = cursor.fetchone()['total']
-        
-        # Pacientes críticos
-        cursor.execute("""
-            SELECT COUNT(DISTINCT paciente_id) as total 
-            FROM evoluciones_clinicas 
-            WHERE estado_general = 'Crítico' 
-            AND fecha_registro > DATE_SUB(NOW(), INTERVAL 24 HOUR)
-        """)
-        stats['pacientes_criticos'] = cursor.fetchone()['total']
-        
+        for name, query in DASHBOARD_QUERIES.items():
+            await cursor.execute(query)
+            stats[name] = (await cursor.fetchone())['total']
         return stats
-    finally:
-        cursor.close()
-        conn.close()
+
+@app.get("/cache/stats")
+def get_cache_stats(token_data: dict = Depends(require_admin)):
+    return {"family_snapshot": family_cache.stats(), "patient_search": patient_index.stats(),
+            "surgery_schedule": surgery_schedule.stats(), "reference_data": reference_data.stats(),
+            "cluster": cluster.stats()}
+
+@app.get("/outbox/stats")
+def get_outbox_stats(token_data: dict = Depends(require_admin)):
+    return outbox_dispatcher.stats()
+
+METRIC_GAUGES = {
+    "db_pool": db_manager.pool_status,
+    "db_async_pool": async_db.pool_status,
+    "family_cache": family_cache.stats,
+    "vitals_batcher": vitals_batcher.stats,
+    "outbox": outbox_dispatcher.stats,
+    "vitals_monitor": vitals_monitor.stats,
+    "audit": audit_writer.stats,
+    "cluster": cluster.stats,
+}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Con varios workers: histogramas sumados y gauges por worker
+    return PlainTextResponse(
+        render_collected(cluster.metrics(collect_metrics(METRIC_GAUGES))),
+        media_type="text/plain; version=0.0.4",
+    )
+
+@app.get("/db/pool")
+def get_pool_status(token_data: dict = Depends(require_admin)):
+    return {
+        "sync": db_manager.pool_status(),
+        "async": async_db.pool_status(),
+        "replicas": db_manager.replica_status(),
+    }
+
+@app.get("/db/retention")
+def get_retention_status(token_data: dict = Depends(require_admin)):
+    return retention_manager.status()
 
 @app.get("/test-db")
-def test_db():
-    conn = get_db_connection()
+def test_db(conn=Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("SELECT NOW() as fecha")
     result = cursor.fetchone()
     cursor.close()
-    conn.close()
     return {"conexion_exitosa": True, "resultado": result}
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Un proceso con WEB_WORKERS=1; con más, pre-fork con estado compartido (serve.py)
+    from serve import main as serve
+    serve()
\ No newline at end of file
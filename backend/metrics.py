@@ -0,0 +1,321 @@
+"""Instrumentación de peticiones y SQL con salida en formato Prometheus.
+
+- `MetricsMiddleware`: histograma de latencia por (método, ruta, estado) y,
+  con METRICS_DEBUG_HEADERS=1, las cabeceras X-SQL-Count / X-SQL-Time-Ms.
+- `TimedCursor` / `AsyncTimedCursor`: envuelven los cursores de los pools y
+  miden cada sentencia agrupándola por huella normalizada de la consulta.
+- Las consultas más lentas que SLOW_QUERY_MS se imprimen en el log.
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', 200)) / 1000
+DEBUG_HEADERS = os.getenv('METRICS_DEBUG_HEADERS', '0').lower() in ('1', 'true', 'yes')
+# Tope de huellas distintas; las que sobran se agrupan en "other"
+MAX_FINGERPRINTS = int(os.getenv('METRICS_MAX_FINGERPRINTS', 500))
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:(?:%s|\?)\s*,\s*)+(?:%s|\?)\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """Normaliza una consulta: literales y listas IN/VALUES colapsados, espacios unificados."""
+    text = _STRING.sub('?', sql)
+    text = _NUMBER.sub('?', text)
+    text = text.replace('%s', '?')
+    text = _PLACEHOLDER_LIST.sub('(?+)', text)
+    text = _VALUES_LIST.sub(r'\1, ...', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+
+class HistogramFamily:
+    """Histogramas por combinación de etiquetas, protegidos por un lock."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...],
+                 buckets: Sequence[float], max_series: Optional[int] = None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, Histogram] = {}
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                if self.max_series is not None and len(self._series) >= self.max_series:
+                    labels = tuple('other' for _ in labels)
+                    series = self._series.get(labels)
+                if series is None:
+                    series = self._series[labels] = Histogram(self.buckets)
+            series.observe(value)
+
+    def snapshot(self) -> List[Tuple[tuple, Histogram]]:
+        with self._lock:
+            result = []
+            for labels, series in self._series.items():
+                copy = Histogram(series.buckets)
+                copy.counts, copy.total, copy.count, copy.max = list(series.counts), series.total, series.count, series.max
+                result.append((labels, copy))
+            return result
+
+    def render(self) -> List[str]:
+        return self.render_series(self.snapshot())
+
+    def render_series(self, series_list: Sequence[Tuple[tuple, Histogram]]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(series_list, key=lambda item: item[0]):
+            base = _labels(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series.count}')
+            lines.append(f'{self.name}_sum{{{base}}} {series.total:.6f}')
+            lines.append(f'{self.name}_count{{{base}}} {series.count}')
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+request_latency = HistogramFamily(
+    'siacom_http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta.',
+    ('method', 'route', 'status'), REQUEST_BUCKETS,
+)
+sql_latency = HistogramFamily(
+    'siacom_sql_query_duration_seconds', 'Duración de las sentencias SQL por huella normalizada.',
+    ('fingerprint',), SQL_BUCKETS, max_series=MAX_FINGERPRINTS,
+)
+audit_flush_latency = HistogramFamily(
+    'siacom_audit_flush_duration_seconds', 'Duración de cada escritura por lotes de la auditoría.',
+    ('writer',), SQL_BUCKETS,
+)
+
+# Contadores de SQL de la petición en curso: [sentencias, segundos]. El
+# middleware fija una lista nueva por petición; los hilos del threadpool
+# heredan el contexto, así que todos acumulan sobre la misma lista.
+_request_sql: ContextVar[Optional[list]] = ContextVar('request_sql', default=None)
+
+
+def record_query(sql: str, elapsed: float):
+    if not isinstance(sql, str):
+        sql = sql.decode('utf-8', 'replace')
+    sql_latency.observe((fingerprint(sql),), elapsed)
+    counters = _request_sql.get()
+    if counters is not None:
+        counters[0] += 1
+        counters[1] += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        print(f"SLOW QUERY {elapsed * 1000:.1f} ms: {fingerprint(sql)[:500]}")
+
+
+class TimedCursor:
+    """Cursor de mysql-connector que mide `execute`/`executemany`."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            record_query(operation, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            record_query(operation, time.perf_counter() - start)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """Conexión prestada por el pool cuyos cursores son `TimedCursor`."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class AsyncTimedCursor:
+    """Equivalente de `TimedCursor` para cursores aiomysql."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+    async def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.executemany(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _route_path(scope) -> str:
+    route = scope.get('route')
+    # Sin ruta resuelta (404) no se usa la URL, para no crear una serie por path
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia por ruta y, en modo debug, SQL por petición en cabeceras."""
+
+    def __init__(self, app, debug_headers: bool = DEBUG_HEADERS):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        counters = [0, 0.0]
+        token = _request_sql.set(counters)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if self.debug_headers:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'x-sql-count', str(counters[0]).encode()))
+                    headers.append((b'x-sql-time-ms', f"{counters[1] * 1000:.3f}".encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_sql.reset(token)
+            request_latency.observe(
+                (scope['method'], _route_path(scope), str(status_code)),
+                time.perf_counter() - start,
+            )
+
+
+HISTOGRAMS = (request_latency, sql_latency, audit_flush_latency)
+
+
+def collect_metrics(gauges: Dict[str, Callable[[], dict]]) -> dict:
+    """Foto de las métricas de este proceso: series de los histogramas y gauges numéricos."""
+    histograms = {
+        family.name: [(labels, series.counts, series.total, series.count, series.max)
+                      for labels, series in family.snapshot()]
+        for family in HISTOGRAMS
+    }
+    values = []
+    for component, collect in gauges.items():
+        try:
+            stats = collect()
+        except Exception as e:
+            print(f"Error collecting metrics for {component}: {e}")
+            continue
+        for key, value in _flatten(stats):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            values.append((f"siacom_{component}_{key}", value))
+    return {"pid": os.getpid(), "histograms": histograms, "gauges": values}
+
+
+def render_collected(snapshots: Sequence[dict]) -> str:
+    """Texto Prometheus de una o varias fotos (una por worker).
+
+    Los histogramas se suman entre workers; con más de un worker cada gauge
+    lleva la etiqueta `worker` con el pid.
+    """
+    lines = []
+    for family in HISTOGRAMS:
+        merged: Dict[tuple, Histogram] = {}
+        for snapshot in snapshots:
+            for labels, counts, total, count, maximum in snapshot["histograms"].get(family.name, ()):
+                series = merged.setdefault(tuple(labels), Histogram(family.buckets))
+                series.counts = [a + b for a, b in zip(series.counts, counts)]
+                series.total += total
+                series.count += count
+                series.max = max(series.max, maximum)
+        lines += family.render_series(list(merged.items()))
+    by_name: Dict[str, List[str]] = {}
+    for snapshot in sorted(snapshots, key=lambda item: item["pid"]):
+        label = f'{{worker="{snapshot["pid"]}"}}' if len(snapshots) > 1 else ''
+        for name, value in snapshot["gauges"]:
+            by_name.setdefault(name, []).append(f"{name}{label} {value}")
+    for name, samples in by_name.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines += samples
+    return '\n'.join(lines) + '\n'
+
+
+def _flatten(values: dict, prefix: str = ''):
+    for key, value in values.items():
+        name = re.sub(r'[^a-zA-Z0-9_]', '_', f"{prefix}{key}")
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}_")
+        else:
+            yield name, value
@@ -0,0 +1,175 @@
+"""Migraciones versionadas del esquema de SIACOM.
+
+Cada archivo `migrations/NNNN_nombre.py` define `up(ctx)` usando los helpers
+idempotentes de `MigrationContext`, de modo que volver a aplicar una
+migración sobre un esquema que ya tiene el cambio no falla.
+
+Uso (desde backend/):
+
+    python migrate.py              # aplica las migraciones pendientes
+    python migrate.py --status     # lista aplicadas y pendientes
+    python migrate.py --check-explain   # falla si alguna consulta de endpoint hace full scan
+"""
+import argparse
+import importlib.util
+import os
+import re
+import sys
+
+from database import db_manager
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+
+class MigrationContext:
+    def __init__(self, conn):
+        self.conn = conn
+        self.database = conn.database
+
+    def execute(self, sql: str, params: tuple = ()):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+        finally:
+            cursor.close()
+        self.conn.commit()
+
+    def _scalar(self, sql: str, params: tuple):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            cursor.close()
+
+    def table_exists(self, table: str) -> bool:
+        return bool(self._scalar("""
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_schema = %s AND table_name = %s
+        """, (self.database, table)))
+
+    def column_exists(self, table: str, column: str) -> bool:
+        return bool(self._scalar("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s AND column_name = %s
+        """, (self.database, table, column)))
+
+    def index_exists(self, table: str, name: str) -> bool:
+        return bool(self._scalar("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = %s AND table_name = %s AND index_name = %s
+        """, (self.database, table, name)))
+
+    def ensure_index(self, table: str, name: str, columns, unique: bool = False, kind: str = ''):
+        if self.index_exists(table, name):
+            return
+        prefix = 'UNIQUE ' if unique else (f'{kind} ' if kind else '')
+        self.execute(f"CREATE {prefix}INDEX {name} ON {table} ({', '.join(columns)})")
+
+    def drop_index(self, table: str, name: str):
+        if self.index_exists(table, name):
+            self.execute(f"DROP INDEX {name} ON {table}")
+
+    def ensure_column(self, table: str, column: str, definition: str):
+        if not self.column_exists(table, column):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def foreign_keys(self, table: str):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT constraint_name FROM information_schema.referential_constraints
+                WHERE constraint_schema = %s AND table_name = %s
+            """, (self.database, table))
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def is_partitioned(self, table: str) -> bool:
+        return bool(self._scalar("""
+            SELECT COUNT(*) FROM information_schema.partitions
+            WHERE table_schema = %s AND table_name = %s AND partition_name IS NOT NULL
+        """, (self.database, table)))
+
+
+def discover_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        spec = importlib.util.spec_from_file_location(
+            f"migrations.m{match.group(1)}", os.path.join(MIGRATIONS_DIR, filename)
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((match.group(1), match.group(2), module))
+    return migrations
+
+
+def applied_versions(ctx: MigrationContext):
+    ctx.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(10) PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor = ctx.conn.cursor()
+    try:
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def migrate(conn, verbose: bool = True):
+    ctx = MigrationContext(conn)
+    applied = applied_versions(ctx)
+    for version, name, module in discover_migrations():
+        if version in applied:
+            continue
+        if verbose:
+            print(f"Aplicando {version}_{name}...")
+        module.up(ctx)
+        ctx.execute(
+            "INSERT INTO schema_migrations (version, nombre) VALUES (%s, %s)",
+            (version, name),
+        )
+    if verbose:
+        print("Esquema actualizado ✅")
+
+
+def status(conn):
+    ctx = MigrationContext(conn)
+    applied = applied_versions(ctx)
+    for version, name, _ in discover_migrations():
+        mark = "aplicada " if version in applied else "pendiente"
+        print(f"{version}  {mark}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--check-explain", action="store_true")
+    args = parser.parse_args()
+
+    conn = db_manager.get_connection()
+    if conn is None:
+        sys.exit(1)
+    try:
+        if args.status:
+            status(conn)
+        elif args.check_explain:
+            from explain_check import run_explain_check
+            sys.exit(0 if run_explain_check(conn) else 1)
+        else:
+            migrate(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
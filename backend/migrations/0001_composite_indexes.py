@@ -0,0 +1,21 @@
+"""Índices compuestos para las consultas calientes de main.py.
+
+Todas filtran por paciente (o contacto) y ordenan por fecha, así que el
+índice (filtro, fecha) evita el filesort y el recorrido del índice de fecha.
+"""
+
+
+def up(ctx):
+    # Últimos signos vitales, /signos-vitales/{id} y rollups
+    ctx.ensure_index('signos_vitales', 'idx_signos_vitales_paciente_fecha', ['paciente_id', 'fecha_registro'])
+    # Última cirugía del snapshot familiar y /cirugias/{id}
+    ctx.ensure_index('cirugias', 'idx_cirugias_paciente_fecha', ['paciente_id', 'fecha_programada'])
+    # /evoluciones/{id}
+    ctx.ensure_index('evoluciones_clinicas', 'idx_evoluciones_paciente_fecha', ['paciente_id', 'fecha_registro'])
+    # Pacientes críticos de las últimas 24h en /dashboard/stats
+    ctx.ensure_index('evoluciones_clinicas', 'idx_evoluciones_estado_fecha', ['estado_general', 'fecha_registro'])
+    # Notificaciones recientes por contacto y por paciente
+    ctx.ensure_index('notificaciones', 'idx_notificaciones_contacto_fecha', ['contacto_id', 'fecha_envio'])
+    ctx.ensure_index('notificaciones', 'idx_notificaciones_paciente_fecha', ['paciente_id', 'fecha_envio'])
+    # El compuesto cubre la FK de contacto_id, el índice simple sobra
+    ctx.drop_index('notificaciones', 'idx_notificaciones_contacto')
@@ -0,0 +1,21 @@
+"""Tabla de códigos de acceso familiar usada por /family/login y el snapshot familiar."""
+
+
+def up(ctx):
+    ctx.execute("""
+        CREATE TABLE IF NOT EXISTS codigos_familiares (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            paciente_id INT NOT NULL,
+            contacto_id INT NOT NULL,
+            codigo_paciente VARCHAR(20) NOT NULL,
+            codigo_familiar VARCHAR(20) NOT NULL,
+            activo BOOLEAN DEFAULT TRUE,
+            fecha_expiracion DATETIME NULL,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (paciente_id) REFERENCES pacientes(id) ON DELETE CASCADE,
+            FOREIGN KEY (contacto_id) REFERENCES contactos(id) ON DELETE CASCADE
+        )
+    """)
+    ctx.ensure_index('codigos_familiares', 'uq_codigos_familiares_codigos',
+                     ['codigo_paciente', 'codigo_familiar'], unique=True)
+    ctx.ensure_index('codigos_familiares', 'idx_codigos_familiares_paciente', ['paciente_id', 'activo'])
@@ -0,0 +1,26 @@
+"""Outbox transaccional para los cambios de estado de cirugía.
+
+`notificaciones.clave_idempotencia` permite que el dispatcher reintente un
+lote sin duplicar notificaciones ya entregadas.
+"""
+
+
+def up(ctx):
+    ctx.execute("""
+        CREATE TABLE IF NOT EXISTS outbox_eventos (
+            id BIGINT PRIMARY KEY AUTO_INCREMENT,
+            tipo VARCHAR(50) NOT NULL,
+            paciente_id INT NOT NULL,
+            cirugia_id INT NULL,
+            payload JSON NOT NULL,
+            estado ENUM('pendiente', 'enviado', 'descartado', 'fallido') NOT NULL DEFAULT 'pendiente',
+            intentos INT NOT NULL DEFAULT 0,
+            proximo_intento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ultimo_error TEXT NULL,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_envio TIMESTAMP NULL
+        )
+    """)
+    ctx.ensure_index('outbox_eventos', 'idx_outbox_eventos_estado_intento', ['estado', 'proximo_intento'])
+    ctx.ensure_column('notificaciones', 'clave_idempotencia', 'VARCHAR(64) NULL')
+    ctx.ensure_index('notificaciones', 'uq_notificaciones_clave_idempotencia', ['clave_idempotencia'], unique=True)
@@ -0,0 +1,6 @@
+"""Índices para /pacientes/search: FULLTEXT de respaldo y sincronización incremental del índice en memoria."""
+
+
+def up(ctx):
+    ctx.ensure_index('pacientes', 'ft_pacientes_nombre_apellido', ['nombre', 'apellido'], kind='FULLTEXT')
+    ctx.ensure_index('pacientes', 'idx_pacientes_fecha_actualizacion', ['fecha_actualizacion'])
@@ -0,0 +1,14 @@
+"""Latidos que escribe el primario para medir el retraso de las réplicas de lectura.
+
+Una fila por proceso de la API (`origen` = host:pid); `seq` crece con cada latido.
+"""
+
+
+def up(ctx):
+    ctx.execute("""
+        CREATE TABLE IF NOT EXISTS replica_heartbeat (
+            origen VARCHAR(100) PRIMARY KEY,
+            seq BIGINT NOT NULL,
+            fecha TIMESTAMP(6) NOT NULL
+        )
+    """)
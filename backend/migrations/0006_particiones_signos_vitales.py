@@ -0,0 +1,29 @@
+"""Particiones mensuales de signos_vitales para la retención de datos fríos.
+
+MySQL no admite claves foráneas en tablas particionadas y exige que la
+clave primaria incluya la columna de partición: se quitan las FK (la API
+valida paciente y cirugía al insertar) y la clave pasa a (id, fecha_registro).
+`retention.py` crea los meses siguientes y archiva y elimina los antiguos.
+
+En notificaciones solo se indexa la fecha para archivar por mes.
+"""
+from datetime import datetime
+
+from retention import add_months, month_start, partition_definitions, retention_manager
+
+
+def up(ctx):
+    ctx.ensure_index('notificaciones', 'idx_notificaciones_fecha_envio', ['fecha_envio'])
+    if ctx.is_partitioned('signos_vitales'):
+        return
+    for name in ctx.foreign_keys('signos_vitales'):
+        ctx.execute(f"ALTER TABLE signos_vitales DROP FOREIGN KEY {name}")
+    ctx.execute("ALTER TABLE signos_vitales DROP PRIMARY KEY, ADD PRIMARY KEY (id, fecha_registro)")
+    oldest = ctx._scalar("SELECT MIN(fecha_registro) FROM signos_vitales", ())
+    current = month_start(datetime.now())
+    first = month_start(oldest) if oldest else current
+    ctx.execute(f"""
+        ALTER TABLE signos_vitales PARTITION BY RANGE COLUMNS (fecha_registro) (
+            {partition_definitions(first, add_months(current, retention_manager.premake_months))}
+        )
+    """)
@@ -0,0 +1,271 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import mysql.connector
+
+from database import db_manager
+
+EVENTO_CAMBIO_ESTADO = 'cirugia_estado'
+EVENTO_COMPLICACION = 'signos_complicacion'
+
+# Entrega por tipo de evento: un INSERT ... SELECT por lote de eventos. La
+# clave de idempotencia (evento, contacto) hace que reintentar un lote ya
+# entregado en parte no duplique notificaciones.
+DELIVERY_QUERIES = {
+    EVENTO_CAMBIO_ESTADO: """
+        INSERT INTO notificaciones
+            (contacto_id, paciente_id, cirugia_id, tipo, titulo, mensaje, clave_idempotencia)
+        SELECT c.id, o.paciente_id, o.cirugia_id, 'cambio_estado',
+               'Cambio de estado en cirugía',
+               CONCAT('La cirugía ha cambiado a estado: ', JSON_UNQUOTE(JSON_EXTRACT(o.payload, '$.estado'))),
+               CONCAT('outbox-', o.id, '-', c.id)
+        FROM outbox_eventos o
+        JOIN contactos c ON c.paciente_id = o.paciente_id AND c.notificaciones_activas = TRUE
+        WHERE o.id IN ({ids})
+        ON DUPLICATE KEY UPDATE id = id
+    """,
+    # La clave viene del detector (paciente, regla y ventana de cooldown): dos
+    # alertas iguales de procesos distintos producen una sola notificación
+    EVENTO_COMPLICACION: """
+        INSERT INTO notificaciones
+            (contacto_id, paciente_id, cirugia_id, tipo, titulo, mensaje, clave_idempotencia)
+        SELECT c.id, o.paciente_id, o.cirugia_id, 'complicacion',
+               JSON_UNQUOTE(JSON_EXTRACT(o.payload, '$.titulo')),
+               JSON_UNQUOTE(JSON_EXTRACT(o.payload, '$.mensaje')),
+               CONCAT(JSON_UNQUOTE(JSON_EXTRACT(o.payload, '$.clave')), '-', c.id)
+        FROM outbox_eventos o
+        JOIN contactos c ON c.paciente_id = o.paciente_id AND c.notificaciones_activas = TRUE
+        WHERE o.id IN ({ids})
+        ON DUPLICATE KEY UPDATE id = id
+    """,
+}
+
+
+# SKIP LOCKED: varios procesos pueden despachar sin pisarse
+CLAIM_EVENTS = """
+    SELECT id, tipo, paciente_id, cirugia_id, payload, intentos
+    FROM outbox_eventos
+    WHERE estado = 'pendiente' AND proximo_intento <= NOW()
+    ORDER BY id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def enqueue_event(cursor, tipo: str, paciente_id: int, cirugia_id: Optional[int], payload: dict):
+    """Registra el evento en la transacción de `cursor`; el commit queda a cargo del llamador."""
+    cursor.execute("""
+        INSERT INTO outbox_eventos (tipo, paciente_id, cirugia_id, payload)
+        VALUES (%s, %s, %s, %s)
+    """, (tipo, paciente_id, cirugia_id, json.dumps(payload)))
+
+
+def coalesce(events: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """Separa el último cambio de estado de cada cirugía de los que quedan obsoletos.
+
+    Los demás tipos de evento se entregan todos.
+    """
+    latest: Dict[tuple, dict] = {}
+    for event in events:
+        if event['tipo'] == EVENTO_CAMBIO_ESTADO and event['cirugia_id'] is not None:
+            key = (event['tipo'], event['cirugia_id'])
+        else:
+            key = (event['tipo'], f"e{event['id']}")
+        current = latest.get(key)
+        if current is None or event['id'] > current['id']:
+            latest[key] = event
+    keep = {event['id'] for event in latest.values()}
+    deliver = [event for event in events if event['id'] in keep]
+    superseded = [event for event in events if event['id'] not in keep]
+    return deliver, superseded
+
+
+def _in_clause(events: List[dict]) -> str:
+    return ', '.join(str(int(event['id'])) for event in events)
+
+
+class OutboxDispatcher:
+    """Hilo que entrega los eventos de `outbox_eventos` por lotes.
+
+    Los endpoints solo escriben el evento en su transacción y llaman a
+    `notify()`; el dispatcher espera `OUTBOX_COALESCE_MS` para agrupar
+    cambios seguidos de la misma cirugía (solo se entrega el último), inserta
+    las notificaciones y después avisa a los canales push registrados en
+    `channels`. Si un lote falla se reintenta evento a evento con backoff
+    exponencial hasta `OUTBOX_MAX_ATTEMPTS`.
+    """
+
+    def __init__(self, manager=db_manager):
+        self.manager = manager
+        self.batch_size = int(os.getenv('OUTBOX_BATCH_SIZE', 200))
+        self.poll_interval = float(os.getenv('OUTBOX_POLL_SECONDS', 2))
+        self.coalesce_delay = float(os.getenv('OUTBOX_COALESCE_MS', 250)) / 1000
+        self.max_attempts = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+        self.channels: List[Callable[[List[dict]], None]] = []
+        self._cond = threading.Condition()
+        self._stop = False
+        self._wake_at: Optional[float] = None
+        self._next_poll = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.delivered_events = 0
+        self.coalesced_events = 0
+        self.retried_events = 0
+        self.failed_events = 0
+        self.batches = 0
+
+    def notify(self):
+        """Hay eventos nuevos confirmados; se entregan tras la ventana de agrupación."""
+        with self._cond:
+            if self._wake_at is None:
+                self._wake_at = time.monotonic() + self.coalesce_delay
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop:
+                    target = self._next_poll if self._wake_at is None else min(self._wake_at, self._next_poll)
+                    remaining = target - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._wake_at = None
+                self._next_poll = time.monotonic() + self.poll_interval
+                stopping = self._stop
+            try:
+                while self.dispatch_once() >= self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Error dispatching outbox events: {e}")
+            if stopping:
+                return
+
+    def dispatch_once(self) -> int:
+        """Entrega un lote de eventos vencidos; devuelve cuántos se reclamaron."""
+        with self.manager.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(CLAIM_EVENTS, (self.batch_size,))
+                events = cursor.fetchall()
+                if not events:
+                    conn.commit()
+                    return 0
+                deliver, superseded = coalesce(events)
+                try:
+                    self._deliver(cursor, deliver)
+                    self._mark(cursor, superseded, 'descartado')
+                    self._mark(cursor, deliver, 'enviado')
+                    conn.commit()
+                except mysql.connector.Error:
+                    conn.rollback()
+                    delivered = self._deliver_individually(conn, deliver, superseded)
+                else:
+                    delivered = deliver
+            finally:
+                cursor.close()
+
+        self.batches += 1
+        self.coalesced_events += len(superseded)
+        self.delivered_events += len(delivered)
+        self._publish(delivered)
+        return len(events)
+
+    def _deliver(self, cursor, events: List[dict]):
+        by_type: Dict[str, List[dict]] = {}
+        for event in events:
+            by_type.setdefault(event['tipo'], []).append(event)
+        for tipo, group in by_type.items():
+            query = DELIVERY_QUERIES.get(tipo)
+            if query is None:
+                raise mysql.connector.ProgrammingError(msg=f"Tipo de evento sin entrega: {tipo}")
+            cursor.execute(query.format(ids=_in_clause(group)))
+
+    def _mark(self, cursor, events: List[dict], estado: str):
+        if events:
+            cursor.execute(f"""
+                UPDATE outbox_eventos
+                SET estado = %s, fecha_envio = IF(%s = 'enviado', NOW(), fecha_envio)
+                WHERE id IN ({_in_clause(events)})
+            """, (estado, estado))
+
+    def _deliver_individually(self, conn, deliver: List[dict], superseded: List[dict]) -> List[dict]:
+        """Reintenta un lote fallido evento a evento para aislar el que falla."""
+        delivered = []
+        cursor = conn.cursor(dictionary=True)
+        try:
+            self._mark(cursor, superseded, 'descartado')
+            conn.commit()
+            for event in deliver:
+                try:
+                    self._deliver(cursor, [event])
+                    self._mark(cursor, [event], 'enviado')
+                    conn.commit()
+                    delivered.append(event)
+                except mysql.connector.Error as e:
+                    conn.rollback()
+                    self._record_failure(cursor, event, str(e))
+                    conn.commit()
+        finally:
+            cursor.close()
+        return delivered
+
+    def _record_failure(self, cursor, event: dict, error: str):
+        attempts = event['intentos'] + 1
+        if attempts >= self.max_attempts:
+            self.failed_events += 1
+            print(f"Outbox event {event['id']} failed after {attempts} attempts: {error}")
+        else:
+            self.retried_events += 1
+        cursor.execute("""
+            UPDATE outbox_eventos
+            SET intentos = %s,
+                ultimo_error = %s,
+                estado = IF(%s >= %s, 'fallido', 'pendiente'),
+                proximo_intento = NOW() + INTERVAL %s SECOND
+            WHERE id = %s
+        """, (attempts, error[:1000], attempts, self.max_attempts, min(2 ** attempts, 300), event['id']))
+
+    def _publish(self, events: List[dict]):
+        if not events:
+            return
+        for event in events:
+            if isinstance(event['payload'], (str, bytes)):
+                event['payload'] = json.loads(event['payload'])
+        for channel in self.channels:
+            try:
+                channel(events)
+            except Exception as e:
+                # Los canales push son best effort: las notificaciones ya están en la base
+                print(f"Error publishing outbox events: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Hace una última pasada y detiene el hilo."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "delivered_events": self.delivered_events,
+            "coalesced_events": self.coalesced_events,
+            "retried_events": self.retried_events,
+            "failed_events": self.failed_events,
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "coalesce_ms": self.coalesce_delay * 1000,
+        }
+
+
+outbox_dispatcher = OutboxDispatcher()
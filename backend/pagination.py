@@ -0,0 +1,83 @@
+import base64
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, List, Optional, Sequence
+
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+
+
+def encode_cursor(last_id: int) -> str:
+    """Cursor opaco para la siguiente página de una paginación por `id`."""
+    raw = json.dumps({"id": last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(last_id, int) or last_id < 0:
+        raise ValueError("Cursor inválido")
+    return last_id
+
+
+def select_columns(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """Proyección pedida por el cliente (`fields=a,b`); `id` siempre se incluye."""
+    if not fields:
+        return list(allowed)
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Campos no permitidos: {', '.join(unknown)}")
+    columns = ['id'] + [f for f in requested if f != 'id']
+    return list(dict.fromkeys(columns))
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def export_rows(manager, query: str, params: tuple, columns: List[str], fmt: str) -> Iterator[str]:
+    """Exporta el resultado de `query` como NDJSON o CSV en bloques.
+
+    Usa un cursor sin buffer (las filas se leen del socket a medida que se
+    consumen), así que la memoria no depende del tamaño del resultado. La
+    conexión del pool se mantiene prestada mientras dura la descarga.
+    """
+    with manager.connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute(query, params)
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                yield buffer.getvalue()
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                if fmt == 'csv':
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    writer.writerows(rows)
+                    yield buffer.getvalue()
+                else:
+                    yield ''.join(
+                        json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + '\n'
+                        for row in rows
+                    )
+        finally:
+            cursor.close()
@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+# Coste de bcrypt para los hashes nuevos; los hashes con otro coste se
+# re-hashean en el siguiente login correcto (`needs_update`)
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HasherBusyError(Exception):
+    """Demasiadas verificaciones de contraseña en cola."""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """(válida, hash nuevo o None); el hash nuevo solo se calcula si el coste cambió."""
+    try:
+        return pwd_context.verify_and_update(password, password_hash)
+    except (ValueError, TypeError):
+        # Hash corrupto o en un formato desconocido
+        return False, None
+
+
+class PasswordHasher:
+    """Pool de procesos acotado para bcrypt.
+
+    bcrypt consume cientos de ms de CPU por llamada; hacerlo en procesos
+    aparte evita ocupar hilos del threadpool y competir por el GIL con el
+    resto de endpoints. Las peticiones que exceden `max_pending` se rechazan
+    con `HasherBusyError` en vez de hacer cola indefinidamente.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: los procesos no heredan los hilos (batcher, estadísticas) del servidor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._executor
+
+    def start(self):
+        executor = self._get_executor()
+        # Arranca los procesos ahora y no con el primer login
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError(f"Más de {self.max_pending} verificaciones de contraseña en cola")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(_verify_and_update, password, password_hash)
+
+    # Versiones por lotes para los scripts de mantenimiento
+    def hash_many(self, passwords: Iterable[str]) -> List[str]:
+        return list(self._get_executor().map(_hash, passwords))
+
+    def verify_many(self, pairs: Iterable[Tuple[str, str]]) -> List[Tuple[bool, Optional[str]]]:
+        pairs = list(pairs)
+        if not pairs:
+            return []
+        passwords, hashes = zip(*pairs)
+        return list(self._get_executor().map(_verify_and_update, passwords, hashes))
+
+
+password_hasher = PasswordHasher(
+    workers=int(os.getenv('PASSWORD_POOL_WORKERS', min(4, os.cpu_count() or 1))),
+    max_pending=int(os.getenv('PASSWORD_POOL_MAX_PENDING', 64)),
+)
@@ -0,0 +1,264 @@
+import os
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database import db_manager
+
+MAX_SEARCH_RESULTS = 50
+# Cuántos candidatos se puntúan por búsqueda como máximo antes de ordenar
+CANDIDATES_PER_RESULT = 4
+
+
+def normalize(text: Optional[str]) -> str:
+    """Minúsculas y sin acentos ("Núñez" -> "nunez")."""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [token for token in ''.join(
+        ch if ch.isalnum() else ' ' for ch in normalize(text)
+    ).split() if token]
+
+
+def sort_key(nombre: str, apellido: str) -> str:
+    return normalize(f"{apellido} {nombre}")
+
+
+def document_tokens(nombre: str, apellido: str, cedula: str) -> Tuple[str, ...]:
+    tokens = tokenize(nombre) + tokenize(apellido)
+    cedula_key = ''.join(ch for ch in normalize(cedula) if ch.isalnum())
+    if cedula_key:
+        tokens.append(cedula_key)
+    return tuple(dict.fromkeys(tokens))
+
+
+class PatientSearchIndex:
+    """Índice de prefijos en memoria sobre nombre, apellido y cédula de pacientes activos.
+
+    Es un arreglo ordenado de (token, id) en dos listas paralelas: un prefijo
+    se resuelve con dos bisecciones. La búsqueda recorre el rango del token
+    más selectivo de la consulta y filtra por los demás. Se carga al arrancar,
+    se sincroniza con `fecha_actualizacion` cada `PATIENT_INDEX_SYNC_SECONDS`
+    y las escrituras de la API pueden aplicarse al momento con `upsert`/`remove`.
+    """
+
+    def __init__(self, manager=db_manager):
+        self.manager = manager
+        self.sync_seconds = float(os.getenv('PATIENT_INDEX_SYNC_SECONDS', 30))
+        self.rebuild_seconds = float(os.getenv('PATIENT_INDEX_REBUILD_SECONDS', 3600))
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tokens: List[str] = []
+        self._ids = array('i')
+        # id -> (nombre, apellido, cedula, tokens, clave de orden)
+        self._docs: Dict[int, Tuple[str, str, str, Tuple[str, ...], str]] = {}
+        self._watermark: Optional[datetime] = None
+        self.ready = False
+
+    # -- construcción y mantenimiento
+
+    def build(self, rows: Sequence[tuple]):
+        """Reconstruye el índice desde filas (id, nombre, apellido, cedula)."""
+        docs = {}
+        pairs = []
+        interned: Dict[str, str] = {}
+        for paciente_id, nombre, apellido, cedula in rows:
+            tokens = tuple(interned.setdefault(t, t) for t in document_tokens(nombre, apellido, cedula))
+            docs[paciente_id] = (nombre, apellido, cedula, tokens, sort_key(nombre, apellido))
+            pairs.extend((token, paciente_id) for token in tokens)
+        pairs.sort()
+        tokens = [token for token, _ in pairs]
+        ids = array('i', (paciente_id for _, paciente_id in pairs))
+        with self._lock:
+            self._tokens, self._ids, self._docs = tokens, ids, docs
+            self.ready = True
+
+    def _insert(self, token: str, paciente_id: int):
+        lo = bisect_left(self._tokens, token)
+        hi = bisect_left(self._tokens, token + '\0', lo)
+        pos = bisect_left(self._ids, paciente_id, lo, hi)
+        self._tokens.insert(pos, token)
+        self._ids.insert(pos, paciente_id)
+
+    def _delete(self, token: str, paciente_id: int):
+        lo = bisect_left(self._tokens, token)
+        hi = bisect_left(self._tokens, token + '\0', lo)
+        pos = bisect_left(self._ids, paciente_id, lo, hi)
+        if pos < hi and self._ids[pos] == paciente_id:
+            del self._tokens[pos]
+            del self._ids[pos]
+
+    def upsert(self, paciente_id: int, nombre: str, apellido: str, cedula: str):
+        tokens = document_tokens(nombre, apellido, cedula)
+        with self._lock:
+            previous = self._docs.get(paciente_id)
+            old_tokens = previous[3] if previous else ()
+            for token in set(old_tokens) - set(tokens):
+                self._delete(token, paciente_id)
+            for token in set(tokens) - set(old_tokens):
+                self._insert(token, paciente_id)
+            self._docs[paciente_id] = (nombre, apellido, cedula, tokens, sort_key(nombre, apellido))
+
+    def remove(self, paciente_id: int):
+        with self._lock:
+            previous = self._docs.pop(paciente_id, None)
+            if previous:
+                for token in previous[3]:
+                    self._delete(token, paciente_id)
+
+    # -- búsqueda
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        lo = bisect_left(self._tokens, prefix)
+        return lo, bisect_left(self._tokens, prefix + '\uffff', lo)
+
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        """Pacientes cuyos tokens empiezan por todos los términos de `query`.
+
+        Orden: más términos que coinciden con un token completo primero,
+        luego por apellido y nombre.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            ranges = sorted((self._range(term) for term in terms), key=lambda r: r[1] - r[0])
+            lo, hi = ranges[0]
+            # Ids del rango más selectivo, filtrados por los rangos de los demás términos
+            ids = np.frombuffer(self._ids[lo:hi], dtype=np.int32)
+            for other_lo, other_hi in ranges[1:]:
+                if not ids.size:
+                    break
+                other = np.frombuffer(self._ids[other_lo:other_hi], dtype=np.int32)
+                ids = ids[np.isin(ids, other, kind='table')]
+            # Primera aparición de cada id en el orden del rango: dentro del
+            # rango, los tokens iguales al prefijo van primero, así que cortar
+            # tras `wanted` candidatos conserva las coincidencias exactas
+            wanted = limit * CANDIDATES_PER_RESULT
+            ordered = {}
+            for start in range(0, ids.size, wanted):
+                ordered.update(dict.fromkeys(ids[start:start + wanted].tolist()))
+                if len(ordered) >= wanted:
+                    break
+            candidates = [(paciente_id, self._docs[paciente_id]) for paciente_id in list(ordered)[:wanted]]
+
+        ranked = []
+        for paciente_id, (nombre, apellido, cedula, doc_tokens, key) in candidates:
+            exact = sum(term in doc_tokens for term in terms)
+            ranked.append((-exact, key, paciente_id, {
+                "id": paciente_id, "nombre": nombre, "apellido": apellido, "cedula": cedula,
+                "score": round(exact / len(terms), 3),
+            }))
+        ranked.sort(key=lambda item: item[:3])
+        return [item[3] for item in ranked[:limit]]
+
+    # -- sincronización con MySQL
+
+    def load(self):
+        # La marca se lee antes que las filas: lo modificado entre medias se repite en `sync`
+        watermark = self.manager.fetchone("SELECT MAX(fecha_actualizacion) as ultima FROM pacientes")
+        rows = self.manager.fetchrows("""
+            SELECT id, nombre, apellido, cedula FROM pacientes WHERE activo = TRUE
+        """)
+        self.build(rows)
+        self._watermark = watermark['ultima'] if watermark else None
+
+    def sync(self):
+        """Aplica los pacientes creados o modificados desde la última sincronización."""
+        if self._watermark is None:
+            self.load()
+            return
+        rows = self.manager.fetchrows("""
+            SELECT id, nombre, apellido, cedula, activo, fecha_actualizacion
+            FROM pacientes
+            WHERE fecha_actualizacion >= %s
+            ORDER BY fecha_actualizacion
+        """, (self._watermark,))
+        for paciente_id, nombre, apellido, cedula, activo, _ in rows:
+            if activo:
+                self.upsert(paciente_id, nombre, apellido, cedula)
+            else:
+                self.remove(paciente_id)
+        if rows:
+            self._watermark = rows[-1][5]
+
+    def _run(self):
+        try:
+            self.load()
+        except Exception as e:
+            # Mientras tanto /pacientes/search usa FULLTEXT
+            print(f"Error loading patient search index: {e}")
+        since_rebuild = 0.0
+        while not self._stop.wait(self.sync_seconds):
+            since_rebuild += self.sync_seconds
+            try:
+                if since_rebuild >= self.rebuild_seconds or not self.ready:
+                    # Recoge también los borrados físicos, que la sincronización no ve
+                    self.load()
+                    since_rebuild = 0.0
+                else:
+                    self.sync()
+            except Exception as e:
+                print(f"Error syncing patient search index: {e}")
+
+    def start(self):
+        """Carga el índice en segundo plano; hasta que esté listo `ready` es False."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="patient-index", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "patients": len(self._docs),
+                "entries": len(self._tokens),
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+            }
+
+
+SEARCH_BY_CEDULA = """
+    SELECT id, nombre, apellido, cedula, 1.0 as score
+    FROM pacientes
+    WHERE activo = TRUE AND cedula LIKE %s
+    ORDER BY cedula
+    LIMIT %s
+"""
+
+SEARCH_FULLTEXT = """
+    SELECT id, nombre, apellido, cedula,
+           MATCH(nombre, apellido) AGAINST (%s IN BOOLEAN MODE) as score
+    FROM pacientes
+    WHERE activo = TRUE AND MATCH(nombre, apellido) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY score DESC, apellido, nombre
+    LIMIT %s
+"""
+
+
+def fulltext_query(query: str, limit: int) -> Tuple[str, tuple]:
+    """Consulta MySQL equivalente, para cuando el índice en memoria no está listo."""
+    terms = tokenize(query)
+    if len(terms) == 1 and terms[0].isdigit():
+        return SEARCH_BY_CEDULA, (terms[0] + '%', limit)
+    boolean = ' '.join(f'+{term}*' for term in terms)
+    return SEARCH_FULLTEXT, (boolean, boolean, limit)
+
+
+patient_index = PatientSearchIndex()
@@ -0,0 +1,111 @@
+import ipaddress
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from cluster import cluster
+
+
+class SlidingWindowLimiter:
+    """Máximo `limit` intentos por clave en los últimos `window_seconds`.
+
+    Con `name` y varios workers la ventana vive en el hub de `cluster`, así
+    que el límite es del servicio y no de cada proceso.
+    """
+
+    def __init__(self, limit: int, window_seconds: float, name: Optional[str] = None):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.name = name
+        self._lock = threading.Lock()
+        self._hits: Dict[str, Deque[float]] = {}
+        self._last_sweep = time.monotonic()
+
+    def _sweep(self, now: float):
+        # Descarta las claves sin intentos recientes para no crecer sin límite
+        cutoff = now - self.window_seconds
+        for key in [k for k, hits in self._hits.items() if hits[-1] <= cutoff]:
+            del self._hits[key]
+        self._last_sweep = now
+
+    def check_and_hit(self, key: str) -> float:
+        """Cuenta un intento de `key` si no está limitada; si lo está, segundos de espera sin contarlo.
+
+        Comprobar y contar es una sola operación (un solo viaje al hub): dos
+        intentos simultáneos no pueden pasar ambos el último hueco libre.
+        Hace E/S con varios workers, así que desde código async va por el threadpool.
+        """
+        if self.name and cluster.enabled:
+            return cluster.limiter(self.name, self.limit, self.window_seconds, 'check_and_hit', key)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep > self.window_seconds:
+                self._sweep(now)
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            while hits and hits[0] <= now - self.window_seconds:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return hits[0] + self.window_seconds - now
+            hits.append(now)
+            return 0.0
+
+    def release(self, key: str):
+        """Descuenta el último intento de `key` (el que contó `check_and_hit` y no fallaba)."""
+        if self.name and cluster.enabled:
+            return cluster.limiter(self.name, self.limit, self.window_seconds, 'release', key)
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits:
+                hits.pop()
+                if not hits:
+                    del self._hits[key]
+
+    def reset(self, key: str):
+        if self.name and cluster.enabled:
+            return cluster.limiter(self.name, self.limit, self.window_seconds, 'reset', key)
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+LOGIN_RATE_WINDOW = float(os.getenv('LOGIN_RATE_WINDOW', 60))
+
+# Intentos fallidos por usuario y por IP dentro de la ventana
+login_user_limiter = SlidingWindowLimiter(int(os.getenv('LOGIN_RATE_PER_USER', 5)), LOGIN_RATE_WINDOW,
+                                          name='login_user')
+login_ip_limiter = SlidingWindowLimiter(int(os.getenv('LOGIN_RATE_PER_IP', 30)), LOGIN_RATE_WINDOW,
+                                        name='login_ip')
+
+# Cabecera con la IP original (p. ej. X-Forwarded-For) que se acepta solo si la
+# conexión viene de una de las direcciones o redes de TRUSTED_PROXIES
+TRUSTED_PROXY_HEADER = os.getenv('TRUSTED_PROXY_HEADER', '')
+TRUSTED_PROXIES = [ipaddress.ip_network(proxy.strip(), strict=False)
+                   for proxy in os.getenv('TRUSTED_PROXIES', '').split(',') if proxy.strip()]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request) -> str:
+    """IP del cliente para los límites de login.
+
+    Detrás de un proxy de confianza se toma de `TRUSTED_PROXY_HEADER`: la
+    última dirección que no es de un proxy de confianza, porque las
+    anteriores las puede escribir el propio cliente.
+    """
+    address = request.client.host if request.client else None
+    if address and TRUSTED_PROXY_HEADER and _is_trusted_proxy(address):
+        hops = [hop.strip() for hop in request.headers.get(TRUSTED_PROXY_HEADER, '').split(',') if hop.strip()]
+        for hop in reversed(hops):
+            address = hop
+            if not _is_trusted_proxy(hop):
+                break
+    return address or "desconocida"
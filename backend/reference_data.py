@@ -0,0 +1,183 @@
+"""Caché en proceso de las tablas de referencia: especialidades, médicos y tipos de cirugía.
+
+Son tablas pequeñas que casi no cambian. Las consultas calientes dejan de
+hacer JOIN con ellas y completan las filas aquí (`enrich`). Un hilo compara
+cada `REFERENCE_CHECK_SECONDS` una huella (conteo + suma de CRC32 por tabla)
+y recarga si cambió o si pasaron `REFERENCE_TTL_SECONDS`. Un id que aún no
+está en la caché (p. ej. un médico recién creado) fuerza una recarga.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from database import db_manager
+
+# Código de tipo VAR_STRING del protocolo MySQL, para las columnas añadidas a `description`
+TYPE_VAR_STRING = 253
+
+VERSION_QUERY = """
+    SELECT
+        (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS('|', id, nombre))), 0))
+         FROM especialidades),
+        (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS('|', id, nombre, apellido, especialidad_id, activo))), 0))
+         FROM medicos),
+        (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS('|', id, nombre, duracion_estimada_minutos, complejidad))), 0))
+         FROM tipos_cirugia)
+"""
+
+
+class Medico(NamedTuple):
+    id: int
+    nombre_completo: str
+    especialidad_id: int
+    activo: bool
+
+
+class TipoCirugia(NamedTuple):
+    id: int
+    nombre: str
+    duracion_estimada_minutos: Optional[int]
+    complejidad: str
+
+
+class ReferenceDataCache:
+    def __init__(self, manager=db_manager):
+        self.manager = manager
+        self.check_seconds = float(os.getenv('REFERENCE_CHECK_SECONDS', 30))
+        self.ttl = float(os.getenv('REFERENCE_TTL_SECONDS', 3600))
+        # Recargas por id desconocido, como mucho una cada tantos segundos
+        self.miss_reload_seconds = 5.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._especialidades: Dict[int, str] = {}
+        self._medicos: Dict[int, Medico] = {}
+        self._tipos: Dict[int, TipoCirugia] = {}
+        self._version: Optional[tuple] = None
+        self._loaded_at = 0.0
+        self._last_miss_reload = 0.0
+        self.ready = False
+        self.reloads = 0
+        self.misses = 0
+
+    # -- carga
+
+    def load(self):
+        version = tuple(self.manager.fetchrows(VERSION_QUERY)[0])
+        especialidades = self.manager.fetchrows("SELECT id, nombre FROM especialidades")
+        medicos = self.manager.fetchrows("SELECT id, nombre, apellido, especialidad_id, activo FROM medicos")
+        tipos = self.manager.fetchrows("""
+            SELECT id, nombre, duracion_estimada_minutos, complejidad FROM tipos_cirugia
+        """)
+        with self._lock:
+            self._especialidades = dict(especialidades)
+            # Mismo texto que CONCAT(m.nombre, ' ', m.apellido)
+            self._medicos = {
+                row[0]: Medico(row[0], f"{row[1]} {row[2]}", row[3], bool(row[4])) for row in medicos
+            }
+            self._tipos = {row[0]: TipoCirugia(*row) for row in tipos}
+            self._version = version
+            self._loaded_at = time.monotonic()
+            self.ready = True
+            self.reloads += 1
+
+    def check(self):
+        """Recarga si la huella cambió o venció el TTL."""
+        if not self.ready or time.monotonic() - self._loaded_at >= self.ttl:
+            self.load()
+            return
+        version = tuple(self.manager.fetchrows(VERSION_QUERY)[0])
+        if version != self._version:
+            self.load()
+
+    def reload_for_miss(self):
+        """Recarga tras un id desconocido, limitada para que ids inexistentes no la repitan."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_miss_reload < self.miss_reload_seconds:
+                return
+            self._last_miss_reload = now
+        self.misses += 1
+        self.load()
+
+    # -- consultas
+
+    def missing(self, medico_ids: Sequence[int] = (), tipo_ids: Sequence[int] = ()) -> bool:
+        return (not self.ready
+                or any(m is not None and m not in self._medicos for m in medico_ids)
+                or any(t is not None and t not in self._tipos for t in tipo_ids))
+
+    def ensure(self, medico_ids: Sequence[int] = (), tipo_ids: Sequence[int] = ()):
+        """Para caminos síncronos: recarga si falta alguno de los ids."""
+        if self.missing(medico_ids, tipo_ids):
+            self.reload_for_miss()
+
+    def medico(self, medico_id: int) -> Optional[Medico]:
+        return self._medicos.get(medico_id)
+
+    def medico_nombre(self, medico_id: int) -> Optional[str]:
+        medico = self._medicos.get(medico_id)
+        return medico.nombre_completo if medico else None
+
+    def especialidad_de(self, medico_id: int) -> Optional[str]:
+        medico = self._medicos.get(medico_id)
+        return self._especialidades.get(medico.especialidad_id) if medico else None
+
+    def tipo_cirugia(self, tipo_id: int) -> Optional[TipoCirugia]:
+        return self._tipos.get(tipo_id)
+
+    def tipo_cirugia_nombre(self, tipo_id: int) -> Optional[str]:
+        tipo = self._tipos.get(tipo_id)
+        return tipo.nombre if tipo else None
+
+    def enrich(self, description: Sequence[tuple], rows: Sequence[tuple],
+               columns: Sequence[Tuple[str, str, Callable[[int], Optional[str]]]]) -> Tuple[List[tuple], List[tuple]]:
+        """Añade al final de cada fila columnas calculadas desde la caché.
+
+        `columns` son (nombre nuevo, columna con el id, función id -> valor).
+        Devuelve la `description` y las filas ampliadas para `rows_response`.
+        """
+        names = [column[0] for column in description]
+        sources = [(names.index(source), lookup) for _, source, lookup in columns]
+        extended = list(description) + [(name, TYPE_VAR_STRING) + (None,) * 5 for name, _, _ in columns]
+        return extended, [row + tuple(lookup(row[index]) for index, lookup in sources) for row in rows]
+
+    # -- mantenimiento
+
+    def _run(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error refreshing reference data: {e}")
+
+    def start(self):
+        try:
+            self.load()
+        except Exception as e:
+            # Se reintenta en el primer id desconocido o en la siguiente comprobación
+            print(f"Error loading reference data: {e}")
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="reference-data", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "especialidades": len(self._especialidades),
+            "medicos": len(self._medicos),
+            "tipos_cirugia": len(self._tipos),
+            "reloads": self.reloads,
+            "misses": self.misses,
+        }
+
+
+reference_data = ReferenceDataCache()
@@ -1,15 +1,8 @@
-from passlib.context import CryptContext
 import mysql.connector
+from database import db_manager
+from password_hashing import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-DB = {
-    "host": "localhost",
-    "user": "root",
-    "password": "",
-    "database": "siacom_db",
-    "port": 3306
-}
+DB = db_manager.connection_params()
 
 usuarios = [
     ("dr.martinez", "password123"),
@@ -19,15 +12,24 @@ usuarios = [
     ("admin", "password123"),
 ]
 
-conn = mysql.connector.connect(**DB)
-cur = conn.cursor()
 
-for username, plain in usuarios:
-    hash_pwd = pwd_context.hash(plain)
-    cur.execute("UPDATE usuarios SET password_hash=%s WHERE username=%s", (hash_pwd, username))
-    print(f"{username} actualizado -> {hash_pwd}")
+def main():
+    # Los hashes se calculan en paralelo en el pool de procesos de bcrypt
+    hashes = password_hasher.hash_many(plain for _, plain in usuarios)
+    password_hasher.shutdown()
+
+    conn = mysql.connector.connect(**DB)
+    cur = conn.cursor()
+
+    for (username, _), hash_pwd in zip(usuarios, hashes):
+        cur.execute("UPDATE usuarios SET password_hash=%s WHERE username=%s", (hash_pwd, username))
+        print(f"{username} actualizado -> {hash_pwd}")
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    print("Contraseñas actualizadas correctamente ✅")
+
 
-conn.commit()
-cur.close()
-conn.close()
-print("Contraseñas actualizadas correctamente ✅")
+if __name__ == "__main__":
+    main()
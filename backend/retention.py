@@ -0,0 +1,494 @@
+"""Retención de datos fríos: particiones mensuales y archivo columnar en disco.
+
+`signos_vitales` está particionada por mes (`PARTITION BY RANGE COLUMNS
+(fecha_registro)`, migración 0006). `RetentionManager.rotate` crea las
+particiones de los próximos `RETENTION_PREMAKE_MONTHS` meses y, para cada
+partición anterior a los últimos `RETENTION_HOT_MONTHS` meses, la exporta a
+un `.npz` comprimido (una columna por arreglo, filas ordenadas por paciente
+y fecha) y la elimina con `DROP PARTITION`, que no recorre filas.
+
+`notificaciones` no se particiona: su clave única de idempotencia no puede
+incluir la fecha. Sus meses fríos se exportan igual y se borran por tramos.
+
+El manifiesto (`manifest.json`) registra los archivos y la marca de agua
+por tabla: lo anterior a la marca se lee de disco (`ColdArchive`) y lo
+posterior de MySQL, así que una consulta histórica no ve filas dos veces.
+
+Antes de leer una partición el mes se cierra (`cerrado_hasta`): la API deja
+de aceptar lecturas con esa fecha y, tras `RETENTION_CLOSE_GRACE_SECONDS`,
+se vacían los buffers de escritura. El `DROP PARTITION` se hace con la tabla
+bloqueada y solo si la partición tiene las mismas filas que el archivo; si
+llegó alguna más se vuelve a exportar.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database import db_manager
+
+ARCHIVE_DIR = os.getenv(
+    'RETENTION_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive'))
+DELETE_CHUNK_ROWS = 5000
+FETCH_CHUNK_ROWS = 10000
+# Exportaciones de una partición que sigue recibiendo filas antes de dejarla para la próxima rotación
+ARCHIVE_ATTEMPTS = 3
+# Lock de MySQL: con varios procesos de la API solo uno rota a la vez
+LOCK_NAME = 'siacom_retention'
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"p{month:%Y%m}"
+
+
+def partition_definitions(first_month: datetime, last_month: datetime) -> str:
+    """Particiones p<AAAAMM> de `first_month` a `last_month` más `pmax`.
+
+    La primera no tiene cota inferior: recoge también lo anterior a su mes.
+    """
+    parts, month = [], first_month
+    while month <= last_month:
+        parts.append(f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')")
+        month = add_months(month, 1)
+    parts.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return ',\n'.join(parts)
+
+
+class ArchiveSpec(NamedTuple):
+    table: str
+    date_column: str
+    # columna -> tipo en el archivo: int (NULL = 0), float (NULL = NaN), datetime, bool, text
+    columns: Tuple[Tuple[str, str], ...]
+
+
+SIGNOS_VITALES = ArchiveSpec('signos_vitales', 'fecha_registro', (
+    ('id', 'int'), ('paciente_id', 'int'), ('cirugia_id', 'int'), ('fecha_registro', 'datetime'),
+    ('presion_sistolica', 'float'), ('presion_diastolica', 'float'), ('frecuencia_cardiaca', 'float'),
+    ('temperatura', 'float'), ('saturacion_oxigeno', 'float'), ('frecuencia_respiratoria', 'float'),
+    ('dolor_escala', 'float'), ('registrado_por_medico_id', 'int'), ('observaciones', 'text'),
+))
+NOTIFICACIONES = ArchiveSpec('notificaciones', 'fecha_envio', (
+    ('id', 'int'), ('contacto_id', 'int'), ('paciente_id', 'int'), ('cirugia_id', 'int'),
+    ('tipo', 'text'), ('titulo', 'text'), ('mensaje', 'text'), ('leida', 'bool'),
+    ('fecha_envio', 'datetime'), ('clave_idempotencia', 'text'),
+))
+
+
+def chunk_arrays(spec: ArchiveSpec, rows: Sequence[tuple]) -> Dict[str, np.ndarray]:
+    """Filas en el orden de `spec.columns` a un arreglo por columna, sin ordenar."""
+    arrays = {}
+    for index, (name, kind) in enumerate(spec.columns):
+        values = [row[index] for row in rows]
+        if kind == 'int':
+            arrays[name] = np.array([value or 0 for value in values], dtype=np.int64)
+        elif kind == 'float':
+            arrays[name] = np.array([np.nan if value is None else float(value) for value in values],
+                                    dtype=np.float64)
+        elif kind == 'datetime':
+            arrays[name] = np.array(values, dtype='datetime64[s]')
+        elif kind == 'bool':
+            arrays[name] = np.array([bool(value) for value in values], dtype=np.bool_)
+        else:
+            arrays[name] = np.array(['' if value is None else str(value) for value in values], dtype=np.str_)
+    return arrays
+
+
+def to_arrays(spec: ArchiveSpec, chunks: Sequence[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Une los arreglos de `chunk_arrays` y los ordena por (paciente_id, fecha)."""
+    if not chunks:
+        chunks = [chunk_arrays(spec, [])]
+    arrays = {name: np.concatenate([chunk[name] for chunk in chunks]) for name, _ in spec.columns}
+    order = np.lexsort((arrays[spec.date_column], arrays['paciente_id']))
+    return {name: array[order] for name, array in arrays.items()}
+
+
+class ColdArchive:
+    """Archivos mensuales por tabla y su manifiesto; lectura con caché LRU de archivos."""
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self.cache_files = int(os.getenv('RETENTION_ARCHIVE_CACHE_FILES', 8))
+        self._lock = threading.Lock()
+        self._manifest: dict = {}
+        self._manifest_mtime: Optional[float] = None
+        self._files: "OrderedDict[str, Dict[str, np.ndarray]]" = OrderedDict()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, 'manifest.json')
+
+    def manifest(self) -> dict:
+        """Manifiesto actual; se relee si otro proceso lo cambió."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(self.manifest_path) as f:
+                    self._manifest = json.load(f)
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def watermark(self, table: str) -> Optional[datetime]:
+        """Todo lo anterior a esta fecha está en disco y ya no en MySQL."""
+        value = self.manifest().get(table, {}).get('hasta')
+        return datetime.fromisoformat(value) if value else None
+
+    def closed_until(self, table: str) -> Optional[datetime]:
+        """No se aceptan escrituras anteriores a esta fecha: está archivado o archivándose."""
+        entry = self.manifest().get(table, {})
+        values = [datetime.fromisoformat(value) for value in (entry.get('hasta'), entry.get('cerrado_hasta')) if value]
+        return max(values) if values else None
+
+    def _save(self, manifest: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def close(self, table: str, hasta: datetime):
+        """Cierra la tabla a escrituras anteriores a `hasta`; las lecturas siguen yendo a MySQL."""
+        manifest = json.loads(json.dumps(self.manifest()))
+        entry = manifest.setdefault(table, {"hasta": None, "archivos": {}})
+        current = entry.get("cerrado_hasta")
+        if current is None or datetime.fromisoformat(current) < hasta:
+            entry["cerrado_hasta"] = hasta.isoformat()
+            self._save(manifest)
+
+    def _path(self, table: str, month: datetime) -> str:
+        return os.path.join(self.directory, table, f"{month:%Y-%m}.npz")
+
+    def write(self, spec: ArchiveSpec, month: datetime, arrays: Dict[str, np.ndarray]) -> str:
+        path = self._path(spec.table, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+        return path
+
+    def commit(self, spec: ArchiveSpec, month: datetime, arrays: Dict[str, np.ndarray], hasta: datetime):
+        """Registra el archivo del mes y sube la marca de agua de la tabla a `hasta`."""
+        manifest = json.loads(json.dumps(self.manifest()))
+        entry = manifest.setdefault(spec.table, {"hasta": None, "archivos": {}})
+        dates = arrays[spec.date_column]
+        entry["archivos"][f"{month:%Y-%m}"] = {
+            "filas": int(len(dates)),
+            "desde": str(dates.min()) if len(dates) else None,
+            "hasta": str(dates.max()) if len(dates) else None,
+        }
+        if entry["hasta"] is None or datetime.fromisoformat(entry["hasta"]) < hasta:
+            entry["hasta"] = hasta.isoformat()
+        self._save(manifest)
+
+    def load(self, table: str, month: str) -> Dict[str, np.ndarray]:
+        key = f"{table}/{month}"
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is not None:
+                self._files.move_to_end(key)
+                return cached
+        with np.load(os.path.join(self.directory, table, f"{month}.npz")) as data:
+            arrays = {name: data[name] for name in data.files}
+        with self._lock:
+            self._files[key] = arrays
+            while len(self._files) > self.cache_files:
+                self._files.popitem(last=False)
+        return arrays
+
+    def read_vitals(self, paciente_id: int, cirugia_id: Optional[int], desde: int, hasta: int,
+                    metrics: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Lecturas archivadas con epoch en [desde, hasta): (epochs, matriz de `metrics`) ordenadas por fecha."""
+        files = self.manifest().get(SIGNOS_VITALES.table, {}).get('archivos', {})
+        timestamps, values = [], []
+        for month in sorted(files):
+            info = files[month]
+            if not info['filas'] or to_epoch_str(info['hasta']) < desde or to_epoch_str(info['desde']) >= hasta:
+                continue
+            arrays = self.load(SIGNOS_VITALES.table, month)
+            # Filas ordenadas por paciente: el tramo del paciente sale por bisección
+            lo, hi = np.searchsorted(arrays['paciente_id'], [paciente_id, paciente_id + 1])
+            epochs = arrays['fecha_registro'][lo:hi].astype(np.int64)
+            mask = (epochs >= desde) & (epochs < hasta)
+            if cirugia_id is not None:
+                mask &= arrays['cirugia_id'][lo:hi] == cirugia_id
+            timestamps.append(epochs[mask])
+            values.append(np.column_stack([arrays[name][lo:hi][mask] for name in metrics]))
+        if not timestamps:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(metrics)), dtype=np.float64)
+        timestamps, values = np.concatenate(timestamps), np.concatenate(values)
+        # La primera partición archivada puede traer filas anteriores a su mes
+        order = np.argsort(timestamps, kind='stable')
+        return timestamps[order], values[order]
+
+    def stats(self) -> dict:
+        manifest = self.manifest()
+        return {
+            table: {
+                "hasta": entry.get("hasta"),
+                "archivos": len(entry.get("archivos", {})),
+                "filas": sum(info["filas"] for info in entry.get("archivos", {}).values()),
+            }
+            for table, entry in manifest.items()
+        }
+
+
+def to_epoch_str(value: str) -> int:
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+
+class RetentionManager:
+    """Rotación de particiones y archivo de meses fríos, en un hilo cada `RETENTION_CHECK_HOURS`."""
+
+    def __init__(self, manager=db_manager, archive: Optional[ColdArchive] = None):
+        self.manager = manager
+        self.archive = archive or cold_archive
+        self.hot_months = int(os.getenv('RETENTION_HOT_MONTHS', 6))
+        self.premake_months = int(os.getenv('RETENTION_PREMAKE_MONTHS', 3))
+        # 0 = sin rotación automática (solo `python retention.py`)
+        self.check_seconds = float(os.getenv('RETENTION_CHECK_HOURS', 24)) * 3600
+        # Espera tras cerrar un mes, para que los demás procesos vean el cierre y
+        # terminen las escrituras que ya habían validado
+        self.close_grace = float(os.getenv('RETENTION_CLOSE_GRACE_SECONDS', 10))
+        # Vacían los buffers de escritura de este proceso (p. ej. el de signos vitales)
+        self.drain_writes: List[Callable[[], object]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[dict] = None
+
+    def cutoff(self, now: datetime) -> datetime:
+        return add_months(month_start(now), -self.hot_months)
+
+    def partitions(self) -> List[Tuple[str, Optional[datetime]]]:
+        """(nombre, cota superior) de las particiones de signos_vitales; None = MAXVALUE."""
+        rows = self.manager.fetchrows("""
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, (SIGNOS_VITALES.table,))
+        return [
+            (name, None if description == 'MAXVALUE' else datetime.fromisoformat(description.strip("'")))
+            for name, description in rows
+        ]
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        with self.manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                conn.commit()
+                return cursor.rowcount
+            finally:
+                cursor.close()
+
+    def _fetch_chunks(self, spec: ArchiveSpec, where: str, params: tuple = ()) -> Iterator[Dict[str, np.ndarray]]:
+        with self.manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {', '.join(name for name, _ in spec.columns)} FROM {spec.table} {where}",
+                               params)
+                while True:
+                    chunk = cursor.fetchmany(FETCH_CHUNK_ROWS)
+                    if not chunk:
+                        break
+                    yield chunk_arrays(spec, chunk)
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def _fetch(self, spec: ArchiveSpec, where: str, params: tuple = ()) -> Dict[str, np.ndarray]:
+        """Columnas ordenadas de las filas; solo un tramo de `FETCH_CHUNK_ROWS` vive como tuplas."""
+        return to_arrays(spec, list(self._fetch_chunks(spec, where, params)))
+
+    def _drain(self):
+        time.sleep(self.close_grace)
+        for drain in self.drain_writes:
+            try:
+                drain()
+            except Exception as e:
+                print(f"Error draining writes before archiving: {e}")
+
+    def _archive_partition(self, name: str, month: datetime, upper: datetime) -> Optional[int]:
+        """Exporta y elimina la partición; None si siguió recibiendo filas en todos los intentos."""
+        table = SIGNOS_VITALES.table
+        for _ in range(ARCHIVE_ATTEMPTS):
+            arrays = self._fetch(SIGNOS_VITALES, f"PARTITION ({name})")
+            self.archive.write(SIGNOS_VITALES, month, arrays)
+            with self.manager.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    # Con la tabla bloqueada no entra ninguna fila entre el recuento y el DROP
+                    cursor.execute(f"LOCK TABLES {table} WRITE")
+                    try:
+                        cursor.execute(f"SELECT COUNT(*) FROM {table} PARTITION ({name})")
+                        count = cursor.fetchone()[0]
+                        if count == len(arrays['id']):
+                            # Primero el manifiesto: desde aquí las lecturas de este mes van a disco
+                            self.archive.commit(SIGNOS_VITALES, month, arrays, upper)
+                            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+                            return count
+                    finally:
+                        cursor.execute("UNLOCK TABLES")
+                finally:
+                    cursor.close()
+            print(f"Partition {table}.{name} changed while archiving, exporting again")
+        return None
+
+    def ensure_future_partitions(self, now: datetime, dry_run: bool = False) -> List[str]:
+        partitions = self.partitions()
+        if not partitions:
+            return []
+        bounded = [upper for _, upper in partitions if upper is not None]
+        target = add_months(month_start(now), self.premake_months + 1)
+        next_month = bounded[-1] if bounded else month_start(now)
+        created = []
+        while next_month < target:
+            # pmax está vacía mientras haya particiones por delante: reorganizarla no mueve filas
+            if not dry_run:
+                self._execute(f"""
+                    ALTER TABLE {SIGNOS_VITALES.table} REORGANIZE PARTITION pmax INTO (
+                        {partition_definitions(next_month, next_month)}
+                    )
+                """)
+            created.append(partition_name(next_month))
+            next_month = add_months(next_month, 1)
+        return created
+
+    def archive_partitions(self, now: datetime, dry_run: bool = False) -> List[str]:
+        cutoff = self.cutoff(now)
+        # Nunca la última partición con cota: REORGANIZE de pmax necesita una por delante
+        cold = []
+        for name, upper in self.partitions()[:-2]:
+            if upper is None or upper > cutoff:
+                break
+            cold.append((name, upper))
+        if dry_run or not cold:
+            return [name for name, _ in cold]
+        # Antes de leer: desde aquí la API rechaza lecturas con fecha de estos meses
+        self.archive.close(SIGNOS_VITALES.table, cold[-1][1])
+        self._drain()
+        archived = []
+        for name, upper in cold:
+            rows = self._archive_partition(name, add_months(upper, -1), upper)
+            if rows is None:
+                # Queda cerrada y en MySQL; la próxima rotación vuelve a intentarlo
+                print(f"Partition {SIGNOS_VITALES.table}.{name} kept: still receiving rows")
+                break
+            archived.append(name)
+            print(f"Archived partition {SIGNOS_VITALES.table}.{name}: {rows} rows")
+        return archived
+
+    def archive_notifications(self, now: datetime, dry_run: bool = False) -> List[str]:
+        cutoff = self.cutoff(now)
+        oldest = self.manager.fetchone(
+            f"SELECT MIN({NOTIFICACIONES.date_column}) as oldest FROM {NOTIFICACIONES.table}")
+        if not oldest or oldest['oldest'] is None:
+            return []
+        archived = []
+        month = month_start(oldest['oldest'])
+        while month < cutoff:
+            following = add_months(month, 1)
+            archived.append(f"{month:%Y-%m}")
+            if not dry_run:
+                where = f"WHERE {NOTIFICACIONES.date_column} >= %s AND {NOTIFICACIONES.date_column} < %s"
+                arrays = self._fetch(NOTIFICACIONES, where, (month, following))
+                self.archive.write(NOTIFICACIONES, month, arrays)
+                self.archive.commit(NOTIFICACIONES, month, arrays, following)
+                # Por tramos: cada DELETE es una transacción corta
+                while self._execute(f"DELETE FROM {NOTIFICACIONES.table} {where} LIMIT {DELETE_CHUNK_ROWS}",
+                                    (month, following)):
+                    pass
+                print(f"Archived {NOTIFICACIONES.table} {month:%Y-%m}: {len(arrays['id'])} rows")
+            month = following
+        return archived
+
+    def rotate(self, now: Optional[datetime] = None, dry_run: bool = False) -> dict:
+        now = now or datetime.now()
+        with self.manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))
+                if not cursor.fetchone()[0]:
+                    return {"skipped": "otro proceso está rotando"}
+                try:
+                    result = {
+                        "fecha": now.isoformat(),
+                        "creadas": self.ensure_future_partitions(now, dry_run),
+                        "archivadas": self.archive_partitions(now, dry_run),
+                        "notificaciones": self.archive_notifications(now, dry_run),
+                    }
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                    cursor.fetchone()
+            finally:
+                cursor.close()
+        if not dry_run:
+            self.last_run = result
+        return result
+
+    def _run(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                self.rotate()
+            except Exception as e:
+                print(f"Error rotating partitions: {e}")
+
+    def start(self):
+        if self.check_seconds > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def status(self) -> dict:
+        return {
+            "hot_months": self.hot_months,
+            "partitions": [
+                {"nombre": name, "hasta": upper.isoformat() if upper else None}
+                for name, upper in self.partitions()
+            ],
+            "archive": self.archive.stats(),
+            "last_run": self.last_run,
+        }
+
+
+cold_archive = ColdArchive()
+retention_manager = RetentionManager()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rota las particiones y archiva los meses fríos.")
+    parser.add_argument("--status", action="store_true", help="solo muestra particiones y archivo")
+    parser.add_argument("--dry-run", action="store_true", help="muestra qué se crearía y archivaría")
+    args = parser.parse_args()
+    if args.status:
+        print(json.dumps(retention_manager.status(), indent=2))
+    else:
+        print(json.dumps(retention_manager.rotate(dry_run=args.dry_run), indent=2))
+    db_manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
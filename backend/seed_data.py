@@ -0,0 +1,710 @@
+"""Generador de datos sintéticos de SIACOM por factor de escala.
+
+Sustituye a los procedimientos `Generar*` de db/siacom_db.sql, que insertaban
+2000 filas por tabla de una en una. Con `--scale 1` se generan los mismos
+volúmenes (2000 pacientes, contactos, cirugías, signos vitales y
+evoluciones); con `--scale 1000`, dos millones de cada uno.
+
+- Deterministas: cada bloque de `BLOCK_ROWS` filas de cada tabla usa su
+  propio generador numpy sembrado con (--seed, tabla, bloque), y los ids se
+  asignan explícitamente. Mismos --seed, --scale y --base-date dan las
+  mismas filas, con cualquier número de procesos.
+- Consistentes: las claves foráneas salen de los mismos arreglos sembrados
+  (p. ej. los signos de una cirugía son de su paciente y caen en su fecha).
+- Carga por niveles de claves foráneas: las tablas de un nivel solo
+  dependen de niveles anteriores, así que sus bloques se cargan en paralelo
+  en `--workers` procesos, con INSERT multi-fila (`--method insert`) o con
+  `LOAD DATA LOCAL INFILE` desde TSV generados (`--method infile`, requiere
+  `local_infile=ON` en el servidor).
+
+Los códigos de acceso familiares salen de un generador sembrado además con
+--code-secret (aleatorio si no se indica), así que no se deducen de los ids
+ni de --seed. Se escriben en --codes-file para benchmarks/load_test.py.
+
+Las fechas se generan alrededor del mediodía de --base-date (por defecto,
+hoy): cirugías de los 30 días anteriores y posteriores, signos vitales del
+último mes. `fecha_creacion`/`fecha_actualizacion` quedan con la hora de carga.
+
+Uso (desde backend/, con el esquema creado y migrado):
+
+    python seed_data.py --scale 1 --reset
+    python seed_data.py --scale 1000 --method infile --workers 8 --reset
+    python seed_data.py --scale 10 --method files --out-dir /tmp/siacom_seed   # solo escribe los TSV
+"""
+import argparse
+import csv
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import mysql.connector
+import numpy as np
+
+from database import db_manager
+
+BLOCK_ROWS = 10_000
+# Filas por sentencia INSERT en --method insert
+INSERT_BATCH_ROWS = 1_000
+
+# Alfabeto de los códigos familiares: sin 0/O ni 1/I, que se confunden al teclearlos
+CODE_ALPHABET = np.array(list("23456789ABCDEFGHJKLMNPQRSTUVWXYZ"))
+CODE_LENGTH = 10
+
+# Hash de 'password123' del script SQL; rehash_passwords.py lo sustituye para los usuarios conocidos
+PASSWORD_HASH = '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewcSyh8VsD/.vR2m'
+
+# Filas por unidad de escala
+BASE_ROWS = {
+    "pacientes": 2000,
+    "contactos": 2000,
+    "cirugias": 2000,
+    "signos_vitales": 2000,
+    "evoluciones_clinicas": 2000,
+    "notificaciones": 2000,
+    "auditoria": 2000,
+    "medicos": 3,
+}
+
+# Claves foráneas entre tablas sembradas: definen los niveles de carga
+DEPENDENCIES = {
+    "usuarios": (),
+    "especialidades": (),
+    "tipos_cirugia": (),
+    "pacientes": (),
+    "medicos": ("usuarios", "especialidades"),
+    "contactos": ("pacientes",),
+    "auditoria": ("usuarios",),
+    "cirugias": ("pacientes", "medicos", "tipos_cirugia"),
+    "codigos_familiares": ("pacientes", "contactos"),
+    "notificaciones": ("contactos", "pacientes", "cirugias"),
+    "signos_vitales": ("pacientes", "cirugias", "medicos"),
+    "evoluciones_clinicas": ("pacientes", "cirugias", "medicos"),
+}
+# Orden fijo: el índice de cada tabla forma parte de la semilla de sus bloques
+TABLE_CODES = {table: code for code, table in enumerate(DEPENDENCIES)}
+# Tablas que vacía --reset además de las sembradas (creadas por migraciones)
+RESET_EXTRA_TABLES = ("outbox_eventos",)
+
+COLUMNS = {
+    "usuarios": ("id", "username", "password_hash", "email", "tipo_usuario", "activo"),
+    "especialidades": ("id", "nombre", "descripcion"),
+    "tipos_cirugia": ("id", "nombre", "descripcion", "duracion_estimada_minutos", "complejidad"),
+    "pacientes": ("id", "nombre", "apellido", "cedula", "fecha_nacimiento", "sexo", "telefono",
+                  "email", "eps", "tipo_sangre", "activo"),
+    "medicos": ("id", "usuario_id", "nombre", "apellido", "cedula", "especialidad_id", "telefono",
+                "registro_medico"),
+    "contactos": ("id", "paciente_id", "nombre", "apellido", "relacion", "telefono", "email",
+                  "es_contacto_principal", "notificaciones_activas", "puede_recibir_info_medica"),
+    "auditoria": ("id", "tabla_afectada", "id_registro", "accion", "usuario_id", "fecha_accion"),
+    "cirugias": ("id", "paciente_id", "medico_principal_id", "tipo_cirugia_id", "fecha_programada",
+                 "fecha_inicio", "fecha_fin", "estado", "quirofano", "resultado"),
+    "codigos_familiares": ("id", "paciente_id", "contacto_id", "codigo_paciente", "codigo_familiar", "activo"),
+    "notificaciones": ("id", "contacto_id", "paciente_id", "tipo", "titulo", "mensaje", "leida", "fecha_envio"),
+    "signos_vitales": ("id", "paciente_id", "cirugia_id", "fecha_registro", "presion_sistolica",
+                       "presion_diastolica", "frecuencia_cardiaca", "temperatura", "saturacion_oxigeno",
+                       "frecuencia_respiratoria", "dolor_escala", "registrado_por_medico_id"),
+    "evoluciones_clinicas": ("id", "paciente_id", "cirugia_id", "fecha_registro", "estado_general",
+                             "descripcion", "plan_tratamiento", "proxima_evaluacion", "medico_id"),
+}
+
+ESPECIALIDADES = [
+    ('Cirugía General', 'Especialidad médica quirúrgica general'),
+    ('Cardiología', 'Especialidad del corazón y sistema cardiovascular'),
+    ('Neurología', 'Especialidad del sistema nervioso'),
+    ('Ortopedia', 'Especialidad de huesos y articulaciones'),
+    ('Anestesiología', 'Especialidad de anestesia y cuidados perioperatorios'),
+]
+TIPOS_CIRUGIA = [
+    ('Apendicectomía', 'Extirpación del apéndice', 60, 'Baja'),
+    ('Colecistectomía', 'Extirpación de la vesícula biliar', 90, 'Media'),
+    ('Cirugía de Corazón Abierto', 'Cirugía cardíaca mayor', 300, 'Alta'),
+    ('Reemplazo de Rodilla', 'Cirugía ortopédica de rodilla', 120, 'Media'),
+    ('Neurocirugía', 'Cirugía del sistema nervioso', 240, 'Alta'),
+]
+# Los usuarios y médicos del script SQL conservan sus ids, nombres y credenciales
+MEDICOS_CONOCIDOS = [
+    ('dr.martinez', 'Carlos', 'Martínez', '12345678', 1, '3001234567'),
+    ('dr.rodriguez', 'Ana', 'Rodríguez', '87654321', 2, '3009876543'),
+    ('dr.garcia', 'Miguel', 'García', '11223344', 3, '3005566778'),
+]
+USUARIO_FAMILIAR_ID, USUARIO_ADMIN_ID = 4, 5
+
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Carmen', 'José', 'Elena', 'Miguel', 'Laura',
+           'Antonio', 'Isabel', 'Francisco', 'Rosa', 'David', 'Patricia', 'Roberto', 'Marta',
+           'Fernando', 'Lucía']
+APELLIDOS = ['González', 'Rodríguez', 'García', 'Martínez', 'López', 'Hernández', 'Pérez', 'Sánchez',
+             'Ramírez', 'Cruz', 'Torres', 'Flores', 'Gómez', 'Díaz', 'Vargas']
+NOMBRES_CONTACTO = ['Pedro', 'Sandra', 'Ricardo', 'Mónica', 'Andrés', 'Claudia', 'Javier', 'Diana',
+                    'Sergio', 'Alejandra']
+APELLIDOS_CONTACTO = ['Morales', 'Jiménez', 'Ruiz', 'Herrera', 'Medina', 'Castro', 'Ortiz', 'Ramos']
+RELACIONES = ['Hijo/a', 'Esposo/a', 'Padre/Madre', 'Hermano/a', 'Abuelo/a', 'Primo/a']
+EPS = ['EPS SURA', 'Nueva EPS', 'Sanitas', 'Compensar', 'Salud Total']
+TIPOS_SANGRE = ['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-']
+DESCRIPCIONES_EVOLUCION = [
+    'Paciente en evolución favorable, sin complicaciones',
+    'Signos vitales estables, dolor controlado',
+    'Recuperación dentro de parámetros normales',
+    'Requiere monitoreo constante',
+    'Evolución satisfactoria post-cirugía',
+    'Paciente consciente y orientado',
+    'Tolerando dieta, movilización progresiva',
+    'Control de dolor adecuado, herida en buen estado',
+]
+PLANES_TRATAMIENTO = [
+    'Continuar tratamiento actual', 'Ajustar medicación para dolor', 'Iniciar fisioterapia',
+    'Control en 24 horas', 'Preparar para alta médica', 'Monitoreo estrecho de signos vitales',
+]
+NOTIFICACIONES = {
+    'info_general': ('Actualización del paciente', 'El equipo médico registró una nueva evolución.'),
+    'cambio_estado': ('Cambio de estado de la cirugía', 'La cirugía cambió de estado.'),
+    'complicacion': ('Aviso del equipo médico', 'El equipo médico se comunicará con usted.'),
+    'alta_medica': ('Alta médica', 'El paciente recibió el alta médica.'),
+}
+TABLAS_AUDITADAS = ['pacientes', 'cirugias', 'signos_vitales', 'evoluciones_clinicas', 'contactos']
+
+HOUR, DAY = 3600, 86400
+
+
+class SeedPlan:
+    """Volúmenes y arreglos de claves foráneas compartidos por todos los bloques.
+
+    Los arreglos se regeneran igual en cada proceso a partir de la semilla,
+    así que los workers no necesitan recibirlos ni consultar la base.
+    """
+
+    def __init__(self, scale: float, seed: int, base_date: date, tables: Sequence[str], code_secret: int = 0):
+        self.scale = scale
+        self.seed = seed
+        self.code_secret = code_secret
+        self.base_date = base_date
+        # "Ahora" de los datos generados
+        self.now = np.datetime64(f"{base_date.isoformat()}T12:00:00", 's')
+        self.tables = [table for table in DEPENDENCIES if table in tables]
+        counts = {table: max(1, round(rows * scale)) for table, rows in BASE_ROWS.items()}
+        counts["medicos"] = max(len(MEDICOS_CONOCIDOS), counts["medicos"])
+        counts["usuarios"] = counts["medicos"] + 2
+        counts["especialidades"] = len(ESPECIALIDADES)
+        counts["tipos_cirugia"] = len(TIPOS_CIRUGIA)
+        # Un código de acceso por contacto principal (uno de cada tres)
+        counts["codigos_familiares"] = counts["contactos"] // 3
+        self.counts = counts
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def rng(self, table: str, block: Optional[int] = None) -> np.random.Generator:
+        key = [self.seed, TABLE_CODES[table], 0] if block is None else [self.seed, TABLE_CODES[table], 1, block]
+        return np.random.default_rng(key)
+
+    def code_rng(self, block: int) -> np.random.Generator:
+        """Generador de los códigos de acceso: con --seed solo no basta para reproducirlos."""
+        return np.random.default_rng([self.seed, TABLE_CODES["codigos_familiares"], 2, block, self.code_secret])
+
+    def blocks(self, table: str) -> int:
+        return -(-self.counts[table] // BLOCK_ROWS)
+
+    def _array(self, name: str, build):
+        array = self._arrays.get(name)
+        if array is None:
+            array = self._arrays[name] = build()
+        return array
+
+    def contacto_paciente(self) -> np.ndarray:
+        return self._array("contacto_paciente", lambda: self.rng("contactos").integers(
+            1, self.counts["pacientes"] + 1, self.counts["contactos"]))
+
+    def cirugias(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(paciente, médico, tipo, segundos de la fecha programada respecto a `now`) por cirugía."""
+        def build():
+            rng, n = self.rng("cirugias"), self.counts["cirugias"]
+            paciente = rng.integers(1, self.counts["pacientes"] + 1, n)
+            medico = rng.integers(1, self.counts["medicos"] + 1, n)
+            tipo = rng.integers(1, len(TIPOS_CIRUGIA) + 1, n)
+            # Días -30..29, franjas de 15 minutos entre las 7:00 y las 18:45
+            programada = (rng.integers(-30, 30, n) * DAY + rng.integers(7 * 4, 19 * 4, n) * 900 - 12 * HOUR)
+            return np.stack([paciente, medico, tipo, programada])
+        return tuple(self._array("cirugias", build))
+
+
+def _datetimes(plan: SeedPlan, offsets: np.ndarray) -> List[str]:
+    values = np.datetime_as_string(plan.now + offsets.astype('timedelta64[s]'), unit='s')
+    return np.char.replace(values, 'T', ' ').tolist()
+
+
+def _pick(rng: np.random.Generator, values: Sequence, n: int, p=None) -> list:
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=p)].tolist()
+
+
+def _telefonos(rng: np.random.Generator, n: int) -> List[str]:
+    return [f"300{value}" for value in rng.integers(1_000_000, 10_000_000, n).tolist()]
+
+
+def _nullable(values: np.ndarray, mask: np.ndarray) -> list:
+    result = values.tolist()
+    for index in np.flatnonzero(~mask).tolist():
+        result[index] = None
+    return result
+
+
+# -- generadores por tabla: (plan, rng del bloque, ids 1-based) -> columnas
+
+def gen_usuarios(plan, rng, ids):
+    rows = []
+    for user_id in ids.tolist():
+        if user_id == USUARIO_FAMILIAR_ID:
+            rows.append((user_id, 'familia.gonzalez', PASSWORD_HASH, 'familia.gonzalez@gmail.com', 'familiar', 1))
+        elif user_id == USUARIO_ADMIN_ID:
+            rows.append((user_id, 'admin', PASSWORD_HASH, 'admin@hospital.com', 'administrador', 1))
+        else:
+            medico_id = _medico_de_usuario(user_id)
+            username = (MEDICOS_CONOCIDOS[medico_id - 1][0] if medico_id <= len(MEDICOS_CONOCIDOS)
+                        else f"medico{medico_id}")
+            rows.append((user_id, username, PASSWORD_HASH, f"{username}@hospital.com", 'medico', 1))
+    return list(zip(*rows))
+
+
+def _usuario_de_medico(medico_id: int) -> int:
+    return medico_id if medico_id <= len(MEDICOS_CONOCIDOS) else medico_id + 2
+
+
+def _medico_de_usuario(user_id: int) -> int:
+    return user_id if user_id <= len(MEDICOS_CONOCIDOS) else user_id - 2
+
+
+def gen_especialidades(plan, rng, ids):
+    return [ids.tolist(), [ESPECIALIDADES[i - 1][0] for i in ids], [ESPECIALIDADES[i - 1][1] for i in ids]]
+
+
+def gen_tipos_cirugia(plan, rng, ids):
+    rows = [(i,) + TIPOS_CIRUGIA[i - 1] for i in ids.tolist()]
+    return list(zip(*rows))
+
+
+def gen_pacientes(plan, rng, ids):
+    n = ids.size
+    edades = rng.integers(20 * 365, 80 * 365, n)
+    nacimiento = (plan.now.astype('datetime64[D]') - edades.astype('timedelta64[D]'))
+    return [
+        ids.tolist(),
+        _pick(rng, NOMBRES, n),
+        _pick(rng, APELLIDOS, n),
+        [f"100{i:06d}" for i in ids.tolist()],
+        np.datetime_as_string(nacimiento, unit='D').tolist(),
+        _pick(rng, ['M', 'F', 'Otro'], n, p=[0.49, 0.49, 0.02]),
+        _telefonos(rng, n),
+        [f"paciente{i}@email.com" for i in ids.tolist()],
+        _pick(rng, EPS, n),
+        _pick(rng, TIPOS_SANGRE, n),
+        (rng.random(n) >= 0.01).astype(int).tolist(),
+    ]
+
+
+def gen_medicos(plan, rng, ids):
+    n = ids.size
+    nombres, apellidos = _pick(rng, NOMBRES, n), _pick(rng, APELLIDOS, n)
+    especialidades = rng.integers(1, len(ESPECIALIDADES) + 1, n).tolist()
+    telefonos = _telefonos(rng, n)
+    rows = []
+    for k, medico_id in enumerate(ids.tolist()):
+        if medico_id <= len(MEDICOS_CONOCIDOS):
+            _, nombre, apellido, cedula, especialidad, telefono = MEDICOS_CONOCIDOS[medico_id - 1]
+        else:
+            nombre, apellido, cedula = nombres[k], apellidos[k], f"2{medico_id:08d}"
+            especialidad, telefono = especialidades[k], telefonos[k]
+        rows.append((medico_id, _usuario_de_medico(medico_id), nombre, apellido, cedula,
+                     especialidad, telefono, f"RM{medico_id:03d}"))
+    return list(zip(*rows))
+
+
+def gen_contactos(plan, rng, ids):
+    n = ids.size
+    principal = (ids % 3 == 0).astype(int).tolist()
+    return [
+        ids.tolist(),
+        plan.contacto_paciente()[ids - 1].tolist(),
+        _pick(rng, NOMBRES_CONTACTO, n),
+        _pick(rng, APELLIDOS_CONTACTO, n),
+        _pick(rng, RELACIONES, n),
+        _telefonos(rng, n),
+        [f"contacto{i}@email.com" for i in ids.tolist()],
+        principal,
+        [1] * n,
+        principal,
+    ]
+
+
+def gen_auditoria(plan, rng, ids):
+    n = ids.size
+    tabla = rng.choice(len(TABLAS_AUDITADAS), n)
+    maximos = np.array([plan.counts[t] for t in TABLAS_AUDITADAS])[tabla]
+    return [
+        ids.tolist(),
+        np.asarray(TABLAS_AUDITADAS, dtype=object)[tabla].tolist(),
+        (np.floor(rng.random(n) * maximos).astype(np.int64) + 1).tolist(),
+        _pick(rng, ['INSERT', 'UPDATE', 'DELETE'], n, p=[0.6, 0.35, 0.05]),
+        rng.integers(1, plan.counts["usuarios"] + 1, n).tolist(),
+        _datetimes(plan, -rng.integers(0, 30 * DAY, n)),
+    ]
+
+
+def gen_cirugias(plan, rng, ids):
+    n = ids.size
+    paciente, medico, tipo, programada = (column[ids - 1] for column in plan.cirugias())
+    hoy = np.floor_divide(programada + 12 * HOUR, DAY) == 0
+    estado = np.select(
+        [programada > 0, hoy],
+        [
+            np.where(hoy, rng.choice(['Pre-operatorio', 'Programada'], n),
+                     rng.choice(['Programada', 'Cancelada'], n, p=[0.95, 0.05])),
+            rng.choice(['En_proceso', 'Post-operatorio', 'Finalizada'], n),
+        ],
+        rng.choice(['Finalizada', 'Post-operatorio', 'Cancelada'], n, p=[0.85, 0.08, 0.07]),
+    )
+    iniciada = np.isin(estado, ['En_proceso', 'Post-operatorio', 'Finalizada'])
+    terminada = np.isin(estado, ['Post-operatorio', 'Finalizada'])
+    duracion = np.array([t[2] for t in TIPOS_CIRUGIA])[tipo - 1] * 60
+    # Nada empezado ni terminado después de "ahora"
+    inicio = np.minimum(programada + rng.integers(0, 30 * 60, n), 0)
+    fin = np.minimum(inicio + (duracion * rng.uniform(0.8, 1.3, n)).astype(np.int64), 0)
+    resultado = rng.choice(['Exitosa', 'Complicaciones_menores', 'Complicaciones_mayores'], n, p=[0.9, 0.08, 0.02])
+    return [
+        ids.tolist(),
+        paciente.tolist(),
+        medico.tolist(),
+        tipo.tolist(),
+        _datetimes(plan, programada),
+        _nullable(np.array(_datetimes(plan, inicio), dtype=object), iniciada),
+        _nullable(np.array(_datetimes(plan, fin), dtype=object), terminada),
+        estado.tolist(),
+        [f"Q{q}" for q in rng.integers(1, 11, n).tolist()],
+        _nullable(resultado.astype(object), estado == 'Finalizada'),
+    ]
+
+
+def _codigos(rng: np.random.Generator, prefix: str, n: int) -> List[str]:
+    chars = CODE_ALPHABET[rng.integers(0, len(CODE_ALPHABET), (n, CODE_LENGTH))]
+    return [prefix + ''.join(row) for row in chars.tolist()]
+
+
+def gen_codigos_familiares(plan, rng, ids):
+    contactos = ids * 3
+    pacientes = plan.contacto_paciente()[contactos - 1]
+    code_rng = plan.code_rng(int((ids[0] - 1) // BLOCK_ROWS))
+    return [
+        ids.tolist(),
+        pacientes.tolist(),
+        contactos.tolist(),
+        _codigos(code_rng, "PAC", ids.size),
+        _codigos(code_rng, "FAM", ids.size),
+        [1] * ids.size,
+    ]
+
+
+def gen_notificaciones(plan, rng, ids):
+    n = ids.size
+    contactos = rng.integers(1, plan.counts["contactos"] + 1, n)
+    tipos = _pick(rng, list(NOTIFICACIONES), n, p=[0.5, 0.35, 0.05, 0.1])
+    return [
+        ids.tolist(),
+        contactos.tolist(),
+        plan.contacto_paciente()[contactos - 1].tolist(),
+        tipos,
+        [NOTIFICACIONES[tipo][0] for tipo in tipos],
+        [NOTIFICACIONES[tipo][1] for tipo in tipos],
+        (rng.random(n) < 0.6).astype(int).tolist(),
+        _datetimes(plan, -rng.integers(0, 30 * DAY, n)),
+    ]
+
+
+def _registros_clinicos(plan, rng, n, share_cirugia, window, after_surgery):
+    """Paciente, cirugía (o None), médico y fecha de registros ligados a cirugías en `share_cirugia` de los casos.
+
+    Los ligados caen en `after_surgery` segundos alrededor de la fecha de la
+    cirugía; si eso queda en el futuro, el registro pasa a ser suelto.
+    """
+    c_paciente, c_medico, _, c_programada = plan.cirugias()
+    cirugia = rng.integers(1, plan.counts["cirugias"] + 1, n)
+    offset = c_programada[cirugia - 1] + rng.integers(after_surgery[0], after_surgery[1], n)
+    ligada = (rng.random(n) < share_cirugia) & (offset <= 0)
+    paciente = np.where(ligada, c_paciente[cirugia - 1], rng.integers(1, plan.counts["pacientes"] + 1, n))
+    medico = np.where(ligada, c_medico[cirugia - 1], rng.integers(1, plan.counts["medicos"] + 1, n))
+    fecha = np.where(ligada, offset, -rng.integers(0, window, n))
+    return paciente, _nullable(cirugia, ligada), medico, fecha
+
+
+def gen_signos_vitales(plan, rng, ids):
+    n = ids.size
+    paciente, cirugia, medico, fecha = _registros_clinicos(
+        plan, rng, n, share_cirugia=1 / 3, window=30 * DAY, after_surgery=(-12 * HOUR, 36 * HOUR))
+    return [
+        ids.tolist(),
+        paciente.tolist(),
+        cirugia,
+        _datetimes(plan, fecha),
+        rng.integers(100, 160, n).tolist(),
+        rng.integers(60, 100, n).tolist(),
+        rng.integers(60, 120, n).tolist(),
+        [f"{t:.1f}" for t in rng.uniform(35.0, 39.0, n).tolist()],
+        rng.integers(90, 100, n).tolist(),
+        rng.integers(12, 22, n).tolist(),
+        rng.integers(0, 11, n).tolist(),
+        medico.tolist(),
+    ]
+
+
+def gen_evoluciones_clinicas(plan, rng, ids):
+    n = ids.size
+    paciente, cirugia, medico, fecha = _registros_clinicos(
+        plan, rng, n, share_cirugia=1 / 4, window=7 * DAY, after_surgery=(HOUR, 72 * HOUR))
+    return [
+        ids.tolist(),
+        paciente.tolist(),
+        cirugia,
+        _datetimes(plan, fecha),
+        _pick(rng, ['Estable', 'Mejorado', 'Regular', 'Crítico'], n, p=[0.4, 0.3, 0.2, 0.1]),
+        _pick(rng, DESCRIPCIONES_EVOLUCION, n),
+        _pick(rng, PLANES_TRATAMIENTO, n),
+        _datetimes(plan, fecha + DAY),
+        medico.tolist(),
+    ]
+
+
+GENERATORS = {table: globals()[f"gen_{table}"] for table in DEPENDENCIES}
+
+
+def generate_block(plan: SeedPlan, table: str, block: int) -> List[tuple]:
+    start = block * BLOCK_ROWS
+    ids = np.arange(start + 1, min(start + BLOCK_ROWS, plan.counts[table]) + 1, dtype=np.int64)
+    columns = GENERATORS[table](plan, plan.rng(table, block), ids)
+    return list(zip(*columns))
+
+
+def load_levels(tables: Sequence[str]) -> List[List[str]]:
+    """Agrupa las tablas por niveles: cada una solo depende de niveles anteriores."""
+    level: Dict[str, int] = {}
+    for table in DEPENDENCIES:
+        level[table] = 1 + max((level[dep] for dep in DEPENDENCIES[table]), default=-1)
+    levels: List[List[str]] = [[] for _ in range(max(level.values()) + 1)]
+    for table in DEPENDENCIES:
+        if table in tables:
+            levels[level[table]].append(table)
+    return [tables_in_level for tables_in_level in levels if tables_in_level]
+
+
+# -- escritura
+
+def _tsv_field(value) -> str:
+    if value is None:
+        return '\\N'
+    text = str(value)
+    if '\\' in text or '\t' in text or '\n' in text:
+        text = text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return text
+
+
+def write_tsv(path: str, rows: Sequence[tuple]):
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.writelines('\t'.join(map(_tsv_field, row)) + '\n' for row in rows)
+
+
+def insert_sql(table: str) -> str:
+    columns = COLUMNS[table]
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+
+def load_data_sql(table: str) -> str:
+    # Los valores por defecto de LOAD DATA (tab, \n, escape con \) coinciden con write_tsv
+    return (f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+            f"({', '.join(COLUMNS[table])})")
+
+
+# Estado de cada proceso worker
+_worker: dict = {}
+
+
+def _init_worker(scale: float, seed: int, base_date: date, tables: Sequence[str], code_secret: int,
+                 method: str, out_dir: Optional[str]):
+    _worker.update(plan=SeedPlan(scale, seed, base_date, tables, code_secret), method=method,
+                   out_dir=out_dir, conn=None)
+
+
+def _worker_connection():
+    if _worker["conn"] is None:
+        conn = mysql.connector.connect(**db_manager.connection_params(), allow_local_infile=True)
+        cursor = conn.cursor()
+        # Los ids y cédulas generados ya son únicos; las claves foráneas sí se comprueban
+        cursor.execute("SET SESSION unique_checks = 0")
+        cursor.close()
+        _worker["conn"] = conn
+    return _worker["conn"]
+
+
+def _load_block(table: str, block: int) -> Tuple[str, int, float]:
+    start = time.perf_counter()
+    rows = generate_block(_worker["plan"], table, block)
+    method = _worker["method"]
+    if method == "insert":
+        conn = _worker_connection()
+        cursor = conn.cursor()
+        try:
+            sql = insert_sql(table)
+            for offset in range(0, len(rows), INSERT_BATCH_ROWS):
+                # mysql-connector reescribe executemany como un INSERT multi-fila
+                cursor.executemany(sql, rows[offset:offset + INSERT_BATCH_ROWS])
+            conn.commit()
+        finally:
+            cursor.close()
+    else:
+        path = os.path.join(_worker["out_dir"], f"{table}.{block:05d}.tsv")
+        write_tsv(path, rows)
+        if method == "infile":
+            conn = _worker_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(load_data_sql(table), (path,))
+                conn.commit()
+            finally:
+                cursor.close()
+    return table, len(rows), time.perf_counter() - start
+
+
+# -- preparación de la base
+
+def existing_tables(conn) -> set:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def non_empty_tables(conn, tables: Sequence[str]) -> List[str]:
+    cursor = conn.cursor()
+    try:
+        result = []
+        for table in tables:
+            cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+            if cursor.fetchall():
+                result.append(table)
+        return result
+    finally:
+        cursor.close()
+
+
+def reset_tables(conn, tables: Sequence[str]):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in reversed(tables):
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    finally:
+        cursor.close()
+
+
+def run(plan: SeedPlan, method: str, workers: int, out_dir: Optional[str]) -> Dict[str, Tuple[int, float]]:
+    """Genera y carga todos los bloques nivel a nivel; devuelve (filas, segundos de worker) por tabla."""
+    totals = {table: (0, 0.0) for table in plan.tables}
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker,
+        initargs=(plan.scale, plan.seed, plan.base_date, plan.tables, plan.code_secret, method, out_dir),
+    )
+    with executor:
+        for number, level in enumerate(load_levels(plan.tables), start=1):
+            start = time.perf_counter()
+            futures = [
+                executor.submit(_load_block, table, block)
+                for table in level for block in range(plan.blocks(table))
+            ]
+            rows = 0
+            for future in as_completed(futures):
+                table, count, elapsed = future.result()
+                previous_rows, previous_time = totals[table]
+                totals[table] = (previous_rows + count, previous_time + elapsed)
+                rows += count
+            print(f"nivel {number} ({', '.join(level)}): {rows} filas en {time.perf_counter() - start:.1f} s")
+    return totals
+
+
+def write_codes_file(plan: SeedPlan, path: str):
+    """Códigos de acceso sembrados, para que el test de carga inicie sesión como las familias."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(fd, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["codigo_paciente", "codigo_familiar", "paciente_id"])
+        for block in range(plan.blocks("codigos_familiares")):
+            for _, paciente_id, _, codigo_paciente, codigo_familiar, _ in generate_block(
+                    plan, "codigos_familiares", block):
+                writer.writerow([codigo_paciente, codigo_familiar, paciente_id])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="1 = 2000 filas por tabla principal")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-date", type=date.fromisoformat, default=date.today(),
+                        help="fecha de referencia de los datos (AAAA-MM-DD, por defecto hoy)")
+    parser.add_argument("--method", choices=["insert", "infile", "files"], default="insert")
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument("--out-dir", help="directorio de los TSV (infile/files)")
+    parser.add_argument("--keep-files", action="store_true", help="no borrar los TSV tras LOAD DATA")
+    parser.add_argument("--reset", action="store_true", help="vaciar las tablas sembradas antes de cargar")
+    parser.add_argument("--code-secret", type=int, default=None,
+                        help="semilla secreta de los códigos familiares (por defecto aleatoria)")
+    parser.add_argument("--codes-file", default="seed_codes.csv",
+                        help="CSV con los códigos familiares generados (para benchmarks/load_test.py)")
+    args = parser.parse_args()
+
+    tables = list(DEPENDENCIES)
+    if args.method != "files":
+        with db_manager.connection() as conn:
+            present = existing_tables(conn)
+            missing = [table for table in tables if table not in present and table != "codigos_familiares"]
+            if missing:
+                sys.exit(f"Faltan tablas ({', '.join(missing)}): cree el esquema y ejecute migrate.py")
+            tables = [table for table in tables if table in present]
+            if args.reset:
+                reset_tables(conn, tables + [t for t in RESET_EXTRA_TABLES if t in present])
+            else:
+                occupied = non_empty_tables(conn, tables)
+                if occupied:
+                    sys.exit(f"Las tablas {', '.join(occupied)} ya tienen datos; use --reset para vaciarlas")
+        db_manager.close_all()
+
+    code_secret = args.code_secret if args.code_secret is not None else secrets.randbits(63)
+    plan = SeedPlan(args.scale, args.seed, args.base_date, tables, code_secret)
+    out_dir = args.out_dir
+    if args.method != "insert":
+        out_dir = out_dir or tempfile.mkdtemp(prefix="siacom_seed_")
+        os.makedirs(out_dir, exist_ok=True)
+
+    print(f"scale={args.scale} seed={args.seed} base-date={args.base_date} method={args.method} "
+          f"workers={args.workers}")
+    start = time.perf_counter()
+    try:
+        totals = run(plan, args.method, args.workers, out_dir)
+    finally:
+        if args.method == "infile" and not args.keep_files and not args.out_dir:
+            shutil.rmtree(out_dir, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'tabla':<22} {'filas':>10} {'filas/s':>10}")
+    for table, (rows, worker_time) in totals.items():
+        print(f"{table:<22} {rows:>10} {rows / worker_time if worker_time else 0:>10.0f}")
+    total_rows = sum(rows for rows, _ in totals.values())
+    print(f"total: {total_rows} filas en {elapsed:.1f} s ({total_rows / elapsed:.0f} filas/s)")
+    if args.method == "files" or args.keep_files:
+        print(f"TSV en {out_dir}")
+    if "codigos_familiares" in plan.tables:
+        write_codes_file(plan, args.codes_file)
+        print(f"Códigos familiares en {args.codes_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Arranque de la API con varios procesos (pre-fork).
+
+    python serve.py --workers 4 --port 8000
+
+El proceso principal importa la app, abre el socket de escucha y hace
+fork del hub de `cluster` y de los workers uvicorn, que aceptan
+conexiones del mismo socket. Cada worker abre después del fork sus propios
+pools y hilos de fondo: DB_POOL_SIZE y el pool async son por worker, así
+que MySQL ve workers × tamaño del pool. Si un worker muere se arranca otro;
+si muere el hub se detiene todo, porque los workers ya no comparten estado.
+
+Con un solo worker no hay hub ni fork: equivale a `uvicorn main:app`.
+"""
+import argparse
+import os
+import secrets
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+from typing import Dict, Optional
+
+# Un worker que muere antes de esto tras arrancar se vuelve a lanzar con espera
+MIN_WORKER_UPTIME = 5.0
+
+
+class Supervisor:
+    def __init__(self, host: str, port: int, workers: int, log_level: str):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self.stopping = False
+        self.exit_code = 0
+        self.hub_pid: Optional[int] = None
+        self.worker_pids: Dict[int, float] = {}
+        self.runtime_dir = tempfile.mkdtemp(prefix="siacom-cluster-")
+        self.address = os.path.join(self.runtime_dir, "hub.sock")
+        self.sock: Optional[socket.socket] = None
+
+    def prepare(self):
+        """Entorno compartido por hub y workers; antes de importar la app, que lo lee al importarse."""
+        os.environ['CLUSTER_SOCKET'] = self.address
+        os.environ['CLUSTER_AUTHKEY'] = secrets.token_hex(16)
+        # bcrypt: los procesos del pool se reparten entre los workers en vez de multiplicarse
+        os.environ.setdefault('PASSWORD_POOL_WORKERS', str(max(1, (os.cpu_count() or 1) // self.workers)))
+        import main  # noqa: F401  (se importa una vez aquí y los workers la heredan)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+
+    def _fork(self, target) -> int:
+        # Sin vaciar, el hijo heredaría y repetiría lo que quede en los buffers
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            return pid
+        code = 0
+        try:
+            # Grupo propio: Ctrl+C llega solo al supervisor, que avisa una vez a cada hijo
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            target()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _run_hub(self):
+        from cluster import ClusterHub
+
+        self.sock.close()
+        # Lo detiene el supervisor cuando ya salieron los workers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        ClusterHub(self.address, bytes.fromhex(os.environ['CLUSTER_AUTHKEY'])).serve_forever()
+
+    def _run_worker(self):
+        import uvicorn
+        from main import app
+
+        config = uvicorn.Config(app, host=self.host, port=self.port, log_level=self.log_level)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _spawn_worker(self):
+        pid = self._fork(self._run_worker)
+        self.worker_pids[pid] = time.monotonic()
+        print(f"Worker {pid} started")
+
+    def _on_signal(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        print(f"Stopping {len(self.worker_pids)} workers")
+        for pid in list(self.worker_pids):
+            _kill(pid, signal.SIGTERM)
+
+    def run(self) -> int:
+        self.prepare()
+        self.hub_pid = self._fork(self._run_hub)
+        deadline = time.monotonic() + 10
+        while not os.path.exists(self.address):
+            if time.monotonic() > deadline:
+                _kill(self.hub_pid, signal.SIGKILL)
+                raise RuntimeError("El hub del cluster no arrancó")
+            time.sleep(0.05)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for _ in range(self.workers):
+            self._spawn_worker()
+        print(f"Serving on http://{self.host}:{self.port} with {self.workers} workers")
+        try:
+            self._supervise()
+        finally:
+            if self.hub_pid is not None:
+                _kill(self.hub_pid, signal.SIGTERM)
+                os.waitpid(self.hub_pid, 0)
+            self.sock.close()
+            shutil.rmtree(self.runtime_dir, ignore_errors=True)
+        return self.exit_code
+
+    def _supervise(self):
+        while self.worker_pids:
+            pid, status = os.wait()
+            if pid == self.hub_pid:
+                self.hub_pid = None
+                if not self.stopping:
+                    print("Cluster hub exited, stopping workers")
+                    self.exit_code = 1
+                    self._on_signal(signal.SIGTERM, None)
+                continue
+            started = self.worker_pids.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                # Falla al arrancar (p. ej. sin base de datos): sin bucle de forks
+                time.sleep(MIN_WORKER_UPTIME)
+            if not self.stopping:
+                self._spawn_worker()
+
+
+def _kill(pid: int, signum: int):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv('WEB_HOST', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.getenv('WEB_PORT', 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv('WEB_WORKERS', 1)))
+    parser.add_argument("--log-level", default=os.getenv('WEB_LOG_LEVEL', 'info'))
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        import uvicorn
+        from main import app
+
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+    if not hasattr(os, 'fork'):
+        sys.exit("--workers > 1 necesita un sistema con fork (Linux)")
+    sys.exit(Supervisor(args.host, args.port, args.workers, args.log_level).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class SnapshotCache:
+    """Caché LRU con TTL para snapshots por clave (p. ej. por paciente).
+
+    Las escrituras invalidan la clave. Para que una lectura que empezó antes
+    de la escritura no vuelva a guardar datos viejos, cada carga pide un
+    `token` con `begin()` antes de consultar la base de datos y `put()`
+    descarta el valor si la clave se invalidó después de ese token.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._seq = 0
+        self._invalidated_at = {}
+        # Tokens anteriores a `_floor` se rechazan (tras podar `_invalidated_at`)
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.rejected_puts = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def begin(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def put(self, key: Hashable, value: Any, token: int) -> bool:
+        with self._lock:
+            if token < self._floor or self._invalidated_at.get(key, 0) > token:
+                self.rejected_puts += 1
+                return False
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._seq += 1
+            self._invalidated_at[key] = self._seq
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+            if len(self._invalidated_at) > self.maxsize * 4:
+                self._invalidated_at.clear()
+                self._floor = self._seq
+
+    def clear(self):
+        with self._lock:
+            self._seq += 1
+            self._entries.clear()
+            self._invalidated_at.clear()
+            self._floor = self._seq
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "rejected_puts": self.rejected_puts,
+            }
+
+
+family_cache = SnapshotCache(
+    maxsize=int(os.getenv('FAMILY_CACHE_SIZE', 5000)),
+    ttl_seconds=float(os.getenv('FAMILY_CACHE_TTL', 300)),
+)
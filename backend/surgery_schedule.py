@@ -0,0 +1,274 @@
+"""Agenda de quirófanos en memoria con índices de intervalos.
+
+Cada quirófano y cada cirujano tienen una pista: las cirugías no canceladas
+ordenadas por inicio, con la mayor duración vista. Las cirugías que se
+solapan con [desde, hasta) empiezan en [desde - duración máxima, hasta), así
+que el chequeo de conflictos y los huecos libres son dos bisecciones más
+las cirugías del rango, sin recorrer `cirugias`.
+
+El fin de una cirugía es `fecha_fin` si terminó y si no su inicio real o
+programado más `tipos_cirugia.duracion_estimada_minutos`.
+"""
+import itertools
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from database import db_manager
+from reference_data import reference_data
+
+# Duración supuesta si el tipo de cirugía no tiene una estimada
+DEFAULT_DURATION_MINUTES = 120
+
+
+class ScheduledSurgery(NamedTuple):
+    inicio: datetime
+    fin: datetime
+    id: int
+    paciente_id: int
+    medico_id: int
+    quirofano: Optional[str]
+    tipo_cirugia_id: int
+    estado: str
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "paciente_id": self.paciente_id,
+            "medico_principal_id": self.medico_id,
+            "quirofano": self.quirofano,
+            "tipo_cirugia_id": self.tipo_cirugia_id,
+            "estado": self.estado,
+            "inicio": self.inicio,
+            "fin_estimado": self.fin,
+        }
+
+
+class _Track:
+    """Cirugías de un quirófano o cirujano ordenadas por (inicio, fin, id)."""
+
+    __slots__ = ('items', 'max_length')
+
+    def __init__(self):
+        self.items: List[ScheduledSurgery] = []
+        self.max_length = timedelta(0)
+
+    def add(self, surgery: ScheduledSurgery):
+        insort(self.items, surgery)
+        self.max_length = max(self.max_length, surgery.fin - surgery.inicio)
+
+    def remove(self, surgery: ScheduledSurgery):
+        pos = bisect_left(self.items, surgery)
+        if pos < len(self.items) and self.items[pos] == surgery:
+            del self.items[pos]
+
+    def overlapping(self, desde: datetime, hasta: datetime) -> List[ScheduledSurgery]:
+        # (inicio,) ordena antes que cualquier tupla con ese inicio
+        lo = bisect_left(self.items, (desde - self.max_length,))
+        hi = bisect_left(self.items, (hasta,), lo)
+        return [item for item in self.items[lo:hi] if item.fin > desde]
+
+    def gaps(self, desde: datetime, hasta: datetime) -> List[Tuple[datetime, datetime]]:
+        free, cursor = [], desde
+        for item in self.overlapping(desde, hasta):
+            if item.inicio > cursor:
+                free.append((cursor, item.inicio))
+            cursor = max(cursor, item.fin)
+        if cursor < hasta:
+            free.append((cursor, hasta))
+        return free
+
+
+class SurgeryScheduleIndex:
+    """Índice de la agenda por quirófano y por cirujano.
+
+    Se carga al arrancar y la API lo mantiene al crear cirugías y en cada
+    cambio de estado. `reserve` comprueba y ocupa el hueco bajo el mismo
+    lock, así que dos altas simultáneas en este proceso no se solapan.
+    """
+
+    def __init__(self, manager=db_manager):
+        self.manager = manager
+        self.day_start = int(os.getenv('SCHEDULE_DAY_START_HOUR', 7))
+        self.day_end = int(os.getenv('SCHEDULE_DAY_END_HOUR', 20))
+        self._lock = threading.RLock()
+        self._by_id: Dict[int, ScheduledSurgery] = {}
+        self._rooms: Dict[str, _Track] = {}
+        self._surgeons: Dict[int, _Track] = {}
+        self._pending_ids = itertools.count(-1, -1)
+        self.ready = False
+
+    # -- construcción y mantenimiento
+
+    def _tracks(self, surgery: ScheduledSurgery) -> List[_Track]:
+        tracks = [self._surgeons.setdefault(surgery.medico_id, _Track())]
+        if surgery.quirofano:
+            tracks.append(self._rooms.setdefault(surgery.quirofano, _Track()))
+        return tracks
+
+    def _add(self, surgery: ScheduledSurgery):
+        self._by_id[surgery.id] = surgery
+        for track in self._tracks(surgery):
+            track.add(surgery)
+
+    def _remove(self, surgery_id: int) -> Optional[ScheduledSurgery]:
+        surgery = self._by_id.pop(surgery_id, None)
+        if surgery is not None:
+            for track in self._tracks(surgery):
+                track.remove(surgery)
+        return surgery
+
+    def duration(self, tipo_cirugia_id: int) -> Optional[timedelta]:
+        """Duración estimada del tipo (desde `reference_data`); None si el tipo no existe."""
+        tipo = reference_data.tipo_cirugia(tipo_cirugia_id)
+        if tipo is None:
+            return None
+        return timedelta(minutes=tipo.duracion_estimada_minutos or DEFAULT_DURATION_MINUTES)
+
+    def _from_row(self, row: tuple) -> ScheduledSurgery:
+        """Fila (id, paciente_id, medico_principal_id, quirofano, tipo_cirugia_id, estado,
+        fecha_programada, fecha_inicio, fecha_fin) de `cirugias`."""
+        cirugia_id, paciente_id, medico_id, quirofano, tipo_id, estado, programada, inicio, fin = row
+        start = inicio or programada
+        end = fin or start + (self.duration(tipo_id) or timedelta(minutes=DEFAULT_DURATION_MINUTES))
+        return ScheduledSurgery(start, max(start, end), cirugia_id, paciente_id, medico_id, quirofano,
+                                tipo_id, estado)
+
+    def load(self):
+        reference_data.ensure()
+        rows = self.manager.fetchrows("""
+            SELECT id, paciente_id, medico_principal_id, quirofano, tipo_cirugia_id, estado,
+                   fecha_programada, fecha_inicio, fecha_fin
+            FROM cirugias
+            WHERE estado <> 'Cancelada'
+        """)
+        with self._lock:
+            # Las reservas provisionales (id < 0) de altas en curso se conservan
+            pending = [s for s in self._by_id.values() if s.id < 0]
+            self._by_id, self._rooms, self._surgeons = {}, {}, {}
+            for surgery in pending:
+                self._by_id[surgery.id] = surgery
+            for row in rows:
+                surgery = self._from_row(row)
+                self._by_id[surgery.id] = surgery
+            # Ordenar una vez y construir las pistas en orden es O(n log n)
+            for surgery in sorted(self._by_id.values()):
+                for track in self._tracks(surgery):
+                    track.items.append(surgery)
+                    track.max_length = max(track.max_length, surgery.fin - surgery.inicio)
+            self.ready = True
+
+    def ensure_loaded(self):
+        if not self.ready:
+            self.load()
+
+    def reserve(self, paciente_id: int, medico_id: int, quirofano: Optional[str], tipo_cirugia_id: int,
+                inicio: datetime) -> Tuple[Optional[int], List[ScheduledSurgery]]:
+        """Ocupa el hueco si no hay conflictos: devuelve (id provisional, []) o (None, conflictos).
+
+        El id provisional se cambia por el real con `confirm` o se libera con `release`.
+        """
+        fin = inicio + (self.duration(tipo_cirugia_id) or timedelta(minutes=DEFAULT_DURATION_MINUTES))
+        with self._lock:
+            conflicts = self.conflicts(medico_id, quirofano, inicio, fin)
+            if conflicts:
+                return None, conflicts
+            pending_id = next(self._pending_ids)
+            self._add(ScheduledSurgery(inicio, fin, pending_id, paciente_id, medico_id, quirofano,
+                                       tipo_cirugia_id, 'Programada'))
+            return pending_id, []
+
+    def confirm(self, pending_id: int, cirugia_id: int):
+        with self._lock:
+            surgery = self._remove(pending_id)
+            if surgery is not None:
+                self._add(surgery._replace(id=cirugia_id))
+
+    def release(self, pending_id: int):
+        with self._lock:
+            self._remove(pending_id)
+
+    def apply(self, row: tuple):
+        """Refleja una cirugía tras una escritura (misma fila que `load`); las canceladas salen del índice."""
+        with self._lock:
+            self._remove(row[0])
+            if row[5] != 'Cancelada':
+                self._add(self._from_row(row))
+
+    # -- consultas
+
+    def conflicts(self, medico_id: int, quirofano: Optional[str], desde: datetime,
+                  hasta: datetime) -> List[ScheduledSurgery]:
+        """Cirugías del mismo cirujano o quirófano que se solapan con [desde, hasta)."""
+        with self._lock:
+            found = {}
+            tracks = [self._surgeons.get(medico_id), self._rooms.get(quirofano) if quirofano else None]
+            for track in tracks:
+                if track is not None:
+                    found.update((item.id, item) for item in track.overlapping(desde, hasta))
+            return sorted(found.values())
+
+    def next_free(self, medico_id: int, quirofano: Optional[str], desde: datetime,
+                  duracion: timedelta, horizon_days: int = 14) -> Optional[datetime]:
+        """Primer inicio >= `desde` en horario de jornada con el cirujano y el quirófano libres."""
+        with self._lock:
+            day = desde.date()
+            for _ in range(horizon_days):
+                start, end = self.day_bounds(day)
+                start = max(start, desde)
+                room = self._rooms.get(quirofano) if quirofano else None
+                surgeon = self._surgeons.get(medico_id)
+                room_gaps = room.gaps(start, end) if room else [(start, end)]
+                surgeon_gaps = surgeon.gaps(start, end) if surgeon else [(start, end)]
+                # Intersección de dos listas ordenadas de huecos
+                i = j = 0
+                while i < len(room_gaps) and j < len(surgeon_gaps):
+                    lo = max(room_gaps[i][0], surgeon_gaps[j][0])
+                    hi = min(room_gaps[i][1], surgeon_gaps[j][1])
+                    if hi - lo >= duracion:
+                        return lo
+                    if room_gaps[i][1] < surgeon_gaps[j][1]:
+                        i += 1
+                    else:
+                        j += 1
+                day += timedelta(days=1)
+            return None
+
+    def day_bounds(self, day) -> Tuple[datetime, datetime]:
+        start = datetime.combine(day, datetime.min.time())
+        return start + timedelta(hours=self.day_start), start + timedelta(hours=self.day_end)
+
+    def board(self, day, quirofano: Optional[str] = None) -> List[dict]:
+        """Cirugías y huecos libres de la jornada por quirófano."""
+        start, end = self.day_bounds(day)
+        midnight = datetime.combine(day, datetime.min.time())
+        with self._lock:
+            rooms = [quirofano] if quirofano else sorted(self._rooms)
+            board = []
+            for room in rooms:
+                track = self._rooms.get(room)
+                if track is None:
+                    board.append({"quirofano": room, "cirugias": [], "libres": [
+                        {"desde": start, "hasta": end}]})
+                    continue
+                board.append({
+                    "quirofano": room,
+                    "cirugias": [item.as_dict() for item in track.overlapping(midnight, midnight + timedelta(days=1))
+                                 if item.id > 0],
+                    "libres": [{"desde": lo, "hasta": hi} for lo, hi in track.gaps(start, end)],
+                })
+            return board
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "surgeries": len(self._by_id),
+                "rooms": len(self._rooms),
+                "surgeons": len(self._surgeons),
+            }
+
+
+surgery_schedule = SurgeryScheduleIndex()
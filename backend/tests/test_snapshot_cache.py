@@ -0,0 +1,92 @@
+"""Tras una escritura, la lectura del familiar nunca devuelve el snapshot anterior."""
+import asyncio
+
+import pytest
+
+import main
+from snapshot_cache import SnapshotCache, family_cache
+
+PATIENT_ID = 7
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    family_cache.clear()
+    yield
+    family_cache.clear()
+
+
+def test_put_after_invalidate_is_rejected():
+    cache = SnapshotCache(maxsize=10, ttl_seconds=60)
+    token = cache.begin()
+    cache.invalidate(PATIENT_ID)
+    assert cache.put(PATIENT_ID, "viejo", token) is False
+    assert cache.get(PATIENT_ID) is None
+    assert cache.stats()["rejected_puts"] == 1
+
+
+def test_put_after_pruned_invalidations_is_rejected():
+    cache = SnapshotCache(maxsize=1, ttl_seconds=60)
+    token = cache.begin()
+    # Más invalidaciones que las que se recuerdan: se poda el historial
+    for key in range(10):
+        cache.invalidate(key)
+    assert cache.put(PATIENT_ID, "viejo", token) is False
+
+
+def test_read_racing_a_write_does_not_cache_stale_data(monkeypatch):
+    db = {"estado": "Programada"}
+    loads = []
+
+    async def fetch_family_data(patient_id):
+        # La lectura ve la fila vieja y la escritura hace commit antes del put
+        data = {"estado": db["estado"]}
+        loads.append(data["estado"])
+        if len(loads) == 1:
+            db["estado"] = "En_proceso"
+            main.invalidate_patient(patient_id)
+        return data
+
+    monkeypatch.setattr(main, "fetch_family_data", fetch_family_data)
+    monkeypatch.setattr(main, "build_family_snapshot", lambda data: data)
+
+    first = asyncio.run(main.load_family_snapshot(PATIENT_ID))
+    assert first == {"estado": "Programada"}
+    assert family_cache.get(PATIENT_ID) is None
+
+    second = asyncio.run(main.load_family_snapshot(PATIENT_ID))
+    assert second == {"estado": "En_proceso"}
+    assert loads == ["Programada", "En_proceso"]
+    # Ahora sí queda en caché y la siguiente lectura no consulta la base
+    assert asyncio.run(main.load_family_snapshot(PATIENT_ID)) == {"estado": "En_proceso"}
+    assert len(loads) == 2
+
+
+def test_write_after_cached_read_invalidates(monkeypatch):
+    db = {"estado": "Programada"}
+
+    async def fetch_family_data(patient_id):
+        return {"estado": db["estado"]}
+
+    monkeypatch.setattr(main, "fetch_family_data", fetch_family_data)
+    monkeypatch.setattr(main, "build_family_snapshot", lambda data: data)
+
+    assert asyncio.run(main.load_family_snapshot(PATIENT_ID)) == {"estado": "Programada"}
+    db["estado"] = "Finalizada"
+    main.invalidate_patient(PATIENT_ID)
+    assert asyncio.run(main.load_family_snapshot(PATIENT_ID)) == {"estado": "Finalizada"}
+
+
+def test_new_version_is_never_visible_with_the_old_snapshot(monkeypatch):
+    family_cache.put(PATIENT_ID, "viejo", family_cache.begin())
+    seen = []
+    bump = main.patient_versions.bump
+
+    def spy(patient_id):
+        # Un lector que ve la versión nueva en este instante ya no encuentra el snapshot viejo
+        seen.append(family_cache.get(patient_id))
+        return bump(patient_id)
+
+    monkeypatch.setattr(main.patient_versions, "bump", spy)
+    main.refresh_patient(PATIENT_ID)
+    assert seen == [None]
@@ -1,28 +1,26 @@
 # verify_db_hashes.py
-from passlib.context import CryptContext
 import mysql.connector
+from database import db_manager
+from password_hashing import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+DB = db_manager.connection_params()
 
-DB = {
-    "host": "localhost",
-    "user": "root",
-    "password": "",
-    "database": "siacom_db",
-    "port": 3306
-}
 
-conn = mysql.connector.connect(**DB)
-cur = conn.cursor()
-cur.execute("SELECT id, username, password_hash FROM usuarios")
-rows = cur.fetchall()
-for r in rows:
-    uid, username, phash = r
-    ok = False
-    try:
-        ok = pwd_context.verify("password123", phash)
-    except Exception as e:
-        print("ERROR verify:", username, e)
-    print(uid, username, " -> verify password123:", ok)
-cur.close()
-conn.close()
+def main():
+    conn = mysql.connector.connect(**DB)
+    cur = conn.cursor()
+    cur.execute("SELECT id, username, password_hash FROM usuarios")
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+
+    # Todas las verificaciones en paralelo en el pool de procesos de bcrypt
+    results = password_hasher.verify_many(("password123", phash or "") for _, _, phash in rows)
+    password_hasher.shutdown()
+    for (uid, username, _), (ok, new_hash) in zip(rows, results):
+        note = " (coste desactualizado, se re-hashea en el próximo login)" if new_hash else ""
+        print(uid, username, " -> verify password123:", ok, note)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Sequence
+
+import mysql.connector
+
+from audit_log import AuditEntry, audit_writer
+from database import PoolTimeoutError, db_manager
+
+VITALS_COLUMNS = (
+    "paciente_id", "cirugia_id", "fecha_registro", "presion_sistolica", "presion_diastolica",
+    "frecuencia_cardiaca", "temperatura", "saturacion_oxigeno", "frecuencia_respiratoria",
+    "dolor_escala", "registrado_por_medico_id",
+)
+
+INSERT_VITALS = f"""
+    INSERT INTO signos_vitales ({', '.join(VITALS_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(VITALS_COLUMNS))})
+"""
+
+INSERT_CHUNK_SIZE = 1000
+
+# Fallos de conexión o de MySQL caído: el lote vuelve al buffer y se reintenta
+TRANSIENT_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError, PoolTimeoutError)
+
+# Espera máxima entre reintentos de un lote que vuelve al buffer
+MAX_RETRY_SECONDS = 30
+
+
+class VitalsBufferFullError(Exception):
+    """El buffer de lecturas está lleno: MySQL no da abasto o no responde."""
+
+
+def insert_vitals(conn, rows: Sequence[tuple]) -> List[int]:
+    """Inserta filas en el orden de `VITALS_COLUMNS` dentro de la transacción de `conn`.
+
+    `executemany` de mysql-connector reescribe el INSERT como un único
+    INSERT multi-fila por bloque. El commit queda a cargo del llamador.
+    Devuelve los ids de las filas en el mismo orden.
+    """
+    ids: List[int] = []
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = rows[start:start + INSERT_CHUNK_SIZE]
+            cursor.executemany(INSERT_VITALS, chunk)
+            # InnoDB da ids consecutivos a un INSERT multi-fila; lastrowid es el primero
+            ids.extend(range(cursor.lastrowid, cursor.lastrowid + len(chunk)))
+    finally:
+        cursor.close()
+    return ids
+
+
+def audit_entries(rows: Sequence[tuple], ids: Sequence[int]) -> List[AuditEntry]:
+    """Entradas de auditoría de las filas que devolvió `insert_vitals`, a nombre de quien las registró."""
+    return [
+        AuditEntry("signos_vitales", signos_id, "INSERT", row[-1], nuevos=dict(zip(VITALS_COLUMNS, row)))
+        for signos_id, row in zip(ids, rows)
+    ]
+
+
+class VitalsBatcher:
+    """Buffer en proceso que agrupa lecturas de monitores y las escribe por lotes.
+
+    Se vacía cuando acumula `VITALS_BATCH_MAX_ROWS` filas o cuando la fila
+    más antigua lleva `VITALS_BATCH_MAX_DELAY_MS` esperando. `before_commit`
+    recibe la conexión y las filas dentro de la transacción del lote (p. ej.
+    para encolar eventos del outbox); `on_flush` recibe las filas escritas
+    (p. ej. para invalidar cachés por paciente). Cada lote se audita con
+    `audit_writer` como las escrituras de los endpoints.
+
+    Un lote que falla se reintenta `VITALS_BATCH_MAX_ATTEMPTS` veces; si el
+    error es de conexión vuelve al principio del buffer y se reintenta con
+    espera creciente, sin perder las lecturas aceptadas. El buffer admite
+    `VITALS_BATCH_QUEUE_SIZE` filas: con él lleno `submit` lanza
+    `VitalsBufferFullError` y el endpoint responde 503.
+    """
+
+    def __init__(self, manager=db_manager, on_flush: Optional[Callable[[List[tuple]], None]] = None,
+                 before_commit: Optional[Callable[[object, List[tuple]], None]] = None):
+        self.manager = manager
+        self.on_flush = on_flush
+        self.before_commit = before_commit
+        self.max_rows = int(os.getenv('VITALS_BATCH_MAX_ROWS', 500))
+        self.max_delay = float(os.getenv('VITALS_BATCH_MAX_DELAY_MS', 200)) / 1000
+        self.capacity = int(os.getenv('VITALS_BATCH_QUEUE_SIZE', 20000))
+        self.max_attempts = int(os.getenv('VITALS_BATCH_MAX_ATTEMPTS', 3))
+        self._rows: List[tuple] = []
+        self._oldest: Optional[float] = None
+        self._failures = 0
+        self._retry_at: Optional[float] = None
+        self._flush_requested = False
+        self._writing = False
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed_rows = 0
+        self.requeued_rows = 0
+        self.rejected_rows = 0
+        self.flush_errors = 0
+
+    def submit(self, rows: Iterable[tuple]):
+        rows = list(rows)
+        with self._cond:
+            if len(self._rows) + len(rows) > self.capacity:
+                self.rejected_rows += len(rows)
+                raise VitalsBufferFullError(f"Buffer de signos vitales lleno ({len(self._rows)} filas)")
+            self._rows.extend(rows)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._rows)
+
+    def flush(self, timeout: float = 30) -> bool:
+        """Escribe ya lo pendiente y espera a que se confirme; False si no terminó a tiempo."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            try:
+                while self._rows or self._writing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._thread is None:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flush_requested = False
+        return True
+
+    def retry_after(self) -> float:
+        """Segundos hasta el próximo intento de escritura (para Retry-After)."""
+        with self._cond:
+            if self._retry_at is None:
+                return 1.0
+            return max(1.0, self._retry_at - time.monotonic())
+
+    def _take(self) -> List[tuple]:
+        rows, self._rows, self._oldest = self._rows, [], None
+        return rows
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop:
+                    if self._retry_at is not None and time.monotonic() < self._retry_at:
+                        # MySQL acaba de fallar: se espera aunque el buffer siga creciendo
+                        self._cond.wait(self._retry_at - time.monotonic())
+                        continue
+                    if len(self._rows) >= self.max_rows or (self._flush_requested and self._rows):
+                        break
+                    if self._oldest is not None:
+                        remaining = self._oldest + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                rows = self._take()
+                stopping = self._stop
+                self._writing = bool(rows)
+            try:
+                if rows and not self._write(rows):
+                    if stopping:
+                        self.failed_rows += len(rows)
+                    else:
+                        self._requeue(rows)
+            except Exception as e:
+                # Un fallo inesperado no puede matar el hilo: el buffer se llenaría sin escritor
+                self.failed_rows += len(rows)
+                print(f"Error in vitals batcher ({len(rows)} rows): {e}")
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+            if stopping:
+                return
+
+    def _requeue(self, rows: List[tuple]):
+        with self._cond:
+            # Al principio, para que las lecturas se escriban en el orden en que llegaron
+            self._rows[:0] = rows
+            self._oldest = time.monotonic()
+            self._failures += 1
+            self._retry_at = time.monotonic() + min(2 ** (self._failures - 1), MAX_RETRY_SECONDS)
+            self.requeued_rows += len(rows)
+
+    def _write(self, rows: List[tuple]) -> bool:
+        """Escribe el lote; False si falló por un error transitorio y hay que volver a intentarlo."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with self.manager.connection() as conn:
+                    ids = insert_vitals(conn, rows)
+                    if self.before_commit:
+                        self.before_commit(conn, rows)
+                    audit = audit_writer.stage(conn, audit_entries(rows, ids))
+                    conn.commit()
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    time.sleep(min(0.1 * 2 ** attempt, 2))
+                    continue
+                print(f"Error writing vitals batch ({len(rows)} rows): {e}")
+                if isinstance(e, TRANSIENT_ERRORS):
+                    return False
+                # Error de datos o de código: reintentarlo bloquearía el buffer
+                self.failed_rows += len(rows)
+                return True
+            break
+        with self._cond:
+            self._failures = 0
+            self._retry_at = None
+        self.rows_written += len(rows)
+        self.flushes += 1
+        audit_writer.record(audit)
+        if self.on_flush:
+            try:
+                self.on_flush(rows)
+            except Exception as e:
+                # Las filas ya están confirmadas: solo se pierden los efectos posteriores
+                self.flush_errors += 1
+                print(f"Error after writing vitals batch ({len(rows)} rows): {e}")
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="vitals-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Vacía lo pendiente (un último intento si MySQL falla) y detiene el hilo."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "failed_rows": self.failed_rows,
+            "requeued_rows": self.requeued_rows,
+            "rejected_rows": self.rejected_rows,
+            "flush_errors": self.flush_errors,
+            "capacity": self.capacity,
+            "max_rows": self.max_rows,
+            "max_delay_ms": self.max_delay * 1000,
+        }
+
+
+vitals_batcher = VitalsBatcher()
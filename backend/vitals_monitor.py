@@ -0,0 +1,287 @@
+"""Detección en streaming de alteraciones en los signos vitales.
+
+Cada paciente con lecturas recientes tiene un slot en arreglos numpy: un
+buffer circular con sus últimas `VITALS_MONITOR_WINDOW` lecturas y las sumas
+por señal de la ventana, así que la media de referencia se mantiene en O(1)
+por lectura sin volver a consultar `signos_vitales`. Las reglas de umbral y
+de tendencia se evalúan vectorizadas sobre cada lote de lecturas.
+
+Una regla que se cumple genera una alerta por paciente como máximo cada
+`VITALS_ALERT_COOLDOWN_MINUTES`; la API la encola en el outbox, que la
+entrega como notificación `complicacion` a los contactos del paciente.
+
+Las lecturas se evalúan antes del commit con `evaluate`, que no modifica el
+estado, y se añaden a las ventanas con `observe` solo tras el commit: si la
+escritura falla no entran en la referencia ni gastan el cooldown.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from database import db_manager
+
+# Señales del buffer y su posición en las filas de VITALS_COLUMNS
+SIGNALS = ('presion_sistolica', 'presion_diastolica', 'frecuencia_cardiaca', 'temperatura',
+           'saturacion_oxigeno', 'frecuencia_respiratoria')
+SIGNAL_COLUMNS = (3, 4, 5, 6, 7, 8)
+SISTOLICA, DIASTOLICA, FC, TEMPERATURA, SATURACION, FR = range(len(SIGNALS))
+
+# Lecturas previas necesarias para evaluar reglas de tendencia
+MIN_BASELINE = 3
+
+
+class Rule(NamedTuple):
+    codigo: str
+    signal: int
+    # above/below: umbral absoluto; rise/drop: diferencia con la media de la ventana
+    kind: str
+    threshold: float
+    titulo: str
+    mensaje: str
+
+
+RULES = (
+    Rule('spo2_baja', SATURACION, 'below', 90, 'Saturación de oxígeno baja',
+         'Saturación de oxígeno de {valor:.0f} %.'),
+    Rule('spo2_descenso', SATURACION, 'drop', 4, 'Descenso de la saturación de oxígeno',
+         'Saturación de oxígeno de {valor:.0f} %, {delta:.0f} puntos por debajo de su valor reciente.'),
+    Rule('taquicardia', FC, 'above', 120, 'Taquicardia',
+         'Frecuencia cardíaca de {valor:.0f} lpm.'),
+    Rule('fc_aumento', FC, 'rise', 25, 'Aumento de la frecuencia cardíaca',
+         'Frecuencia cardíaca de {valor:.0f} lpm, {delta:.0f} por encima de su valor reciente.'),
+    Rule('fiebre', TEMPERATURA, 'above', 38.5, 'Fiebre',
+         'Temperatura de {valor:.1f} °C.'),
+    Rule('hipertension', SISTOLICA, 'above', 180, 'Presión arterial alta',
+         'Presión sistólica de {valor:.0f} mmHg.'),
+    Rule('hipotension', SISTOLICA, 'below', 90, 'Presión arterial baja',
+         'Presión sistólica de {valor:.0f} mmHg.'),
+    Rule('diastolica_alta', DIASTOLICA, 'above', 110, 'Presión arterial alta',
+         'Presión diastólica de {valor:.0f} mmHg.'),
+    Rule('pa_descenso', SISTOLICA, 'drop', 40, 'Descenso de la presión arterial',
+         'Presión sistólica de {valor:.0f} mmHg, {delta:.0f} por debajo de su valor reciente.'),
+)
+AVISO_FAMILIA = ' El equipo médico fue alertado.'
+
+
+def _float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class VitalsMonitor:
+    # Arreglos con una fila por slot
+    STATE = ('_patients', '_buffer', '_pos', '_sums', '_counts', '_last_seen', '_last_alert', '_active')
+
+    def __init__(self, manager=db_manager, capacity: int = 1024):
+        self.manager = manager
+        self.window = int(os.getenv('VITALS_MONITOR_WINDOW', 12))
+        self.cooldown = float(os.getenv('VITALS_ALERT_COOLDOWN_MINUTES', 30)) * 60
+        self.warmup_hours = float(os.getenv('VITALS_MONITOR_WARMUP_HOURS', 6))
+        # Los slots sin lecturas en este tiempo se reutilizan
+        self.idle_seconds = float(os.getenv('VITALS_MONITOR_IDLE_HOURS', 24)) * 3600
+        self._lock = threading.Lock()
+        self._slots: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._allocate(capacity)
+        self._latest = -np.inf
+        self.readings = 0
+        self.alerts_by_rule = {rule.codigo: 0 for rule in RULES}
+        self.suppressed = 0
+
+    def _allocate(self, capacity: int):
+        self._patients = np.zeros(capacity, dtype=np.int64)
+        self._buffer = np.full((capacity, self.window, len(SIGNALS)), np.nan)
+        self._pos = np.zeros(capacity, dtype=np.int64)
+        self._sums = np.zeros((capacity, len(SIGNALS)))
+        self._counts = np.zeros((capacity, len(SIGNALS)), dtype=np.int64)
+        self._last_seen = np.full(capacity, -np.inf)
+        self._last_alert = np.full((capacity, len(RULES)), -np.inf)
+        self._active = np.zeros((capacity, len(RULES)), dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def _grow(self):
+        old = [getattr(self, name) for name in self.STATE]
+        used = len(old[0])
+        self._allocate(used * 2)
+        for name, previous in zip(self.STATE, old):
+            getattr(self, name)[:used] = previous
+        self._free = list(range(used * 2 - 1, used - 1, -1))
+
+    def _reclaim_idle(self):
+        idle = np.flatnonzero(self._last_seen < self._latest - self.idle_seconds)
+        in_use = set(self._slots.values())
+        for slot in idle.tolist():
+            if slot in in_use:
+                del self._slots[int(self._patients[slot])]
+                self._reset_slot(slot)
+                self._free.append(slot)
+
+    def _reset_slot(self, slot: int):
+        self._buffer[slot] = np.nan
+        self._pos[slot] = 0
+        self._sums[slot] = 0
+        self._counts[slot] = 0
+        self._last_seen[slot] = -np.inf
+        self._last_alert[slot] = -np.inf
+        self._active[slot] = False
+
+    def _slot(self, paciente_id: int) -> int:
+        slot = self._slots.get(paciente_id)
+        if slot is None:
+            if not self._free:
+                self._reclaim_idle()
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._patients[slot] = paciente_id
+            # Un slot recién asignado no cuenta como inactivo para _reclaim_idle
+            self._last_seen[slot] = self._latest
+            self._slots[paciente_id] = slot
+        return slot
+
+    # -- evaluación
+
+    def evaluate(self, rows: Sequence[tuple]) -> List[dict]:
+        """Alertas que generarían las lecturas, sin modificar ventanas ni cooldowns."""
+        if not rows:
+            return []
+        patient_ids = list(dict.fromkeys(row[0] for row in rows))
+        scratch = VitalsMonitor(manager=None, capacity=len(patient_ids))
+        scratch.window, scratch.cooldown = self.window, self.cooldown
+        scratch._allocate(len(patient_ids))
+        with self._lock:
+            scratch._latest = self._latest
+            for paciente_id in patient_ids:
+                local = scratch._slot(paciente_id)
+                slot = self._slots.get(paciente_id)
+                if slot is not None:
+                    for name in self.STATE[1:]:
+                        getattr(scratch, name)[local] = getattr(self, name)[slot]
+        return scratch.observe(rows)
+
+    def observe(self, rows: Sequence[tuple], emit: bool = True) -> List[dict]:
+        """Añade lecturas (filas en el orden de VITALS_COLUMNS) y devuelve las alertas nuevas.
+
+        Llamar tras el commit de las lecturas; `emit=False` solo las acumula.
+        """
+        if not rows:
+            return []
+        timestamps = np.array([row[2].timestamp() for row in rows])
+        values = np.array([[_float(row[column]) for column in SIGNAL_COLUMNS] for row in rows])
+        alerts = []
+        with self._lock:
+            slots = np.array([self._slot(row[0]) for row in rows], dtype=np.int64)
+            # Un paciente puede tener varias lecturas en el lote: se procesan por
+            # rondas (la k-ésima lectura de cada paciente, en orden de fecha)
+            order = np.lexsort((timestamps, slots))
+            sorted_slots = slots[order]
+            starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+            rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+            by_round = np.argsort(rank, kind='stable')
+            bounds = np.searchsorted(rank[by_round], np.arange(int(rank.max()) + 2))
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                selected = order[by_round[lo:hi]]
+                alerts.extend(self._step(selected, slots[selected], values[selected],
+                                         timestamps[selected], rows, emit))
+            self._latest = max(self._latest, float(timestamps.max()))
+            self.readings += len(rows)
+        return alerts
+
+    def _step(self, selected, slots, values, timestamps, rows, emit: bool) -> List[dict]:
+        counts = self._counts[slots]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            baseline = self._sums[slots] / counts
+        conditions = np.zeros((len(slots), len(RULES)), dtype=bool)
+        for index, rule in enumerate(RULES):
+            value = values[:, rule.signal]
+            if rule.kind == 'above':
+                conditions[:, index] = value >= rule.threshold
+            elif rule.kind == 'below':
+                conditions[:, index] = value < rule.threshold
+            else:
+                delta = value - baseline[:, rule.signal] if rule.kind == 'rise' else baseline[:, rule.signal] - value
+                conditions[:, index] = (counts[:, rule.signal] >= MIN_BASELINE) & (delta >= rule.threshold)
+
+        # Ventana circular: la lectura nueva sustituye a la más antigua
+        positions = self._pos[slots]
+        evicted = self._buffer[slots, positions]
+        present = ~np.isnan(values)
+        self._sums[slots] += np.nan_to_num(values) - np.nan_to_num(evicted)
+        self._counts[slots] += present.astype(np.int64) - (~np.isnan(evicted)).astype(np.int64)
+        self._buffer[slots, positions] = values
+        self._pos[slots] = (positions + 1) % self.window
+        self._last_seen[slots] = np.maximum(self._last_seen[slots], timestamps)
+        self._active[slots] = conditions
+
+        due = conditions & (timestamps[:, None] - self._last_alert[slots] >= self.cooldown)
+        self.suppressed += int(conditions.sum() - due.sum())
+        if not due.any():
+            return []
+        last_alert = self._last_alert[slots]
+        last_alert[due] = timestamps[np.nonzero(due)[0]]
+        self._last_alert[slots] = last_alert
+
+        alerts = []
+        for item, rule_index in zip(*np.nonzero(due)):
+            rule, row = RULES[rule_index], rows[selected[item]]
+            valor = float(values[item, rule.signal])
+            referencia = float(baseline[item, rule.signal])
+            if not emit:
+                continue
+            self.alerts_by_rule[rule.codigo] += 1
+            delta = abs(valor - referencia) if not np.isnan(referencia) else 0.0
+            alerts.append({
+                "paciente_id": row[0],
+                "cirugia_id": row[1],
+                "regla": rule.codigo,
+                "titulo": rule.titulo,
+                "mensaje": rule.mensaje.format(valor=valor, delta=delta) + AVISO_FAMILIA,
+                "valor": valor,
+                "referencia": None if np.isnan(referencia) else round(referencia, 2),
+                "fecha": row[2].isoformat(),
+                # Misma clave para la misma regla y paciente dentro de una ventana de cooldown
+                "clave": f"signos-{row[0]}-{rule.codigo}-{int(timestamps[item] // self.cooldown)}",
+            })
+        return alerts
+
+    # -- estado y carga inicial
+
+    def load(self):
+        """Llena las ventanas con las lecturas recientes, sin generar alertas."""
+        since = datetime.now() - timedelta(hours=self.warmup_hours)
+        rows = self.manager.fetchrows("""
+            SELECT paciente_id, cirugia_id, fecha_registro, presion_sistolica, presion_diastolica,
+                   frecuencia_cardiaca, temperatura, saturacion_oxigeno, frecuencia_respiratoria
+            FROM signos_vitales
+            WHERE fecha_registro >= %s
+            ORDER BY fecha_registro
+        """, (since,))
+        # Las alertas de estas lecturas ya las emitió el proceso anterior; el
+        # cooldown queda registrado para no repetirlas
+        self.observe(rows, emit=False)
+
+    def critical_counts(self, max_age_seconds: float = 6 * 3600) -> Dict[str, int]:
+        """Pacientes cuya última lectura (de las últimas `max_age_seconds`) cumple cada regla."""
+        with self._lock:
+            recent = self._last_seen >= self._latest - max_age_seconds
+            active = self._active & recent[:, None]
+            counts = {rule.codigo: int(total) for rule, total in zip(RULES, active.sum(axis=0))}
+            counts['pacientes'] = int(active.any(axis=1).sum())
+        return counts
+
+    def stats(self) -> dict:
+        with self._lock:
+            tracked, capacity = len(self._slots), len(self._patients)
+        return {
+            "readings": self.readings,
+            "patients_tracked": tracked,
+            "capacity": capacity,
+            "suppressed_alerts": self.suppressed,
+            "alerts": dict(self.alerts_by_rule),
+            "critical": self.critical_counts(),
+        }
+
+
+vitals_monitor = VitalsMonitor()
@@ -0,0 +1,227 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retention import cold_archive
+
+BUCKET_WIDTHS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+METRICS = (
+    "presion_sistolica", "presion_diastolica", "frecuencia_cardiaca", "temperatura",
+    "saturacion_oxigeno", "frecuencia_respiratoria", "dolor_escala",
+)
+
+MAX_BUCKETS = 10000
+
+# Lecturas del rango en MySQL; `cirugia` es '' o `CIRUGIA_FILTER`
+SELECT_READINGS = f"""
+    SELECT fecha_registro, {', '.join(METRICS)}
+    FROM signos_vitales
+    WHERE paciente_id = %s AND fecha_registro >= %s AND fecha_registro < %s
+    {{cirugia}}
+    ORDER BY fecha_registro
+"""
+
+CIRUGIA_FILTER = "AND cirugia_id = %s"
+
+
+def to_epoch(value: datetime) -> int:
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+
+def from_epoch(seconds: int) -> datetime:
+    return np.datetime64(int(seconds), 's').astype(datetime)
+
+
+def columns_from_rows(rows: Sequence[tuple]) -> Tuple[np.ndarray, np.ndarray]:
+    """Convierte filas (fecha_registro, *METRICS) en un vector de epoch y una matriz float.
+
+    Los NULL quedan como NaN y los DECIMAL se convierten a float.
+    """
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(METRICS)), dtype=np.float64)
+    timestamps = np.array([row[0] for row in rows], dtype='datetime64[s]').astype(np.int64)
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+    return timestamps, values
+
+
+def aggregate(timestamps: np.ndarray, values: np.ndarray, width: int) -> List[dict]:
+    """min/max/media/último por métrica y bucket; `timestamps` debe venir ordenado."""
+    if timestamps.size == 0:
+        return []
+    bucket_ids = timestamps // width
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    mins = np.fmin.reduceat(values, starts, axis=0)
+    maxs = np.fmax.reduceat(values, starts, axis=0)
+    positions = np.where(valid, np.arange(len(values))[:, None], -1)
+    last_positions = np.maximum.reduceat(positions, starts, axis=0)
+    lasts = np.where(
+        last_positions >= 0,
+        np.take_along_axis(values, np.maximum(last_positions, 0), axis=0),
+        np.nan,
+    )
+    rows_per_bucket = np.diff(np.r_[starts, len(timestamps)])
+
+    buckets = []
+    for b, start in enumerate(starts):
+        metricas = {}
+        for m, name in enumerate(METRICS):
+            if counts[b, m]:
+                metricas[name] = {
+                    "min": float(mins[b, m]),
+                    "max": float(maxs[b, m]),
+                    "mean": round(float(means[b, m]), 2),
+                    "last": float(lasts[b, m]),
+                }
+            else:
+                metricas[name] = None
+        buckets.append({
+            "inicio": int(bucket_ids[start] * width),
+            "registros": int(rows_per_bucket[b]),
+            "metricas": metricas,
+        })
+    return buckets
+
+
+class RollupSeries:
+    """Buckets cerrados ya calculados para un (paciente, cirugía, ancho)."""
+
+    def __init__(self, covered_from: int):
+        self.covered_from = covered_from
+        self.covered_to = covered_from
+        self.buckets: Dict[int, dict] = {}
+
+
+class RollupCache:
+    """Caché de buckets cerrados: las lecturas repetidas solo recalculan el bucket abierto.
+
+    Cada serie cubre un rango contiguo [covered_from, covered_to) de buckets
+    cerrados. Una inserción con fecha dentro de ese rango (lotes de monitores
+    con `fecha_registro` explícita) recorta la cobertura desde ese bucket.
+
+    Como en `SnapshotCache`, quien calcula pide un `token` con `begin()` antes
+    de consultar y `store()` descarta el resultado si el paciente se invalidó
+    después: la consulta pudo leer un bucket antes de la inserción.
+    """
+
+    def __init__(self, max_series: int):
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series: "OrderedDict[tuple, RollupSeries]" = OrderedDict()
+        self._seq = 0
+        self._invalidated_at: Dict[int, int] = {}
+        # Tokens anteriores a `_floor` se rechazan (tras podar `_invalidated_at`)
+        self._floor = 0
+        self.rejected_stores = 0
+
+    def begin(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def plan(self, key: tuple, desde: int, hasta: int) -> Tuple[int, List[dict]]:
+        """Buckets ya calculados desde `desde` e inicio desde el que hay que consultar MySQL."""
+        with self._lock:
+            series = self._series.get(key)
+            if series is None or not (series.covered_from <= desde <= series.covered_to):
+                return desde, []
+            self._series.move_to_end(key)
+            fetch_from = series.covered_to
+            limit = min(fetch_from, hasta)
+            cached = [series.buckets[s] for s in sorted(series.buckets) if desde <= s < limit]
+            return fetch_from, cached
+
+    def store(self, key: tuple, token: int, fetch_from: int, closed_until: int, buckets: List[dict]) -> bool:
+        with self._lock:
+            if token < self._floor or self._invalidated_at.get(key[0], 0) > token:
+                self.rejected_stores += 1
+                return False
+            series = self._series.get(key)
+            if series is None or series.covered_to != fetch_from:
+                series = RollupSeries(fetch_from)
+                self._series[key] = series
+            for bucket in buckets:
+                if bucket["inicio"] < closed_until:
+                    series.buckets[bucket["inicio"]] = bucket
+            series.covered_to = max(series.covered_to, closed_until)
+            self._series.move_to_end(key)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+            return True
+
+    def invalidate(self, paciente_id: int, cirugia_id: Optional[int], fecha: datetime):
+        ts = to_epoch(fecha)
+        with self._lock:
+            self._seq += 1
+            self._invalidated_at[paciente_id] = self._seq
+            if len(self._invalidated_at) > self.max_series * 4:
+                self._invalidated_at.clear()
+                self._floor = self._seq
+            for (pid, cid, width), series in self._series.items():
+                if pid != paciente_id or (cid is not None and cid != cirugia_id):
+                    continue
+                if ts < series.covered_to:
+                    cut = max(series.covered_from, ts // width * width)
+                    series.covered_to = cut
+                    for start in [s for s in series.buckets if s >= cut]:
+                        del series.buckets[start]
+
+    def clear(self):
+        with self._lock:
+            self._seq += 1
+            self._series.clear()
+            self._invalidated_at.clear()
+            self._floor = self._seq
+
+
+rollup_cache = RollupCache(max_series=int(os.getenv('ROLLUP_CACHE_SERIES', 1024)))
+
+
+async def vitals_rollup(manager, paciente_id: int, cirugia_id: Optional[int], bucket: str,
+                        desde: datetime, hasta: datetime, now: Optional[datetime] = None) -> List[dict]:
+    width = BUCKET_WIDTHS[bucket]
+    start = to_epoch(desde) // width * width
+    end = -(-to_epoch(hasta) // width) * width
+    if end <= start:
+        raise ValueError("El rango 'desde'/'hasta' está vacío")
+    if (end - start) // width > MAX_BUCKETS:
+        raise ValueError(f"El rango pedido supera {MAX_BUCKETS} buckets de {bucket}")
+    closed_until = min(end, to_epoch(now or datetime.now()) // width * width)
+    key = (paciente_id, cirugia_id, width)
+
+    token = rollup_cache.begin()
+    fetch_from, cached = rollup_cache.plan(key, start, end)
+    # Lo anterior a la marca de agua del archivo ya no está en MySQL: se lee de disco
+    watermark = cold_archive.watermark('signos_vitales')
+    db_from = fetch_from
+    archived = None
+    if watermark is not None and fetch_from < to_epoch(watermark):
+        db_from = min(max(fetch_from, to_epoch(watermark)), end)
+        archived = await asyncio.to_thread(
+            cold_archive.read_vitals, paciente_id, cirugia_id, fetch_from, db_from, METRICS)
+    query = SELECT_READINGS.format(cirugia=CIRUGIA_FILTER if cirugia_id is not None else '')
+    params = [paciente_id, from_epoch(db_from), from_epoch(end)]
+    if cirugia_id is not None:
+        params.append(cirugia_id)
+
+    fresh = []
+    if fetch_from < end:
+        rows = await manager.fetchrows(query, tuple(params)) if db_from < end else []
+        timestamps, values = columns_from_rows(rows)
+        if archived is not None:
+            timestamps = np.concatenate([archived[0], timestamps])
+            values = np.concatenate([archived[1], values])
+        fresh = aggregate(timestamps, values, width)
+        rollup_cache.store(key, token, fetch_from, closed_until, fresh)
+
+    return [dict(b, inicio=from_epoch(b["inicio"])) for b in cached + fresh]
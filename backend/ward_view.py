@@ -0,0 +1,146 @@
+"""Vista de sala: el último estado de varios pacientes en una sola consulta.
+
+Para cada paciente pedido trae los últimos signos vitales, la última
+evolución y la cirugía actual. Cada sección es un `LEFT JOIN LATERAL` con
+`ORDER BY ... LIMIT 1` sobre el índice (paciente_id, fecha), así que el coste
+es una búsqueda en el índice por paciente y sección y el número de consultas
+no crece con el tamaño de la sala.
+
+`fields` elige secciones (`signos_vitales`) o columnas sueltas
+(`evolucion.estado_general`); el `id` de cada sección siempre se incluye.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from reference_data import reference_data
+
+MAX_WARD_PATIENTS = 100
+
+# Estados en los que la cirugía se considera en curso y gana a la más reciente
+ACTIVE_SURGERY_STATES = ('Pre-operatorio', 'En_proceso', 'Post-operatorio')
+
+# sección -> (tabla, alias, columnas permitidas, ORDER BY de la última fila)
+SECTIONS = {
+    "signos_vitales": (
+        "signos_vitales", "sv",
+        ("id", "cirugia_id", "fecha_registro", "presion_sistolica", "presion_diastolica",
+         "frecuencia_cardiaca", "temperatura", "saturacion_oxigeno", "frecuencia_respiratoria",
+         "dolor_escala"),
+        "sv.fecha_registro DESC, sv.id DESC",
+    ),
+    "evolucion": (
+        "evoluciones_clinicas", "ev",
+        ("id", "cirugia_id", "fecha_registro", "estado_general", "descripcion", "plan_tratamiento",
+         "proxima_evaluacion", "medico_id"),
+        "ev.fecha_registro DESC, ev.id DESC",
+    ),
+    "cirugia": (
+        "cirugias", "cx",
+        ("id", "estado", "fecha_programada", "fecha_inicio", "fecha_fin", "quirofano",
+         "tipo_cirugia_id", "medico_principal_id"),
+        "cx.estado IN ({}) DESC, cx.fecha_programada DESC, cx.id DESC".format(
+            ', '.join(f"'{estado}'" for estado in ACTIVE_SURGERY_STATES)),
+    ),
+}
+
+# Nombres que se completan desde la caché de referencia: (sección, nombre, columna con el id, función)
+LOOKUPS = (
+    ("evolucion", "medico_nombre", "medico_id", reference_data.medico_nombre),
+    ("cirugia", "medico_nombre", "medico_principal_id", reference_data.medico_nombre),
+    ("cirugia", "tipo_cirugia_nombre", "tipo_cirugia_id", reference_data.tipo_cirugia_nombre),
+)
+
+
+def parse_ward_ids(ids: str) -> List[int]:
+    """Ids separados por comas, sin repetir y en el orden pedido."""
+    try:
+        parsed = [int(part) for part in ids.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError("ids debe ser una lista de enteros separados por comas")
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed:
+        raise ValueError("Indique al menos un paciente")
+    if len(parsed) > MAX_WARD_PATIENTS:
+        raise ValueError(f"Máximo {MAX_WARD_PATIENTS} pacientes por petición")
+    return parsed
+
+
+def parse_ward_fields(fields: Optional[str]) -> Dict[str, List[str]]:
+    """Secciones y columnas pedidas (`seccion` o `seccion.columna`); todas si no se indica."""
+    if not fields:
+        return {name: list(section[2]) for name, section in SECTIONS.items()}
+    selected: Dict[str, List[str]] = {}
+    unknown = []
+    for token in (f.strip() for f in fields.split(',')):
+        if not token:
+            continue
+        name, _, column = token.partition('.')
+        if name not in SECTIONS or (column and column not in SECTIONS[name][2]):
+            unknown.append(token)
+            continue
+        columns = selected.setdefault(name, ['id'])
+        columns.extend(SECTIONS[name][2] if not column else [column])
+    if unknown:
+        raise ValueError(f"Campos no permitidos: {', '.join(unknown)}")
+    return {name: list(dict.fromkeys(columns)) for name, columns in selected.items()}
+
+
+def ward_query(patient_count: int, selected: Dict[str, List[str]]) -> str:
+    """Consulta única: pacientes activos más un LATERAL por sección pedida."""
+    select = ["p.id", "p.nombre", "p.apellido"]
+    joins = []
+    for name, columns in selected.items():
+        table, alias, _, order = SECTIONS[name]
+        select.extend(f"{alias}.{column} AS `{name}.{column}`" for column in columns)
+        joins.append(f"""
+            LEFT JOIN LATERAL (
+                SELECT {', '.join(f'{alias}.{column}' for column in columns)}
+                FROM {table} {alias}
+                WHERE {alias}.paciente_id = p.id
+                ORDER BY {order}
+                LIMIT 1
+            ) {alias} ON TRUE""")
+    return f"""
+        SELECT {', '.join(select)}
+        FROM pacientes p{''.join(joins)}
+        WHERE p.id IN ({', '.join(['%s'] * patient_count)}) AND p.activo = TRUE
+    """
+
+
+def reference_ids(rows: Sequence[dict]) -> Tuple[List[int], List[int]]:
+    """Ids de médicos y tipos de cirugía de la respuesta, para `reference_data.missing`."""
+    medicos, tipos = [], []
+    for row in rows:
+        for section in ("evolucion", "cirugia"):
+            values = row.get(section) or {}
+            medicos.extend(values[key] for key in ("medico_id", "medico_principal_id") if key in values)
+            if "tipo_cirugia_id" in values:
+                tipos.append(values["tipo_cirugia_id"])
+    return medicos, tipos
+
+
+def assemble_ward(description: Sequence[tuple], rows: Sequence[tuple], selected: Dict[str, List[str]]) -> Dict[int, dict]:
+    """Filas planas -> {paciente_id: {id, nombre, apellido, seccion: {...} | None}}."""
+    names = [column[0] for column in description]
+    positions: Dict[str, List[Tuple[str, int]]] = {name: [] for name in selected}
+    for index, name in enumerate(names):
+        section, dot, column = name.partition('.')
+        if dot:
+            positions[section].append((column, index))
+    patients = {}
+    for row in rows:
+        patient = {"id": row[0], "nombre": row[1], "apellido": row[2]}
+        for section, columns in positions.items():
+            values = {column: row[index] for column, index in columns}
+            # Sin fila en el LATERAL el id de la sección llega NULL
+            patient[section] = values if values["id"] is not None else None
+        patients[row[0]] = patient
+    return patients
+
+
+def add_reference_names(patients: Sequence[dict]):
+    """Completa los nombres de médico y tipo de cirugía desde la caché de referencia."""
+    for patient in patients:
+        for section, name, source, lookup in LOOKUPS:
+            values = patient.get(section)
+            if values and source in values:
+                values[name] = lookup(values[source])
@@ -221,288 +221,9 @@ INSERT INTO medicos (usuario_id, nombre, apellido, cedula, especialidad_id, tele
 (2, 'Ana', 'Rodríguez', '87654321', 2, '3009876543', 'RM002'),
 (3, 'Miguel', 'García', '11223344', 3, '3005566778', 'RM003');
 
--- Script para generar datos masivos de pacientes (2000+ registros)
-DELIMITER //
-CREATE PROCEDURE GenerarPacientes()
-BEGIN
-    DECLARE i INT DEFAULT 1;
-    DECLARE nombre_var VARCHAR(100);
-    DECLARE apellido_var VARCHAR(100);
-    DECLARE cedula_var VARCHAR(20);
-    DECLARE fecha_nac DATE;
-    DECLARE sexo_var CHAR(1);
-    
-    WHILE i <= 2000 DO
-        SET nombre_var = CASE (i % 20)
-            WHEN 0 THEN 'Juan'
-            WHEN 1 THEN 'María'
-            WHEN 2 THEN 'Carlos'
-            WHEN 3 THEN 'Ana'
-            WHEN 4 THEN 'Luis'
-            WHEN 5 THEN 'Carmen'
-            WHEN 6 THEN 'José'
-            WHEN 7 THEN 'Elena'
-            WHEN 8 THEN 'Miguel'
-            WHEN 9 THEN 'Laura'
-            WHEN 10 THEN 'Antonio'
-            WHEN 11 THEN 'Isabel'
-            WHEN 12 THEN 'Francisco'
-            WHEN 13 THEN 'Rosa'
-            WHEN 14 THEN 'David'
-            WHEN 15 THEN 'Patricia'
-            WHEN 16 THEN 'Roberto'
-            WHEN 17 THEN 'Marta'
-            WHEN 18 THEN 'Fernando'
-            ELSE 'Lucía'
-        END;
-        
-        SET apellido_var = CASE (i % 15)
-            WHEN 0 THEN 'González'
-            WHEN 1 THEN 'Rodríguez'
-            WHEN 2 THEN 'García'
-            WHEN 3 THEN 'Martínez'
-            WHEN 4 THEN 'López'
-            WHEN 5 THEN 'Hernández'
-            WHEN 6 THEN 'Pérez'
-            WHEN 7 THEN 'Sánchez'
-            WHEN 8 THEN 'Ramírez'
-            WHEN 9 THEN 'Cruz'
-            WHEN 10 THEN 'Torres'
-            WHEN 11 THEN 'Flores'
-            WHEN 12 THEN 'Gómez'
-            WHEN 13 THEN 'Díaz'
-            ELSE 'Vargas'
-        END;
-        
-        SET cedula_var = CONCAT('100', LPAD(i, 6, '0'));
-        SET fecha_nac = DATE_SUB(CURDATE(), INTERVAL (FLOOR(RAND() * 60) + 20) YEAR);
-        SET sexo_var = IF(i % 2 = 0, 'M', 'F');
-        
-        INSERT INTO pacientes (nombre, apellido, cedula, fecha_nacimiento, sexo, telefono, eps, tipo_sangre)
-        VALUES (
-            nombre_var, 
-            apellido_var, 
-            cedula_var, 
-            fecha_nac, 
-            sexo_var,
-            CONCAT('300', FLOOR(RAND() * 9000000) + 1000000),
-            CASE (i % 5) 
-                WHEN 0 THEN 'EPS SURA'
-                WHEN 1 THEN 'Nueva EPS'
-                WHEN 2 THEN 'Sanitas'
-                WHEN 3 THEN 'Compensar'
-                ELSE 'Salud Total'
-            END,
-            CASE (i % 8)
-                WHEN 0 THEN 'O+'
-                WHEN 1 THEN 'A+'
-                WHEN 2 THEN 'B+'
-                WHEN 3 THEN 'AB+'
-                WHEN 4 THEN 'O-'
-                WHEN 5 THEN 'A-'
-                WHEN 6 THEN 'B-'
-                ELSE 'AB-'
-            END
-        );
-        
-        SET i = i + 1;
-    END WHILE;
-END //
-DELIMITER ;
-
-CALL GenerarPacientes();
-DROP PROCEDURE GenerarPacientes;
-
--- Script para generar contactos (2000+ registros)
-DELIMITER //
-CREATE PROCEDURE GenerarContactos()
-BEGIN
-    DECLARE i INT DEFAULT 1;
-    DECLARE max_paciente_id INT;
-    
-    SELECT MAX(id) INTO max_paciente_id FROM pacientes;
-    
-    WHILE i <= 2000 DO
-        INSERT INTO contactos (paciente_id, nombre, apellido, relacion, telefono, email, es_contacto_principal, notificaciones_activas)
-        VALUES (
-            (i % max_paciente_id) + 1,
-            CASE (i % 10)
-                WHEN 0 THEN 'Pedro'
-                WHEN 1 THEN 'Sandra'
-                WHEN 2 THEN 'Ricardo'
-                WHEN 3 THEN 'Mónica'
-                WHEN 4 THEN 'Andrés'
-                WHEN 5 THEN 'Claudia'
-                WHEN 6 THEN 'Javier'
-                WHEN 7 THEN 'Diana'
-                WHEN 8 THEN 'Sergio'
-                ELSE 'Alejandra'
-            END,
-            CASE (i % 8)
-                WHEN 0 THEN 'Morales'
-                WHEN 1 THEN 'Jiménez'
-                WHEN 2 THEN 'Ruiz'
-                WHEN 3 THEN 'Herrera'
-                WHEN 4 THEN 'Medina'
-                WHEN 5 THEN 'Castro'
-                WHEN 6 THEN 'Ortiz'
-                ELSE 'Ramos'
-            END,
-            CASE (i % 6)
-                WHEN 0 THEN 'Hijo/a'
-                WHEN 1 THEN 'Esposo/a'
-                WHEN 2 THEN 'Padre/Madre'
-                WHEN 3 THEN 'Hermano/a'
-                WHEN 4 THEN 'Abuelo/a'
-                ELSE 'Primo/a'
-            END,
-            CONCAT('300', FLOOR(RAND() * 9000000) + 1000000),
-            CONCAT('contacto', i, '@email.com'),
-            IF(i % 3 = 0, TRUE, FALSE),
-            TRUE
-        );
-        
-        SET i = i + 1;
-    END WHILE;
-END //
-DELIMITER ;
-
-CALL GenerarContactos();
-DROP PROCEDURE GenerarContactos;
-
--- Script para generar cirugías (2000+ registros)
-DELIMITER //
-CREATE PROCEDURE GenerarCirugias()
-BEGIN
-    DECLARE i INT DEFAULT 1;
-    DECLARE max_paciente_id INT;
-    DECLARE max_medico_id INT;
-    DECLARE fecha_prog DATETIME;
-    
-    SELECT MAX(id) INTO max_paciente_id FROM pacientes;
-    SELECT MAX(id) INTO max_medico_id FROM medicos;
-    
-    WHILE i <= 2000 DO
-        SET fecha_prog = DATE_ADD(CURDATE(), INTERVAL (FLOOR(RAND() * 60) - 30) DAY);
-        
-        INSERT INTO cirugias (paciente_id, medico_principal_id, tipo_cirugia_id, fecha_programada, estado, quirofano)
-        VALUES (
-            (i % max_paciente_id) + 1,
-            (i % max_medico_id) + 1,
-            (i % 5) + 1,
-            fecha_prog,
-            CASE (i % 6)
-                WHEN 0 THEN 'Programada'
-                WHEN 1 THEN 'Pre-operatorio'
-                WHEN 2 THEN 'En_proceso'
-                WHEN 3 THEN 'Post-operatorio'
-                WHEN 4 THEN 'Finalizada'
-                ELSE 'Programada'
-            END,
-            CONCAT('Q', (i % 10) + 1)
-        );
-        
-        SET i = i + 1;
-    END WHILE;
-END //
-DELIMITER ;
-
-CALL GenerarCirugias();
-DROP PROCEDURE GenerarCirugias;
-
--- Script para generar signos vitales (2000+ registros)
-DELIMITER //
-CREATE PROCEDURE GenerarSignosVitales()
-BEGIN
-    DECLARE i INT DEFAULT 1;
-    DECLARE max_paciente_id INT;
-    DECLARE max_cirugia_id INT;
-    DECLARE max_medico_id INT;
-    
-    SELECT MAX(id) INTO max_paciente_id FROM pacientes;
-    SELECT MAX(id) INTO max_cirugia_id FROM cirugias;
-    SELECT MAX(id) INTO max_medico_id FROM medicos;
-    
-    WHILE i <= 2000 DO
-        INSERT INTO signos_vitales (paciente_id, cirugia_id, fecha_registro, presion_sistolica, presion_diastolica, 
-                                   frecuencia_cardiaca, temperatura, saturacion_oxigeno, frecuencia_respiratoria, 
-                                   dolor_escala, registrado_por_medico_id)
-        VALUES (
-            (i % max_paciente_id) + 1,
-            IF(i % 3 = 0, (i % max_cirugia_id) + 1, NULL),
-            DATE_SUB(NOW(), INTERVAL (FLOOR(RAND() * 720)) HOUR),
-            FLOOR(RAND() * 60) + 100,  -- Presión sistólica 100-160
-            FLOOR(RAND() * 40) + 60,   -- Presión diastólica 60-100
-            FLOOR(RAND() * 60) + 60,   -- Frecuencia cardíaca 60-120
-            ROUND(35.0 + (RAND() * 4.0), 1), -- Temperatura 35.0-39.0
-            FLOOR(RAND() * 10) + 90,   -- Saturación oxígeno 90-100
-            FLOOR(RAND() * 10) + 12,   -- Frecuencia respiratoria 12-22
-            FLOOR(RAND() * 11),        -- Dolor escala 0-10
-            (i % max_medico_id) + 1
-        );
-        
-        SET i = i + 1;
-    END WHILE;
-END //
-DELIMITER ;
-
-CALL GenerarSignosVitales();
-DROP PROCEDURE GenerarSignosVitales;
-
--- Script para generar evoluciones clínicas (2000+ registros)
-DELIMITER //
-CREATE PROCEDURE GenerarEvolucionesClinicas()
-BEGIN
-    DECLARE i INT DEFAULT 1;
-    DECLARE max_paciente_id INT;
-    DECLARE max_cirugia_id INT;
-    DECLARE max_medico_id INT;
-    
-    SELECT MAX(id) INTO max_paciente_id FROM pacientes;
-    SELECT MAX(id) INTO max_cirugia_id FROM cirugias;
-    SELECT MAX(id) INTO max_medico_id FROM medicos;
-    
-    WHILE i <= 2000 DO
-        INSERT INTO evoluciones_clinicas (paciente_id, cirugia_id, fecha_registro, estado_general, descripcion, 
-                                         plan_tratamiento, medico_id)
-        VALUES (
-            (i % max_paciente_id) + 1,
-            IF(i % 4 = 0, (i % max_cirugia_id) + 1, NULL),
-            DATE_SUB(NOW(), INTERVAL (FLOOR(RAND() * 168)) HOUR),
-            CASE (i % 4)
-                WHEN 0 THEN 'Estable'
-                WHEN 1 THEN 'Mejorado'
-                WHEN 2 THEN 'Regular'
-                ELSE 'Crítico'
-            END,
-            CASE (i % 8)
-                WHEN 0 THEN 'Paciente en evolución favorable, sin complicaciones'
-                WHEN 1 THEN 'Signos vitales estables, dolor controlado'
-                WHEN 2 THEN 'Recuperación dentro de parámetros normales'
-                WHEN 3 THEN 'Requiere monitoreo constante'
-                WHEN 4 THEN 'Evolución satisfactoria post-cirugía'
-                WHEN 5 THEN 'Paciente consciente y orientado'
-                WHEN 6 THEN 'Tolerando dieta, movilización progresiva'
-                ELSE 'Control de dolor adecuado, herida en buen estado'
-            END,
-            CASE (i % 6)
-                WHEN 0 THEN 'Continuar tratamiento actual'
-                WHEN 1 THEN 'Ajustar medicación para dolor'
-                WHEN 2 THEN 'Iniciar fisioterapia'
-                WHEN 3 THEN 'Control en 24 horas'
-                WHEN 4 THEN 'Preparar para alta médica'
-                ELSE 'Monitoreo estrecho de signos vitales'
-            END,
-            (i % max_medico_id) + 1
-        );
-        
-        SET i = i + 1;
-    END WHILE;
-END //
-DELIMITER ;
-
-CALL GenerarEvolucionesClinicas();
-DROP PROCEDURE GenerarEvolucionesClinicas;
+-- Datos masivos (pacientes, contactos, cirugías, signos vitales, evoluciones...):
+-- se generan con backend/seed_data.py, que carga por lotes y admite factor de escala
+--   python seed_data.py --scale 1 --reset
 
 -- Crear vistas para reportes de Power BI
 CREATE VIEW vista_pacientes_completa AS
@@ -26,5 +26,40 @@ FamilyAPI.interceptors.request.use((req) => {
   return req;
 });
 
+// GET condicionales: se reenvía el ETag de la última respuesta y un 304
+// devuelve los datos guardados sin volver a descargar ni parsear el cuerpo
+const withConditionalGet = (client) => {
+  const cache = new Map();
+  const keyFor = (config) => client.getUri(config);
+
+  client.interceptors.request.use((req) => {
+    if ((req.method || "get").toLowerCase() === "get") {
+      const cached = cache.get(keyFor(req));
+      if (cached) {
+        req.headers["If-None-Match"] = cached.etag;
+      }
+      req.validateStatus = (status) => (status >= 200 && status < 300) || status === 304;
+    }
+    return req;
+  });
+
+  client.interceptors.response.use((res) => {
+    const key = keyFor(res.config);
+    if (res.status === 304 && cache.has(key)) {
+      return { ...res, status: 200, data: cache.get(key).data };
+    }
+    const etag = res.headers && res.headers.etag;
+    if (etag) {
+      cache.set(key, { etag, data: res.data });
+    }
+    return res;
+  });
+
+  return client;
+};
+
+withConditionalGet(API);
+withConditionalGet(FamilyAPI);
+
 export default API;
 export { FamilyAPI };
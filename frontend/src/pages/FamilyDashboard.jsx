@@ -10,12 +10,16 @@ export default function FamilyDashboard() {
   const navigate = useNavigate();
 
   useEffect(() => {
+    const patientId = localStorage.getItem("patient_id");
+    let interval = null;
+    let source = null;
+
     const fetchPatientData = async () => {
       try {
-        const patientId = localStorage.getItem("patient_id");
         const res = await FamilyAPI.get(`/family/patient/${patientId}`);
         setPatientData(res.data.patient);
         setSurgeryStatus(res.data.surgery_status);
+        setLastUpdate(new Date());
       } catch (error) {
         console.error("Error fetching patient data:", error);
       } finally {
@@ -23,15 +27,56 @@ export default function FamilyDashboard() {
       }
     };
 
-    fetchPatientData();
-    
-    // Actualizar cada 30 segundos
-    const interval = setInterval(() => {
+    // Respaldo: consultar cada 30 segundos si el stream no está disponible
+    const startPolling = () => {
+      if (interval) return;
       fetchPatientData();
-      setLastUpdate(new Date());
-    }, 30000);
+      interval = setInterval(fetchPatientData, 30000);
+    };
+
+    const stopPolling = () => {
+      if (interval) {
+        clearInterval(interval);
+        interval = null;
+      }
+    };
+
+    if (typeof EventSource === "undefined") {
+      startPolling();
+    } else {
+      const token = localStorage.getItem("family_token");
+      source = new EventSource(
+        `${FamilyAPI.defaults.baseURL}/family/patient/${patientId}/stream?token=${encodeURIComponent(token)}`
+      );
 
-    return () => clearInterval(interval);
+      source.addEventListener("snapshot", (event) => {
+        const data = JSON.parse(event.data);
+        stopPolling();
+        setPatientData(data.patient);
+        setSurgeryStatus(data.surgery_status);
+        setLastUpdate(new Date());
+        setIsLoading(false);
+      });
+
+      source.addEventListener("delta", (event) => {
+        const delta = JSON.parse(event.data);
+        if (delta.patient) {
+          setPatientData((prev) => ({ ...prev, ...delta.patient }));
+        }
+        if (delta.surgery_status) {
+          setSurgeryStatus((prev) => ({ ...prev, ...delta.surgery_status }));
+        }
+        setLastUpdate(new Date());
+      });
+
+      // EventSource reintenta solo; mientras tanto se mantiene el polling
+      source.onerror = () => startPolling();
+    }
+
+    return () => {
+      stopPolling();
+      if (source) source.close();
+    };
   }, []);
 
   const logout = () => {